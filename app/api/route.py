@@ -0,0 +1,76 @@
+"""
+API route module
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from loguru import logger
+
+from app.core import settings
+from app.utils import tracing
+from app.utils.deadline import reset_deadline, set_deadline
+from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
+
+
+class AppRoute(APIRoute):
+    """
+    Route class of the application's API routes.
+
+    > Deadline: the handler runs under the route's deadline (ROUTE_DEADLINES,
+    REQUEST_DEADLINE_SECONDS otherwise). It bounds the statement_timeout of
+    the request's SQL statements and, at await points, the handler itself.
+    Requests running past it are answered with 504.
+
+    > Unit of work: once the handler returns and before the response is
+    sent, pending writes are committed when the handler succeeded and rolled
+    back when it responded with an error status.
+    """
+
+    def deadline(self, method: str) -> Optional[float]:
+        return settings.ROUTE_DEADLINES.get(
+            f"{method} {self.path}", settings.REQUEST_DEADLINE_SECONDS
+        )
+
+    @staticmethod
+    def error_response(err: Exception) -> Response:
+        error_response = Response()
+        content = handle_error.send_error(err, error_response)
+        return FastJSONResponse(content, status_code=error_response.status_code)
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            seconds = self.deadline(request.method)
+            token = set_deadline(seconds)
+            try:
+                response = await asyncio.wait_for(
+                    original_route_handler(request), timeout=seconds or None
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"DEADLINE_EXCEEDED: {request.method} {self.path}")
+                response = self.error_response(
+                    TimeoutError(f"Request deadline of {seconds}s exceeded")
+                )
+            finally:
+                reset_deadline(token)
+
+            unit_of_work = getattr(request.state, "unit_of_work", None)
+            if unit_of_work is None:
+                return response
+
+            try:
+                with tracing.span("unit_of_work.complete"):
+                    unit_of_work.complete(succeeded=response.status_code < 400)
+            except Exception as err:
+                logger.error(err)
+                unit_of_work.rollback()
+                return self.error_response(err)
+
+            return response
+
+        return route_handler
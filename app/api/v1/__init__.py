@@ -2,33 +2,51 @@
 Router modules import
 """
 
-from fastapi import APIRouter
+from fastapi import FastAPI
 
 from app.api.v1 import (
+    admin,
     assets,
     home,
     market_data_historical,
+    metrics,
     portfolio,
     portfolio_stock,
     transaction,
     user,
 )
+from app.core import settings
 
-api_router = APIRouter()
 
-# Root router
-api_router.include_router(home.router, prefix="/home", tags=["general"])
-api_router.include_router(user.router, prefix="/users", tags=["users"])
-api_router.include_router(portfolio.router, prefix="/portfolio", tags=["portfolio"])
-api_router.include_router(
-    transaction.router, prefix="/transaction", tags=["transaction"]
-)
-api_router.include_router(
-    portfolio_stock.router, prefix="/portfolio_stock", tags=["portfoliostocks"]
-)
-api_router.include_router(assets.router, prefix="/assets", tags=["assets"])
-api_router.include_router(
-    market_data_historical.router,
-    prefix="/marketdata",
-    tags=["marketdatahistorical"],
-)
+def include_routers(application: FastAPI) -> None:
+    """
+    Includes the API routers in the application. They're included directly:
+    FastAPI builds each route again for every router it's included in.
+    """
+    application.include_router(home.router, prefix="/home", tags=["general"])
+    application.include_router(user.router, prefix="/users", tags=["users"])
+    application.include_router(
+        portfolio.router, prefix="/portfolio", tags=["portfolio"]
+    )
+    application.include_router(
+        transaction.router, prefix="/transaction", tags=["transaction"]
+    )
+    application.include_router(
+        portfolio_stock.router, prefix="/portfolio_stock", tags=["portfoliostocks"]
+    )
+    application.include_router(assets.router, prefix="/assets", tags=["assets"])
+    application.include_router(
+        market_data_historical.router,
+        prefix="/marketdata",
+        tags=["marketdatahistorical"],
+    )
+
+    if settings.PROFILING_ENABLED:
+        application.include_router(
+            admin.router, prefix="/admin", include_in_schema=False
+        )
+
+    if settings.METRICS_ENABLED:
+        application.include_router(
+            metrics.router, prefix="/metrics", include_in_schema=False
+        )
@@ -0,0 +1,68 @@
+"""
+Admin handler module
+"""
+
+import asyncio
+import os
+import re
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.auth.auth import get_admin_username
+from app.core import settings
+from app.utils import profiler
+from app.utils.responses import FastJSONResponse
+
+router = APIRouter(dependencies=[Depends(get_admin_username)])
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.collapsed$")
+
+
+@router.get("/profile")
+async def get_profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1),
+    include_idle: bool = False,
+):
+    """
+    Profiles this worker for the given seconds (PROFILE_MAX_SECONDS at
+    most) and returns the sampled stacks in the collapsed format.
+    """
+    if not profiler.profiling.acquire(blocking=False):
+        return FastJSONResponse(
+            {"status": False, "message": "A profile is already being taken"},
+            status_code=409,
+        )
+
+    try:
+        sampler = profiler.Sampler(interval_ms / 1000, include_idle).start()
+        try:
+            await asyncio.sleep(min(seconds, settings.PROFILE_MAX_SECONDS))
+        finally:
+            stacks = sampler.stop()
+    finally:
+        profiler.profiling.release()
+
+    return PlainTextResponse(
+        stacks,
+        headers={
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Pid": str(os.getpid()),
+        },
+    )
+
+
+@router.get("/profiles/{name}")
+def get_request_profile(name: str):
+    """
+    Returns a profile taken for a request sent with the X-Profile header.
+    """
+    path = os.path.join(settings.PROFILE_OUTPUT_DIR, name)
+    if not PROFILE_NAME.match(name) or not os.path.isfile(path):
+        return FastJSONResponse(
+            {"status": False, "message": "Profile Not Found!"}, status_code=404
+        )
+
+    with open(path, encoding="utf-8") as file:
+        return PlainTextResponse(file.read())
@@ -11,8 +11,9 @@ from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.db.session import db_connection, read_db_connection
 from app.schemas import (
     CreateAsset,
     CreateAssetResponse,
@@ -20,12 +21,14 @@ from app.schemas import (
     DeleteAssetResponse,
     GetPriceResponse,
 )
+from app.utils.conditional import cache_headers, if_none_match, make_etag, not_modified
 from app.utils.exceptions import InvalidUUIDError
 from app.utils.general import General
 from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post(
@@ -64,12 +67,13 @@ async def create_data(
     response_model_exclude_unset=True,
 )
 async def get_asset(
+    request: Request,
     response: Response,
     asset_id: Optional[str] = None,
     name: Optional[str] = None,
     symbol: Optional[str] = None,
     exchange: Optional[str] = None,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Get data of an asset
@@ -81,26 +85,41 @@ async def get_asset(
                     "Make sure to provide user uuid in a valid UUID format.",
                     status_code=400,
                 )
-            details = crud.assets.get_by_asset_id(db, asset_id)
+
+        # the whole table's revision is cheap to read and changes with
+        # every insert, update or soft delete of an asset
+        etag = make_etag(
+            "assets", *crud.assets.revision(db), asset_id, name, symbol, exchange
+        )
+        if if_none_match(request, etag):
+            return not_modified(etag)
+
+        if asset_id != None:
+            details = crud.assets.read_by_asset_id(db, asset_id)
         elif name != None:
-            details = crud.assets.get_by_name(db, name)
+            details = crud.assets.read_by_name(db, name)
         elif symbol != None:
-            details = crud.assets.get_by_symbol(db, symbol, exchange)
+            details = crud.assets.read_by_symbol(db, symbol, exchange)
         else:
-            details = crud.assets.get_multi(db)
+            details = crud.assets.read_multi(db)
 
         if details:
-            details = General.exclude_metadata(jsonable_encoder(details))
-            return {
-                "status": True,
-                "message": "Successfully got the asset data!",
-                "details": details,
-            }
-        return {
-            "status": False,
-            "message": "No data found for the given asset!",
-            "details": {},
-        }
+            return FastJSONResponse(
+                {
+                    "status": True,
+                    "message": "Successfully got the asset data!",
+                    "details": details,
+                },
+                headers=cache_headers(etag),
+            )
+        return FastJSONResponse(
+            {
+                "status": False,
+                "message": "No data found for the given asset!",
+                "details": {},
+            },
+            headers=cache_headers(etag),
+        )
     except Exception as err:
         logger.error(err)
         return handle_error.send_error(err, response)
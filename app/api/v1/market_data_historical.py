@@ -4,27 +4,41 @@ contains handlers related to fetch historical data of
 symbols
 """
 
-from typing import Any
+from datetime import datetime
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.encoders import jsonable_encoder
 from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.core import settings
+from app.db.session import db_connection, read_db_connection
 from app.schemas import (
     CreateMarketDataHistorical,
     CreateMarketDataHistoricalResponse,
     GetAllDataResponse,
 )
+from app.trading import trigger_engine
+from app.utils.conditional import (
+    REVALIDATE,
+    cache_headers,
+    if_none_match,
+    make_etag,
+    max_age,
+    not_modified,
+    utc_naive,
+)
 from app.utils.exceptions import InvalidUUIDError
 from app.utils.general import General
 from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post(
@@ -39,12 +53,15 @@ async def create_data(
     db: Session = Depends(db_connection),
 ) -> Any:
     """
-    Create new historical market data
+    Create new historical market data. The resting orders of the asset its
+    price triggers are fired.
     """
     try:
-        market_data_historical = General.exclude_metadata(
-            jsonable_encoder(crud.market_data_historical.create(db, payload))
-        )
+        bar = crud.market_data_historical.create(db, payload)
+        if settings.ORDER_TRIGGERS_ENABLED:
+            if fills := trigger_engine.on_bar(db, bar):
+                logger.info(f"ORDERS_TRIGGERED: {len(fills)} of asset {bar.asset_id}")
+        market_data_historical = General.exclude_metadata(jsonable_encoder(bar))
         return {
             "status": True,
             "message": "Successfully created marketdata historical",
@@ -64,11 +81,17 @@ async def create_data(
 )
 async def get_info(
     asset_id: str,
+    request: Request,
     response: Response,
-    db: Session = Depends(db_connection),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
-    Get data of an asset
+    Get data of an asset, optionally within the range [start, end].
+    Closed ranges, i.e. ending in the past, are cached for
+    MARKETDATA_CLOSED_RANGE_MAX_AGE seconds. They still change when bars are
+    backfilled, updated or deleted, the ETag tells once revalidated.
     """
     try:
         if not is_valid_uuid(asset_id):
@@ -76,18 +99,42 @@ async def get_info(
                 "Make sure to provide user uuid in a valid UUID format.",
                 status_code=400,
             )
-        if details := crud.market_data_historical.get_by_asset_id(db, asset_id):
-            details = General.exclude_metadata(jsonable_encoder(details))
-            return {
-                "status": True,
-                "message": "Successfully got the asset data!",
-                "details": details,
-            }
-        return {
-            "status": False,
-            "message": "No data found for the given asset!",
-            "details": {},
-        }
+        start, end = utc_naive(start), utc_naive(end)
+
+        etag = make_etag(
+            "marketdata",
+            asset_id,
+            start,
+            end,
+            *crud.market_data_historical.revision(db, asset_id, start, end),
+        )
+        cache_control = (
+            max_age(settings.MARKETDATA_CLOSED_RANGE_MAX_AGE)
+            if end is not None and end < datetime.utcnow()
+            else REVALIDATE
+        )
+        if if_none_match(request, etag):
+            return not_modified(etag, cache_control)
+
+        if details := crud.market_data_historical.read_by_asset_id(
+            db, asset_id, start, end
+        ):
+            return FastJSONResponse(
+                {
+                    "status": True,
+                    "message": "Successfully got the asset data!",
+                    "details": details,
+                },
+                headers=cache_headers(etag, cache_control),
+            )
+        return FastJSONResponse(
+            {
+                "status": False,
+                "message": "No data found for the given asset!",
+                "details": {},
+            },
+            headers=cache_headers(etag),
+        )
     except Exception as err:
         logger.error(err)
         return handle_error.send_error(err, response)
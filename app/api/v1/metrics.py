@@ -0,0 +1,22 @@
+"""
+Metrics handler module
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.auth.auth import get_metrics_username
+from app.utils.metrics import exposition
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("", dependencies=[Depends(get_metrics_username)])
+def get_metrics() -> PlainTextResponse:
+    """
+    Metrics in the Prometheus text format. Under the prefork server those
+    of all the workers, merged by the one answering the scrape.
+    """
+    return PlainTextResponse(exposition(), headers={"Content-Type": CONTENT_TYPE})
@@ -11,8 +11,9 @@ from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.db.session import db_connection, read_db_connection
 from app.schemas import (
     CreatePortfolio,
     CreatePortfolioResponse,
@@ -25,9 +26,10 @@ from app.schemas import (
 from app.utils.exceptions import InvalidUUIDError
 from app.utils.general import General
 from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post(
@@ -102,7 +104,7 @@ async def get_portfolio(
     user_id: str,
     response: Response,
     portfolio_id: Optional[str] = None,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Gets portfolio details.
@@ -121,53 +123,44 @@ async def get_portfolio(
                     status_code=400,
                 )
 
-            if portfolio := General.exclude_metadata(
-                jsonable_encoder(crud.portfolio.get_by_portfolio_id(db, portfolio_id))
-            ):
-                portfolio_stocks_details = []
-                if portfolio_stocks := General.exclude_metadata(
-                    jsonable_encoder(
-                        crud.portfolio_stock.get_by_portfolio_id(db, portfolio_id)
-                    )
-                ):
-                    portfolio_stocks_details = portfolio_stocks
-
+            if portfolio := crud.portfolio.read_by_portfolio_id(db, portfolio_id):
                 portfolio_stocks_details = merge_portfolio_stocks(
-                    portfolio_stocks_details
+                    crud.portfolio_stock.read_by_portfolio_ids(db, [portfolio_id])
                 )
 
-                return {
-                    "status": True,
-                    "message": "Portfolio Found!",
-                    "details": {
-                        "portfolio_id": portfolio["portfolio_id"],
-                        "user_id": user_id,
-                        "name": portfolio["name"],
-                        "portfolio_stocks": portfolio_stocks_details,
-                    },
-                }
+                return FastJSONResponse(
+                    {
+                        "status": True,
+                        "message": "Portfolio Found!",
+                        "details": {
+                            "portfolio_id": portfolio["portfolio_id"],
+                            "user_id": user_id,
+                            "name": portfolio["name"],
+                            "portfolio_stocks": portfolio_stocks_details,
+                        },
+                    }
+                )
 
-            return {"status": False, "message": "Portfolio Not Found!"}
+            return FastJSONResponse(
+                {"status": False, "message": "Portfolio Not Found!"}
+            )
+
+        if portfolios := crud.portfolio.read_by_user_id(db, user_id):
+            # stocks of all the portfolios are fetched with a single query
+            # and grouped by portfolio afterwards
+            stocks_by_portfolio: Dict[str, List[Dict]] = {
+                portfolio["portfolio_id"]: [] for portfolio in portfolios
+            }
+            for stock in crud.portfolio_stock.read_by_portfolio_ids(
+                db, list(stocks_by_portfolio)
+            ):
+                stocks_by_portfolio[stock["portfolio_id"]].append(stock)
 
-        if portfolios := General.exclude_metadata(
-            jsonable_encoder(crud.portfolio.get_by_user_id(db, user_id))
-        ):
             portfolio_details = []
 
             for portfolio in portfolios:
-                portfolio_stocks_details = []
-
-                if portfolio_stocks := General.exclude_metadata(
-                    jsonable_encoder(
-                        crud.portfolio_stock.get_by_portfolio_id(
-                            db, portfolio["portfolio_id"]
-                        )
-                    )
-                ):
-                    portfolio_stocks_details += portfolio_stocks
-
                 portfolio_stocks_details = merge_portfolio_stocks(
-                    portfolio_stocks_details
+                    stocks_by_portfolio[portfolio["portfolio_id"]]
                 )
 
                 portfolio_details.append(
@@ -179,15 +172,19 @@ async def get_portfolio(
                     }
                 )
 
-            return {
-                "status": True,
-                "message": "All Portfolios Found!",
-                "details": portfolio_details,
+            return FastJSONResponse(
+                {
+                    "status": True,
+                    "message": "All Portfolios Found!",
+                    "details": portfolio_details,
+                }
+            )
+        return FastJSONResponse(
+            {
+                "status": False,
+                "message": "No Portfolios Found!",
             }
-        return {
-            "status": False,
-            "message": "No Portfolios Found!",
-        }
+        )
 
     except Exception as err:
         logger.error(err)
@@ -268,10 +265,8 @@ async def delete_portfolio(
             )
         portfolio = crud.portfolio.get_by_portfolio_id(db, payload.portfolio_id)
         if portfolio:
-            if portfolio_stocks := General.exclude_metadata(
-                jsonable_encoder(
-                    crud.portfolio_stock.get_by_portfolio_id(db, payload.portfolio_id)
-                )
+            if portfolio_stocks := crud.portfolio_stock.read_by_portfolio_ids(
+                db, [payload.portfolio_id]
             ):
                 for portfolio_stock in portfolio_stocks:
                     crud.portfolio_stock.delete(
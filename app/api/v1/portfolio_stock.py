@@ -11,8 +11,9 @@ from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.db.session import db_connection, read_db_connection
 from app.schemas import (
     CreatePortfolioStock,
     CreatePortfolioStockResponse,
@@ -24,9 +25,10 @@ from app.schemas import (
 from app.utils.exceptions import InvalidUUIDError
 from app.utils.general import General
 from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post(
@@ -87,7 +89,7 @@ async def get_portfolio_stock(
     portfolio_id: str,
     response: Response,
     portfolio_stock_id: Optional[str] = None,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Gets portfolio stock details.
@@ -105,31 +107,35 @@ async def get_portfolio_stock(
                     "Invalid UUID format for portfolio stock uuid",
                     status_code=400,
                 )
-            if portfolio_stock := General.exclude_metadata(
-                jsonable_encoder(
-                    crud.portfolio_stock.get_by_portfolio_stock_id(
-                        db, portfolio_stock_id
-                    )
-                )
+            if portfolio_stock := crud.portfolio_stock.read_by_portfolio_stock_id(
+                db, portfolio_stock_id
             ):
-                return {
+                return FastJSONResponse(
+                    {
+                        "status": True,
+                        "message": "Portfolio Stock Found!",
+                        "details": portfolio_stock,
+                    }
+                )
+            return FastJSONResponse(
+                {"status": False, "message": "Portfolio Stock Not Found!"}
+            )
+        if portfolio_stocks := crud.portfolio_stock.read_by_portfolio_ids(
+            db, [portfolio_id]
+        ):
+            return FastJSONResponse(
+                {
                     "status": True,
-                    "message": "Portfolio Stock Found!",
-                    "details": portfolio_stock,
+                    "message": "All Portfolio Stocks Found!",
+                    "details": portfolio_stocks,
                 }
-            return {"status": False, "message": "Portfolio Stock Not Found!"}
-        if portfolio_stocks := General.exclude_metadata(
-            jsonable_encoder(crud.portfolio_stock.get_by_portfolio_id(db, portfolio_id))
-        ):
-            return {
-                "status": True,
-                "message": "All Portfolio Stocks Found!",
-                "details": portfolio_stocks,
+            )
+        return FastJSONResponse(
+            {
+                "status": False,
+                "message": "Portfolio Stock Not Found!",
             }
-        return {
-            "status": False,
-            "message": "Portfolio Stock Not Found!",
-        }
+        )
 
     except Exception as err:
         logger.error(err)
@@ -246,7 +252,7 @@ async def delete_portfolio_stock(
 async def get_all_portfolio_stocks(
     user_id: str,
     response: Response,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Gets portfolio stocks' details for a user.
@@ -262,31 +268,34 @@ async def get_all_portfolio_stocks(
                 "Invalid user uuid",
                 status_code=400,
             )
-        if portfolios := General.exclude_metadata(
-            jsonable_encoder(crud.portfolio.get_by_user_id(db, user_id))
-        ):
-            all_portfolio_stocks = []
-            for portfolio in portfolios:
-                if portfolio_stocks := General.exclude_metadata(
-                    jsonable_encoder(
-                        crud.portfolio_stock.get_by_portfolio_id(
-                            db, portfolio["portfolio_id"]
-                        )
-                    )
-                ):
-                    for portfolio_stock in portfolio_stocks:
-                        portfolio_stock["portfolio_name"] = portfolio["name"]
-                    all_portfolio_stocks += portfolio_stocks
-                return {
+        if portfolios := crud.portfolio.read_by_user_id(db, user_id):
+            portfolio_names = {
+                portfolio["portfolio_id"]: portfolio["name"] for portfolio in portfolios
+            }
+
+            # stocks of all the portfolios are fetched with a single query
+            all_portfolio_stocks = crud.portfolio_stock.read_by_portfolio_ids(
+                db, list(portfolio_names)
+            )
+            for portfolio_stock in all_portfolio_stocks:
+                portfolio_stock["portfolio_name"] = portfolio_names[
+                    portfolio_stock["portfolio_id"]
+                ]
+
+            return FastJSONResponse(
+                {
                     "status": True,
                     "message": "All Portfolio Stocks Found!",
                     "details": all_portfolio_stocks,
                 }
-        return {
-            "status": True,
-            "message": "No Portfolio Found!",
-            "details": {},
-        }
+            )
+        return FastJSONResponse(
+            {
+                "status": True,
+                "message": "No Portfolio Found!",
+                "details": {},
+            }
+        )
 
     except Exception as err:
         logger.error(err)
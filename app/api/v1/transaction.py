@@ -3,16 +3,20 @@ Transaction module. This module contains handlers related
 to transaction create, read, update and delete.
 """
 
+from datetime import datetime
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Query, Response
 from fastapi.encoders import jsonable_encoder
 from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.core import settings
+from app.db.session import db_connection, read_db_connection
+from app.models.transaction import Transaction
 from app.schemas import (
     CreateTransaction,
     CreateTransactionResponse,
@@ -21,12 +25,29 @@ from app.schemas import (
     UpdateTransaction,
     UpdateTransactionResponse,
 )
-from app.utils.exceptions import InvalidUUIDError
+from app.trading import order_expiry, validate_order
+from app.utils.exceptions import InvalidOrderError, InvalidUUIDError
+from app.utils.export import ExportFormat, export_response
 from app.utils.general import General
 from app.utils.handle_error import handle_error
+from app.utils.responses import FastJSONResponse
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
+
+ORDER_FIELDS = ("order_type", "stop_price", "limit_price", "trail_amount")
+
+
+def merged_price(value: Optional[str], current: Optional[float]) -> Optional[float]:
+    """
+    Returns the price of an order once updated with the given value.
+    """
+    if value is None:
+        return current
+    try:
+        return float(value)
+    except ValueError as err:
+        raise InvalidOrderError(f"Invalid price {value}", status_code=400) from err
 
 
 @router.post(
@@ -56,6 +77,18 @@ async def create_transaction(
                 "Invalid portfolio uuid",
                 status_code=400,
             )
+        validate_order(
+            payload.order_type,
+            payload.stop_price,
+            payload.limit_price,
+            payload.trail_amount,
+        )
+        payload.expires_at = order_expiry(
+            payload.time_in_force,
+            payload.expires_at,
+            datetime.utcnow(),
+            settings.ORDER_DAY_END,
+        )
         payload.portfolio_id = portfolio_id
         transaction = General.exclude_metadata(
             jsonable_encoder(crud.transaction.create(db, payload))
@@ -82,7 +115,7 @@ async def get_transaction(
     portfolio_id: str,
     response: Response,
     transaction_id: Optional[str] = None,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Gets transaction details.
@@ -100,29 +133,33 @@ async def get_transaction(
                     "Invalid UUID format for transaction uuid",
                     status_code=400,
                 )
-            if transaction := General.exclude_metadata(
-                jsonable_encoder(
-                    crud.transaction.get_by_transaction_id(db, transaction_id)
-                )
+            if transaction := crud.transaction.read_by_transaction_id(
+                db, transaction_id
             ):
-                return {
+                return FastJSONResponse(
+                    {
+                        "status": True,
+                        "message": "Transaction Found!",
+                        "details": transaction,
+                    }
+                )
+            return FastJSONResponse(
+                {"status": False, "message": "Transaction Not Found!"}
+            )
+        if transactions := crud.transaction.read_by_portfolio_ids(db, [portfolio_id]):
+            return FastJSONResponse(
+                {
                     "status": True,
-                    "message": "Transaction Found!",
-                    "details": transaction,
+                    "message": "All Transactions Found!",
+                    "details": transactions,
                 }
-            return {"status": False, "message": "Transaction Not Found!"}
-        if transactions := General.exclude_metadata(
-            jsonable_encoder(crud.transaction.get_by_portfolio_id(db, portfolio_id))
-        ):
-            return {
-                "status": True,
-                "message": "All Transactions Found!",
-                "details": transactions,
+            )
+        return FastJSONResponse(
+            {
+                "status": False,
+                "message": "Transaction Not Found!",
             }
-        return {
-            "status": False,
-            "message": "Transaction Not Found!",
-        }
+        )
 
     except Exception as err:
         logger.error(err)
@@ -167,6 +204,28 @@ async def update_transaction(
                 )
             if not crud.assets.get_by_asset_id(db, payload.asset_id):
                 raise InvalidUUIDError("Invalid Portfolio uuid", status_code=400)
+        changes_order = any(getattr(payload, name) is not None for name in ORDER_FIELDS)
+        changes_expiry = bool(payload.time_in_force or payload.expires_at)
+        current = None
+        if changes_order or changes_expiry:
+            current = crud.transaction.get_by_transaction_id(db, transaction_id)
+        if current is not None and changes_order:
+            # the order as it will be, validated like a new one
+            validate_order(
+                payload.order_type or current.order_type.name,
+                merged_price(payload.stop_price, current.stop_price),
+                merged_price(payload.limit_price, current.limit_price),
+                merged_price(payload.trail_amount, current.trail_amount),
+            )
+        if current is not None and changes_expiry:
+            # the expiry is computed again, from now for DAY orders
+            payload.time_in_force = payload.time_in_force or current.time_in_force.name
+            payload.expires_at = order_expiry(
+                payload.time_in_force,
+                payload.expires_at,
+                datetime.utcnow(),
+                settings.ORDER_DAY_END,
+            )
         payload.transaction_id = transaction_id
         if transaction := General.exclude_metadata(
             jsonable_encoder(crud.transaction.update(db, transaction_id, payload))
@@ -240,7 +299,7 @@ async def delete_transaction(
 async def get_all_transactions(
     user_id: str,
     response: Response,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Gets all transactions' details for a user.
@@ -256,37 +315,109 @@ async def get_all_transactions(
                 "Invalid user uuid",
                 status_code=400,
             )
-        if portfolios := General.exclude_metadata(
-            jsonable_encoder(crud.portfolio.get_by_user_id(db, user_id))
-        ):
-            all_transactions = []
-            for portfolio in portfolios:
-                if transactions := General.exclude_metadata(
-                    jsonable_encoder(
-                        crud.transaction.get_by_portfolio_id(
-                            db, portfolio["portfolio_id"]
-                        )
-                    )
-                ):
-                    for transaction in transactions:
-                        transaction["portfolio_name"] = portfolio["name"]
-                        asset = General.exclude_metadata(
-                            jsonable_encoder(
-                                crud.assets.get_by_asset_id(db, transaction["asset_id"])
-                            )
-                        )
-                        transaction["asset_name"] = asset["name"]
-                    all_transactions += transactions
-                return {
+        if portfolios := crud.portfolio.read_by_user_id(db, user_id):
+            portfolio_names = {
+                portfolio["portfolio_id"]: portfolio["name"] for portfolio in portfolios
+            }
+
+            # one query for the transactions of all the portfolios and one
+            # for the names of their assets
+            all_transactions = crud.transaction.read_by_portfolio_ids(
+                db, list(portfolio_names)
+            )
+            asset_names = crud.assets.read_names(
+                db, list({transaction["asset_id"] for transaction in all_transactions})
+            )
+            for transaction in all_transactions:
+                transaction["portfolio_name"] = portfolio_names[
+                    transaction["portfolio_id"]
+                ]
+                transaction["asset_name"] = asset_names.get(transaction["asset_id"])
+
+            return FastJSONResponse(
+                {
                     "status": True,
                     "message": "All Transactions Found!",
                     "details": all_transactions,
                 }
-        return {
-            "status": True,
-            "message": "No Portfolio Found!",
-            "details": {},
-        }
+            )
+        return FastJSONResponse(
+            {
+                "status": True,
+                "message": "No Portfolio Found!",
+                "details": {},
+            }
+        )
+
+    except Exception as err:
+        logger.error(err)
+        return handle_error.send_error(err, response)
+
+
+@router.get("/{portfolio_id}/export", dependencies=[Depends(JWTBearer())])
+async def export_transactions(
+    portfolio_id: str,
+    response: Response,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    db: Session = Depends(read_db_connection),
+) -> Any:
+    """
+    Streams all transactions of a portfolio as NDJSON or CSV.
+    """
+    try:
+        if not is_valid_uuid(portfolio_id):
+            raise InvalidUUIDError(
+                "Invalid UUID format for portfolio uuid",
+                status_code=400,
+            )
+        if not crud.portfolio.read_by_portfolio_id(db, portfolio_id):
+            raise InvalidUUIDError(
+                "Invalid portfolio uuid",
+                status_code=400,
+            )
+
+        return export_response(
+            crud.transaction.stream_by_portfolio_id(
+                db, portfolio_id, settings.EXPORT_CHUNK_SIZE
+            ),
+            Transaction.export_fields,
+            export_format,
+            f"transactions-{portfolio_id}",
+        )
+
+    except Exception as err:
+        logger.error(err)
+        return handle_error.send_error(err, response)
+
+
+@router.get("/user/{user_id}/export", dependencies=[Depends(JWTBearer())])
+async def export_all_transactions(
+    user_id: str,
+    response: Response,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    db: Session = Depends(read_db_connection),
+) -> Any:
+    """
+    Streams all transactions of a user as NDJSON or CSV.
+    """
+    try:
+        if not is_valid_uuid(user_id):
+            raise InvalidUUIDError(
+                "Invalid UUID format for user uuid",
+                status_code=400,
+            )
+        if not crud.user.get_by_user_id(db, user_id):
+            raise InvalidUUIDError(
+                "Invalid user uuid",
+                status_code=400,
+            )
+
+        return export_response(
+            crud.transaction.stream_by_user_id(db, user_id, settings.EXPORT_CHUNK_SIZE),
+            Transaction.export_fields,
+            export_format,
+            f"transactions-{user_id}",
+        )
 
     except Exception as err:
         logger.error(err)
@@ -11,9 +11,10 @@ from loguru import logger
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.api.route import AppRoute
 from app.auth.auth import generate_token, is_valid_user, verify_gty
 from app.auth.bearer import JWTBearer
-from app.db.session import db_connection
+from app.db.session import db_connection, read_db_connection
 from app.models.user import User
 from app.schemas.user import (
     CreateUser,
@@ -35,7 +36,7 @@ from app.utils.exceptions import (
 from app.utils.general import General
 from app.utils.uuid_validation import is_valid_uuid
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post(
@@ -60,19 +61,16 @@ async def create_user(
         else:
             data_in = payload.dict(exclude_unset=True)
 
-        crud.user.create(db, data_in)
-        user_details = General.exclude_metadata(
-            jsonable_encoder(crud.user.get_by_email(db, payload.email))
-        )
+        user = crud.user.create(db, data_in)
         access_token = generate_token(payload)
 
         return {
             "status": True,
             "message": "Successfully created the user!",
             "details": {
-                "user_id": user_details["user_id"],
-                "full_name": user_details["full_name"],
-                "email": user_details["email"],
+                "user_id": user.user_id,
+                "full_name": user.full_name,
+                "email": user.email,
                 "access_token": access_token,
             },
         }
@@ -106,9 +104,7 @@ async def signin(
 
         if valid_user["status"]:
             access_token = generate_token(payload)
-            user_details = General.exclude_metadata(
-                jsonable_encoder(crud.user.get_by_email(db, email))
-            )
+            user_details = crud.user.read_by_email(db, email)
 
             return {
                 "status": True,
@@ -146,7 +142,7 @@ async def get_user_details(
     user_id: str,
     request: Request,
     response: Response,
-    db: Session = Depends(db_connection),
+    db: Session = Depends(read_db_connection),
 ) -> Any:
     """
     Returns details of the given user if found.
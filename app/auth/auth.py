@@ -13,14 +13,25 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.core import settings
+from app.db.session import SessionLocal
+from app.models.admin import AdminUser
 from app.models.admin_level import AdminLevel
 from app.models.base import Base
 from app.models.user import User
+from app.utils import tracing
+from app.utils.log_config import set_user
+from app.utils.metrics import Histogram
 
 security = HTTPBasic()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+password_hashing = Histogram(
+    "auth_password_hashing_seconds",
+    "Time spent hashing and verifying passwords with bcrypt",
+    labelnames=("operation",),
+)
+
 ModelType = TypeVar("ModelType", bound=Base)
 Email = TypeVar("S")
 Password = TypeVar("S")
@@ -113,6 +124,42 @@ def get_apidoc_username(credentials: HTTPBasicCredentials = Depends(security)):
     return credentials.username
 
 
+def get_metrics_username(credentials: HTTPBasicCredentials = Depends(security)):
+    """
+    Returns the metrics username if credentials are valid. The API
+    documentation's credentials are used unless METRICS_USERNAME is set.
+    """
+    username = settings.METRICS_USERNAME or settings.BA_API_DOC_USERNAME
+    password = settings.METRICS_PASSWORD or settings.BA_API_DOC_PASSWORD
+
+    correct_username = secrets.compare_digest(credentials.username, username)
+    correct_password = secrets.compare_digest(credentials.password, password)
+    if not (correct_username and correct_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username
+
+
+def get_admin_username(credentials: HTTPBasicCredentials = Depends(security)):
+    """
+    Returns the username if the credentials belong to an active admin user.
+    The session is closed right away, it isn't held for the whole request.
+    """
+    with SessionLocal() as db:
+        is_admin = is_valid_authorised_user(db, credentials, AdminUser, True)
+
+    if not is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username
+
+
 def encode_jwt(username: str, password: str) -> str:
     """Generates JWT"""
 
@@ -142,6 +189,7 @@ def encode_jwt(username: str, password: str) -> str:
     return access_token
 
 
+@tracing.traced("auth.decode_jwt")
 def decode_jwt(token: str) -> Dict:  # pylint: disable=inconsistent-return-statements
     """
     Checks if a given jwt is valid. If it is
@@ -174,14 +222,35 @@ def verify_token(token: str) -> bool:
     return isinstance(decode_jwt(token), dict)
 
 
+def token_subject(token: str) -> Optional[str]:
+    """
+    Returns the email of the user a valid token was issued to.
+    """
+    decoded_token = decode_jwt(token)
+    if not isinstance(decoded_token, dict):
+        return None
+    return decoded_token.get("gty", "").partition(":")[0] or None
+
+
+@tracing.traced("auth.bcrypt.hash")
 def hash_password(password) -> str:
-    return pwd_context.hash(password)
+    started_at = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        password_hashing.observe(time.perf_counter() - started_at, operation="hash")
 
 
+@tracing.traced("auth.bcrypt.verify")
 def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    started_at = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        password_hashing.observe(time.perf_counter() - started_at, operation="verify")
 
 
+@tracing.traced("auth.verify_gty")
 def verify_gty(
     db: Session,
     request: Request,
@@ -218,6 +287,7 @@ def verify_gty(
         ):
             return jsonable_encoder({"status": False, "error": "compromised"})
 
+        set_user(str(user["user_id"]))
         user["status"] = True
         return user
 
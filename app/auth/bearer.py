@@ -5,7 +5,10 @@ JWT bearer module
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from .auth import verify_token
+from app.utils import tracing
+from app.utils.log_config import set_user
+
+from .auth import token_subject
 
 
 class JWTBearer(HTTPBearer):
@@ -18,6 +21,10 @@ class JWTBearer(HTTPBearer):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request):
+        with tracing.span("auth.jwt_bearer"):
+            return await self.authorize(request)
+
+    async def authorize(self, request: Request):
         credentials: HTTPAuthorizationCredentials = await super(
             JWTBearer, self
         ).__call__(request)
@@ -29,10 +36,10 @@ class JWTBearer(HTTPBearer):
                 status_code=403, detail={"Invalid authentication scheme."}
             )
 
-        if not self.verify_jwt(credentials.credentials):
+        subject = token_subject(credentials.credentials)
+        if subject is None:
             raise HTTPException(status_code=403, detail="Invalid or expired token.")
-        return credentials.credentials
 
-    @staticmethod
-    def verify_jwt(token: str) -> bool:
-        return verify_token(token)
+        set_user(subject)
+        request.state.user = subject
+        return credentials.credentials
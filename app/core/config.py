@@ -2,6 +2,10 @@
 Core application configuration module
 """
 
+from datetime import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
 from pydantic import BaseSettings
 
 
@@ -10,8 +14,167 @@ class Settings(BaseSettings):
     PORT: str = "9000"
     ENVIRONMENT: str
     DB_URL: str
+    # Read only dependencies are routed to the replica when it's set
+    DB_REPLICA_URL: Optional[str] = None
+    # Seconds a client's reads stick to the primary after its own write
+    DB_REPLICA_STICKY_SECONDS: float = 5.0
+    # Clients who wrote are shared by the workers of a host through
+    # DB_REPLICA_STICKY_STORE_PATH (`sqlite`) or kept per worker (`memory`)
+    DB_REPLICA_STICKY_STORE: str = "sqlite"
+    DB_REPLICA_STICKY_STORE_PATH: str = "/tmp/papertrade-read-your-writes.sqlite3"
+    # Executions after which psycopg 3 prepares a statement server side
+    DB_PREPARE_THRESHOLD: Optional[int] = None
     MIGRATION_SCRIPT_LOCATION: str
 
+    # Seconds a request may run before it's answered with 504. Also bounds
+    # the statement_timeout of its SQL statements.
+    REQUEST_DEADLINE_SECONDS: float = 10.0
+    # Per route deadlines keyed by "<METHOD> <path>", e.g.
+    # {"GET /marketdata/{asset_id}": 3}
+    ROUTE_DEADLINES: Dict[str, float] = {}
+
+    # Logging: JSON lines (LOG_JSON, all environments but local by default)
+    # written by a background thread. Each call site logs at most
+    # LOG_RATE_LIMIT records per second, messages starting with a key of
+    # LOG_SAMPLE_RATES are sampled at its rate.
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: Optional[bool] = None
+    LOG_RATE_LIMIT: float = 20
+    LOG_SAMPLE_RATES: Dict[str, float] = {"DECODE_TOKEN_ERROR": 0.1}
+
+    # A request repeating a statement shape more often is flagged as N+1
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Event loop monitor: lag is measured every LOOP_MONITOR_INTERVAL
+    # seconds. Blocks beyond LOOP_BLOCKED_THRESHOLD_MS are logged with the
+    # stack of the blocking call when LOOP_BLOCKED_STACKS (local and dev by
+    # default).
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.5
+    LOOP_BLOCKED_THRESHOLD_MS: float = 50
+    LOOP_BLOCKED_STACKS: Optional[bool] = None
+
+    # Server (dev/stg/prd): worker processes, 0 starts one per CPU core
+    SERVER_WORKERS: int = 0
+    # Event loop and HTTP parser: auto picks uvloop and httptools if installed
+    SERVER_LOOP: str = "auto"
+    SERVER_HTTP: str = "auto"
+    # Pending connections the listening socket queues up
+    SERVER_BACKLOG: int = 2048
+    # Seconds an idle keep-alive connection is kept open
+    SERVER_KEEP_ALIVE: int = 5
+    # Connections a worker serves concurrently before answering 503
+    SERVER_LIMIT_CONCURRENCY: Optional[int] = None
+
+    # Admission control: concurrent requests (limit) per route class and how
+    # many more may wait (queue) for how many seconds (timeout) before
+    # they're shed with 503
+    ADMISSION_CONTROL: bool = True
+    ADMISSION_BUDGETS: Dict[str, Dict[str, float]] = {
+        "trading": {"limit": 32, "queue": 256, "timeout": 5},
+        "read": {"limit": 32, "queue": 128, "timeout": 2},
+        "analytics": {"limit": 4, "queue": 8, "timeout": 1},
+        "auth": {"limit": 8, "queue": 64, "timeout": 3},
+    }
+    # Route class of the requests matching "<METHOD> <path>" (shell-style
+    # patterns, first match wins), others are ADMISSION_DEFAULT_CLASS
+    ADMISSION_ROUTE_CLASSES: Dict[str, str] = {
+        "POST /users/signin": "auth",
+        "POST /users/signup": "auth",
+        "GET /transaction/*/export": "analytics",
+        "GET /transaction/user/*": "analytics",
+        "GET /marketdata*": "analytics",
+        # ingesting bars fires trigger orders, it's never shed as analytics
+        "POST /marketdata*": "trading",
+        "POST /transaction*": "trading",
+        "PUT /transaction*": "trading",
+        "DELETE /transaction*": "trading",
+        "POST /portfolio_stock*": "trading",
+        "PUT /portfolio_stock*": "trading",
+        "DELETE /portfolio_stock*": "trading",
+        # the other writes aren't shed with the reads either
+        "POST /portfolio*": "trading",
+        "PUT /portfolio*": "trading",
+        "DELETE /portfolio*": "trading",
+        "POST /assets*": "trading",
+        "PUT /assets*": "trading",
+        "DELETE /assets*": "trading",
+        "PUT /users*": "trading",
+        "DELETE /users*": "trading",
+    }
+    ADMISSION_DEFAULT_CLASS: str = "read"
+    # Seconds shed clients are asked to wait before retrying
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Rate limits keyed by "<METHOD> <path>" (shell-style patterns, first
+    # match wins): `limit` requests per `period` seconds per `key`, which is
+    # either `ip` or `user` (bearer token's email, client address otherwise)
+    RATE_LIMIT: bool = True
+    RATE_LIMITS: Dict[str, Dict[str, Any]] = {
+        "POST /users/signin": {"limit": 10, "period": 60, "key": "ip"},
+        "POST /users/signup": {"limit": 5, "period": 60, "key": "ip"},
+        "GET /assets*": {"limit": 120, "period": 60, "key": "user"},
+    }
+    # Bucket store: `memory` (per worker) or `sqlite` (shared by the workers
+    # of a host through RATE_LIMIT_STORE_PATH)
+    RATE_LIMIT_STORE: str = "memory"
+    RATE_LIMIT_STORE_PATH: str = "/tmp/papertrade-rate-limit.sqlite3"
+
+    # Prometheus metrics at /metrics behind basic auth, the API doc
+    # credentials are used unless METRICS_USERNAME is set
+    METRICS_ENABLED: bool = True
+    METRICS_USERNAME: Optional[str] = None
+    METRICS_PASSWORD: Optional[str] = None
+    # The workers of the prefork server write their samples to METRICS_DIR
+    # every METRICS_FLUSH_INTERVAL seconds, /metrics merges those of all
+    METRICS_DIR: str = "/tmp/papertrade-metrics"
+    METRICS_FLUSH_INTERVAL: float = 5.0
+
+    # Tracing: share of the requests traced, requests with a sampled W3C
+    # traceparent header are traced regardless. Traces are appended to
+    # TRACING_EXPORT_PATH as OTLP JSON lines.
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.01
+    TRACING_EXPORT_PATH: str = "/tmp/papertrade-traces.jsonl"
+    TRACING_SERVICE_NAME: str = "papertrade-api"
+
+    # Sampling profiler: admins can profile a worker for up to
+    # PROFILE_MAX_SECONDS at /admin/profile. Outside prd requests sent with
+    # an X-Profile header are profiled and saved to PROFILE_OUTPUT_DIR.
+    PROFILING_ENABLED: bool = True
+    PROFILE_MAX_SECONDS: float = 60
+    PROFILE_OUTPUT_DIR: str = "/tmp/papertrade-profiles"
+
+    # Seconds clients may reuse the market data of a closed range before
+    # revalidating it, bars can still be backfilled, updated or deleted
+    MARKETDATA_CLOSED_RANGE_MAX_AGE: int = 60
+
+    # Rows fetched per round trip by the server side cursor of exports
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # Stop, stop limit, take profit and trailing stop orders are triggered by
+    # the market data bars ingested, against a trigger book per worker which
+    # is loaded in the background when the worker starts
+    ORDER_TRIGGERS_ENABLED: bool = True
+
+    # Pending DAY orders expire at ORDER_DAY_END (UTC) and GTD orders at their
+    # expires_at. One worker cancels them every ORDER_EXPIRY_INTERVAL
+    # seconds, ORDER_EXPIRY_BATCH_SIZE orders per statement.
+    ORDER_EXPIRY_ENABLED: bool = True
+    ORDER_EXPIRY_INTERVAL: float = 1.0
+    ORDER_EXPIRY_BATCH_SIZE: int = 1000
+    ORDER_DAY_END: time = time(0, 0)
+
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # Only responses of these content types are compressed
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json",
+        "application/x-ndjson",
+        "text/csv",
+        "text/plain",
+    ]
+
     # JWT vars
     SIGNING_KEY: str
     SIGNING_ALGORITHM: str
@@ -32,4 +195,22 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Returns the settings, they're read from the environment on first use.
+    """
+    return Settings()
+
+
+class LazySettings:
+    """
+    Stand-in for the settings which reads the environment (and .env) only
+    when an attribute is first looked up, not when a module imports it.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+
+settings = LazySettings()
@@ -3,16 +3,20 @@ Assets CRUD operations
 """
 
 from datetime import datetime
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
+from app.db.unit_of_work import save
 from app.models import Assets, Exchange
 from app.schemas.assets import CreateAsset
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.assets")
 class CRUDAssets(BaseModel):
     """
     class for Asset's CRUD operations.
@@ -23,7 +27,7 @@ class CRUDAssets(BaseModel):
         serialized_data = jsonable_encoder(payload_in)
         db_obj = Assets(**serialized_data)
         db.add(db_obj)
-        db.commit()
+        save(db)
         db.refresh(db_obj)
 
         return db_obj
@@ -40,9 +44,35 @@ class CRUDAssets(BaseModel):
     def get_by_symbol(db: Session, symbol: str, exchange: Exchange):
         return Assets.get_by_symbol(db, symbol, exchange)
 
+    @staticmethod
+    def read_by_asset_id(db: Session, asset_id: str):
+        return Assets.read_by_asset_id(db, asset_id)
+
+    @staticmethod
+    def read_by_name(db: Session, name: str):
+        return Assets.read_by_name(db, name)
+
+    @staticmethod
+    def read_by_symbol(db: Session, symbol: str, exchange: Exchange):
+        return Assets.read_by_symbol(db, symbol, exchange)
+
+    @staticmethod
+    def read_multi(db: Session):
+        return Assets.read_multi(db)
+
+    @staticmethod
+    def read_names(db: Session, asset_ids: List[str]):
+        return Assets.read_names(db, asset_ids)
+
+    @staticmethod
+    def revision(db: Session):
+        return Assets.revision(db)
+
     @staticmethod
     def get_multi(db: Session):
-        return db.query(Assets).where(Assets.deleted_at == None).all()
+        return db.scalars(
+            lambda_stmt(lambda: select(Assets).where(Assets.deleted_at == None))
+        ).all()
 
     @staticmethod
     def update(
@@ -70,7 +100,7 @@ class CRUDAssets(BaseModel):
                     setattr(asset_details, field, update_data[field])
 
             db.add(asset_details)
-            db.commit()
+            save(db)
             db.refresh(asset_details)
         return asset_details
 
@@ -3,16 +3,19 @@ MarketDataHistorical CRUD operations
 """
 
 from datetime import datetime
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.db.unit_of_work import save
 from app.models import MarketDataHistorical
 from app.schemas.market_data_historical import CreateMarketDataHistorical
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.market_data_historical")
 class CRUDMarketDataHistorical(BaseModel):
     """
     class for MarketDataHistorical's CRUD operations.
@@ -23,14 +26,14 @@ class CRUDMarketDataHistorical(BaseModel):
         serialized_data = jsonable_encoder(payload_in)
         db_obj = MarketDataHistorical(**serialized_data)
         db.add(db_obj)
-        db.commit()
+        save(db)
         db.refresh(db_obj)
 
         return db_obj
 
     @staticmethod
     def get_by_market_data_historical_id(db: Session, market_data_historical_id: str):
-        return MarketDataHistorical.get_market_data_historical_by_market_data_historical_id(
+        return MarketDataHistorical.get_by_market_data_historical_id(
             db, market_data_historical_id
         )
 
@@ -38,6 +41,24 @@ class CRUDMarketDataHistorical(BaseModel):
     def get_by_asset_id(db: Session, asset_id: str):
         return MarketDataHistorical.get_by_asset_id(db, asset_id)
 
+    @staticmethod
+    def read_by_asset_id(
+        db: Session,
+        asset_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        return MarketDataHistorical.read_by_asset_id(db, asset_id, start, end)
+
+    @staticmethod
+    def revision(
+        db: Session,
+        asset_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        return MarketDataHistorical.revision(db, asset_id, start, end)
+
     @staticmethod
     def update(
         db: Session,
@@ -68,7 +89,7 @@ class CRUDMarketDataHistorical(BaseModel):
                     setattr(market_data_historical_details, field, update_data[field])
 
             db.add(market_data_historical_details)
-            db.commit()
+            save(db)
             db.refresh(market_data_historical_details)
         return market_data_historical_details
 
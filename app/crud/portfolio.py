@@ -9,10 +9,13 @@ from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.db.unit_of_work import save
 from app.models import Portfolio
 from app.schemas.portfolio import CreatePortfolio, UpdatePortfolio
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.portfolio")
 class CRUDPortfolio(BaseModel):
     """
     class for Portfolio's CRUD operations.
@@ -23,7 +26,7 @@ class CRUDPortfolio(BaseModel):
         serialized_data = jsonable_encoder(payload_in)
         db_obj = Portfolio(**serialized_data)
         db.add(db_obj)
-        db.commit()
+        save(db)
         db.refresh(db_obj)
 
         return db_obj
@@ -36,6 +39,14 @@ class CRUDPortfolio(BaseModel):
     def get_by_user_id(db: Session, user_id: str):
         return Portfolio.get_portfolio_by_user_id(db, user_id)
 
+    @staticmethod
+    def read_by_portfolio_id(db: Session, portfolio_id: str):
+        return Portfolio.read_by_portfolio_id(db, portfolio_id)
+
+    @staticmethod
+    def read_by_user_id(db: Session, user_id: str):
+        return Portfolio.read_by_user_id(db, user_id)
+
     @staticmethod
     def update(
         db: Session, portfolio_id: str, obj_in: Union[UpdatePortfolio, Dict[str, Any]]
@@ -62,7 +73,7 @@ class CRUDPortfolio(BaseModel):
                     setattr(portfolio_details, field, update_data[field])
 
             db.add(portfolio_details)
-            db.commit()
+            save(db)
             db.refresh(portfolio_details)
         return portfolio_details
 
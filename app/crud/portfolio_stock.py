@@ -3,16 +3,19 @@ PortfolioStock CRUD operations
 """
 
 from datetime import datetime
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.db.unit_of_work import save
 from app.models import PortfolioStock
 from app.schemas.portfolio_stock import CreatePortfolioStock, UpdatePortfolioStock
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.portfolio_stock")
 class CRUDPortfolioStock(BaseModel):
     """
     class for PortfolioStock's CRUD operations.
@@ -23,7 +26,7 @@ class CRUDPortfolioStock(BaseModel):
         serialized_data = jsonable_encoder(payload_in)
         db_obj = PortfolioStock(**serialized_data)
         db.add(db_obj)
-        db.commit()
+        save(db)
         db.refresh(db_obj)
 
         return db_obj
@@ -36,6 +39,14 @@ class CRUDPortfolioStock(BaseModel):
     def get_by_portfolio_id(db: Session, portfolio_id: str):
         return PortfolioStock.get_by_portfolio_id(db, portfolio_id)
 
+    @staticmethod
+    def read_by_portfolio_stock_id(db: Session, portfolio_stock_id: str):
+        return PortfolioStock.read_by_portfolio_stock_id(db, portfolio_stock_id)
+
+    @staticmethod
+    def read_by_portfolio_ids(db: Session, portfolio_ids: List[str]):
+        return PortfolioStock.read_by_portfolio_ids(db, portfolio_ids)
+
     @staticmethod
     def update(
         db: Session,
@@ -66,7 +77,7 @@ class CRUDPortfolioStock(BaseModel):
                     setattr(portfolio_stock_details, field, update_data[field])
 
             db.add(portfolio_stock_details)
-            db.commit()
+            save(db)
             db.refresh(portfolio_stock_details)
         return portfolio_stock_details
 
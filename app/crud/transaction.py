@@ -3,16 +3,19 @@ Transaction CRUD operations
 """
 
 from datetime import datetime
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.db.unit_of_work import save
 from app.models import Transaction
 from app.schemas.transaction import CreateTransaction, UpdateTransaction
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.transaction")
 class CRUDTransaction(BaseModel):
     """
     class for Transaction's CRUD operations.
@@ -23,7 +26,7 @@ class CRUDTransaction(BaseModel):
         serialized_data = jsonable_encoder(payload_in)
         db_obj = Transaction(**serialized_data)
         db.add(db_obj)
-        db.commit()
+        save(db)
         db.refresh(db_obj)
 
         return db_obj
@@ -40,6 +43,22 @@ class CRUDTransaction(BaseModel):
     def get_by_asset_id(db: Session, asset_id: str):
         return Transaction.get_by_asset_id(db, asset_id)
 
+    @staticmethod
+    def read_by_transaction_id(db: Session, transaction_id: str):
+        return Transaction.read_by_transaction_id(db, transaction_id)
+
+    @staticmethod
+    def read_by_portfolio_ids(db: Session, portfolio_ids: List[str]):
+        return Transaction.read_by_portfolio_ids(db, portfolio_ids)
+
+    @staticmethod
+    def stream_by_portfolio_id(db: Session, portfolio_id: str, chunk_size: int):
+        return Transaction.stream_by_portfolio_id(db, portfolio_id, chunk_size)
+
+    @staticmethod
+    def stream_by_user_id(db: Session, user_id: str, chunk_size: int):
+        return Transaction.stream_by_user_id(db, user_id, chunk_size)
+
     @staticmethod
     def update(
         db: Session,
@@ -68,7 +87,7 @@ class CRUDTransaction(BaseModel):
                     setattr(transaction_details, field, update_data[field])
 
             db.add(transaction_details)
-            db.commit()
+            save(db)
             db.refresh(transaction_details)
         return transaction_details
 
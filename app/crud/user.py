@@ -9,13 +9,17 @@ from typing import Any, Dict, List, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from app.auth import auth
+from app.db.unit_of_work import save
 from app.models.user import User
 from app.schemas.user import CreateUser, UpdateUser
+from app.utils.tracing import trace_methods
 
 
+@trace_methods("crud.user")
 class CRUDUser(BaseModel):
     """
     class for user's CRUD operations.
@@ -28,7 +32,7 @@ class CRUDUser(BaseModel):
         payload_in["password"] = auth.hash_password(payload_in["password"])
         db_object = User(**(jsonable_encoder(payload_in)))
         db.add(db_object)
-        db.commit()
+        save(db)
 
         return db_object
 
@@ -40,15 +44,20 @@ class CRUDUser(BaseModel):
     def get_by_email(db: Session, email: str):
         return User.get_by_email(db, email)
 
+    @staticmethod
+    def read_by_email(db: Session, email: str):
+        return User.read_by_email(db, email)
+
     @staticmethod
     def get_multi(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-        return (
-            db.query(User)
-            .where(User.deleted_at == None)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(User)
+                .where(User.deleted_at == None)
+                .offset(skip)
+                .limit(limit)
+            )
+        ).all()
 
     def update(
         self, db: Session, user_id: str, obj_in: Union[UpdateUser, Dict[str, Any]]
@@ -77,7 +86,7 @@ class CRUDUser(BaseModel):
                     setattr(user_details, field, update_data[field])
 
             db.add(user_details)
-            db.commit()
+            save(db)
             db.refresh(user_details)
         return user_details
 
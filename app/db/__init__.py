@@ -2,4 +2,12 @@
 Module imports
 """
 
-from app.db.session import db_connection, initialise
+from app.db.session import (
+    db_connection,
+    db_connection_immediate,
+    get_engine,
+    get_replica_engine,
+    initialise,
+    read_db_connection,
+)
+from app.db.unit_of_work import UnitOfWork, save
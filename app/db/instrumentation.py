@@ -0,0 +1,210 @@
+"""
+SQL instrumentation module.
+Counts the statements a request executes, the time it spends in the database
+and how often the same statement shape repeats, which is how N+1 query
+patterns show up. Connection pools and the statement caches are exported as
+metrics as well.
+"""
+
+import re
+import weakref
+from contextvars import ContextVar, Token
+from functools import lru_cache
+from time import perf_counter
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import QueuePool
+
+from app.utils import tracing
+from app.utils.metrics import Counter, Gauge, Histogram, registry
+
+# bound parameters and literals are replaced so statements of the same shape
+# share a fingerprint, e.g. "IN (%(id_1)s, %(id_2)s)" -> "IN (?, ?)"
+_PARAMETERS = re.compile(r"%\(\w+\)s|%s|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+statement_duration = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing a single SQL statement",
+)
+
+statement_cache_lookups = Counter(
+    "db_statement_cache_lookups_total",
+    "Compiled statement cache lookups of executed statements",
+    labelnames=("result",),
+)
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection, or opening a new one",
+    labelnames=("pool",),
+)
+pool_checkouts = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool",
+    labelnames=("pool",),
+)
+pool_connections = Gauge(
+    "db_pool_connections",
+    "Connections of the pool by state",
+    labelnames=("pool", "state"),
+)
+fingerprint_cache = Gauge(
+    "db_fingerprint_cache_lookups",
+    "Lookups of the statement fingerprint cache",
+    labelnames=("result",),
+)
+
+_query_stats: ContextVar[Optional["QueryStats"]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Returns the shape of the given statement, free of parameter values.
+    """
+    return _WHITESPACE.sub(" ", _PARAMETERS.sub("?", statement)).strip()
+
+
+class QueryStats:
+    """
+    SQL statistics of a single request.
+
+    Attributes:
+        statements -- number of executed statements
+        duration -- time spent in the database in seconds
+        fingerprints -- executions per statement shape
+    """
+
+    __slots__ = ("statements", "duration", "fingerprints")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.fingerprints: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.duration += duration
+        shape = fingerprint(statement)
+        self.fingerprints[shape] = self.fingerprints.get(shape, 0) + 1
+
+    @property
+    def max_repeats(self) -> int:
+        return max(self.fingerprints.values(), default=0)
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """
+        Returns the statement shapes executed more than threshold times.
+        """
+        return {
+            shape: count
+            for shape, count in self.fingerprints.items()
+            if count > threshold
+        }
+
+
+def start_request() -> Token:
+    """
+    Starts collecting SQL statistics for the current request.
+    """
+    return _query_stats.set(QueryStats())
+
+
+def end_request(token: Token) -> None:
+    _query_stats.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):  # pylint: disable=unused-argument,too-many-arguments
+    if context is not None:
+        context.pt_started_at = perf_counter()
+        context.pt_span = tracing.start_span(
+            "db.statement",
+            tracing.CLIENT,
+            {"db.system": conn.dialect.name, "db.statement": statement[:2000]},
+        )
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):  # pylint: disable=unused-argument,too-many-arguments
+    started_at = getattr(context, "pt_started_at", None)
+    if started_at is None:
+        return
+
+    duration = perf_counter() - started_at
+    statement_duration.observe(duration)
+
+    if span := getattr(context, "pt_span", None):
+        span.set_attribute("db.rows", cursor.rowcount)
+        span.end()
+
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is CACHE_HIT:
+        statement_cache_lookups.inc(result="hit")
+    elif cache_hit is CACHE_MISS:
+        statement_cache_lookups.inc(result="miss")
+
+    if stats := _query_stats.get():
+        stats.record(statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    context = exception_context.execution_context
+    if span := getattr(context, "pt_span", None):
+        span.set_error(exception_context.original_exception)
+        span.end()
+
+
+_pools: "weakref.WeakSet[InstrumentedQueuePool]" = weakref.WeakSet()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool which records how long checkouts wait for a connection. Pools
+    are labelled by their logging name (pool_logging_name of the engine),
+    which survives the pool being recreated on dispose.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_name = getattr(self, "logging_name", None) or "default"
+        _pools.add(self)
+
+    def _do_get(self):
+        started_at = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(
+                perf_counter() - started_at, pool=self.metrics_name
+            )
+            pool_checkouts.inc(pool=self.metrics_name)
+
+
+def _collect_pools() -> None:
+    for pool in list(_pools):
+        name = pool.metrics_name
+        pool_connections.set(pool.checkedout(), pool=name, state="checked_out")
+        pool_connections.set(pool.checkedin(), pool=name, state="idle")
+        pool_connections.set(max(pool.overflow(), 0), pool=name, state="overflow")
+
+    info = fingerprint.cache_info()
+    fingerprint_cache.set(info.hits, result="hit")
+    fingerprint_cache.set(info.misses, result="miss")
+
+
+registry.add_collector(_collect_pools)
@@ -2,16 +2,264 @@
 Database connection module
 """
 
-from typing import Generator
+import sqlite3
+import threading
+import time
+from typing import Dict, Generator, Optional
 
+from fastapi import Request
 from loguru import logger
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core import settings
+from app.db.instrumentation import InstrumentedQueuePool
+from app.db.unit_of_work import UnitOfWork
+from app.utils import deadline
 
-engine = create_engine(settings.DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+READ_ONLY_KEY = "read_only"
+CLIENT_KEY = "client"
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+def create_database_engine(url: str, name: str = PRIMARY) -> Engine:
+    """
+    Creates an engine for the given database url, its pool's metrics are
+    labelled with the given name.
+    Server side prepared statements are enabled with DB_PREPARE_THRESHOLD when
+    the driver supports them (psycopg 3). psycopg2 has no prepared statements,
+    there the statement cache of SQLAlchemy is all we get.
+    """
+    connect_args = {}
+    if (
+        settings.DB_PREPARE_THRESHOLD is not None
+        and make_url(url).get_driver_name() == "psycopg"
+    ):
+        connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=name,
+        connect_args=connect_args,
+    )
+
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """
+    Returns the engine of the primary database. It's created on first use,
+    importing the application doesn't touch the database.
+    """
+    if (engine := _engines.get(PRIMARY)) is None:
+        with _engines_lock:
+            if (engine := _engines.get(PRIMARY)) is None:
+                engine = _engines[PRIMARY] = create_database_engine(settings.DB_URL)
+    return engine
+
+
+def get_replica_engine() -> Engine:
+    """
+    Returns the engine of the read replica, created on first use.
+    Falls back to the primary when no replica is configured.
+    """
+    if (engine := _engines.get(REPLICA)) is None:
+        primary = get_engine()
+        with _engines_lock:
+            if (engine := _engines.get(REPLICA)) is None:
+                engine = _engines[REPLICA] = (
+                    create_database_engine(settings.DB_REPLICA_URL, REPLICA)
+                    if settings.DB_REPLICA_URL
+                    else primary
+                )
+    return engine
+
+
+def dispose_engines(close: bool = True) -> None:
+    """
+    Disposes the connection pools of the engines created so far. Forked
+    processes pass close=False to drop the inherited connections without
+    closing them under the parent's feet.
+    """
+    for engine in set(_engines.values()):
+        engine.dispose(close=close)
+
+
+class RoutingSession(Session):
+    """
+    Session class which routes statements of read only sessions to the
+    replica engine. Writes, and reads of any other session, go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get(READ_ONLY_KEY) and not self._flushing:
+            return get_replica_engine()
+        return get_engine()
+
+
+class ReadYourWrites:
+    """
+    Keeps track of clients who wrote recently. Their reads are served by
+    the primary until the replica had the chance to catch up. The clients
+    are kept in the memory of the process, see SharedReadYourWrites.
+    """
+
+    # expired entries are purged once the map grows past this size
+    max_clients = 10_000
+
+    def __init__(self, window: Optional[float] = None):
+        self._window = window
+        self._sticky_until: Dict[str, float] = {}
+
+    @property
+    def window(self) -> float:
+        if self._window is None:
+            return settings.DB_REPLICA_STICKY_SECONDS
+        return self._window
+
+    def mark(self, client: str) -> None:
+        if len(self._sticky_until) >= self.max_clients:
+            now = time.monotonic()
+            self._sticky_until = {
+                key: until for key, until in self._sticky_until.items() if until > now
+            }
+        self._sticky_until[client] = time.monotonic() + self.window
+
+    def is_sticky(self, client: str) -> bool:
+        until = self._sticky_until.get(client)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            self._sticky_until.pop(client, None)
+            return False
+        return True
+
+
+class SharedReadYourWrites(ReadYourWrites):
+    """
+    Clients who wrote recently, shared by the processes using the same
+    SQLite file: a write through one worker sticks the reads of all of
+    them. Expired entries are pruned every now and then.
+
+    Errors of the store are logged, reads go to the primary meanwhile.
+    """
+
+    PRUNE_EVERY = 10_000
+
+    def __init__(self, path: str, window: Optional[float] = None):
+        super().__init__(window)
+        self.path = path
+        self._local = threading.local()
+        self._marks = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        try:
+            return self._local.connection
+        except AttributeError:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS read_your_writes ("
+                "client TEXT PRIMARY KEY, sticky_until REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._local.connection = connection
+            return connection
+
+    def mark(self, client: str) -> None:
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT INTO read_your_writes (client, sticky_until) VALUES (?, ?) "
+                "ON CONFLICT (client) DO UPDATE SET sticky_until = excluded.sticky_until",
+                (client, now + self.window),
+            )
+            self._marks += 1
+            if self._marks % self.PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM read_your_writes WHERE sticky_until < ?", (now,)
+                )
+        except sqlite3.Error as err:
+            logger.error(f"READ_YOUR_WRITES_STORE_ERROR: {err}")
+
+    def is_sticky(self, client: str) -> bool:
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT sticky_until FROM read_your_writes WHERE client = ?",
+                    (client,),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as err:
+            logger.error(f"READ_YOUR_WRITES_STORE_ERROR: {err}")
+            return True
+        return row is not None and row[0] >= time.time()
+
+
+def create_read_your_writes(kind: str, path: str) -> ReadYourWrites:
+    """
+    Returns the tracker of the clients who wrote of the given kind, `memory`
+    or `sqlite`.
+    """
+    if kind == "sqlite":
+        return SharedReadYourWrites(path)
+    if kind == "memory":
+        return ReadYourWrites()
+    raise ValueError(f"Unknown read your writes store: {kind}")
+
+
+# the window is DB_REPLICA_STICKY_SECONDS
+read_your_writes = create_read_your_writes(
+    settings.DB_REPLICA_STICKY_STORE, settings.DB_REPLICA_STICKY_STORE_PATH
+)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _bound_statement_time(session: Session, transaction, connection) -> None:
+    """
+    Bounds the statements of a transaction by the time left until the
+    deadline of the request, so a slow query can't hold its connection
+    for longer than the request is allowed to run.
+    """
+    # pylint: disable=unused-argument
+    seconds = deadline.remaining()
+    if seconds is None or connection.dialect.name != "postgresql":
+        return
+
+    if seconds <= 0:
+        raise TimeoutError("Request deadline exceeded")
+
+    timeout_ms = max(int(seconds * 1000), 1)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session: Session) -> None:
+    # without a replica every read is served by the primary anyway
+    if settings.DB_REPLICA_URL and (client := session.info.get(CLIENT_KEY)):
+        read_your_writes.mark(client)
+
+
+def client_key(request: Request) -> str:
+    """
+    Identifies the caller by the user its bearer token was issued to, as
+    JWTBearer authenticated it, or by its address for anonymous requests.
+    """
+    if user := getattr(request.state, "user", None):
+        return f"user:{user}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
 
 
 def initialise() -> bool:  # pylint: disable=inconsistent-return-statements
@@ -19,7 +267,7 @@ def initialise() -> bool:  # pylint: disable=inconsistent-return-statements
     Database connection initializer.
     """
     try:
-        if engine.connect():
+        with get_engine().connect():
             return True
 
     except Exception as err:
@@ -27,14 +275,46 @@ def initialise() -> bool:  # pylint: disable=inconsistent-return-statements
         raise err
 
 
-def db_connection() -> Generator:
-    """
-    Database connection generator.
-    Returns a generator object if engine connects successfully.
-    """
+def _connect(request: Request, deferred: bool, read_only: bool = False) -> Generator:
+    # no connection is checked out up front: the session connects to the
+    # engine it routes to on its first query and pool_pre_ping checks it then
+    client = client_key(request)
+    db = SessionLocal()
     try:
-        if initialise():
-            db = SessionLocal()
-            yield db
+        db.info[CLIENT_KEY] = client
+        db.info[READ_ONLY_KEY] = read_only and not (
+            settings.DB_REPLICA_URL and read_your_writes.is_sticky(client)
+        )
+        request.state.unit_of_work = UnitOfWork(db, deferred=deferred)
+        yield db
     finally:
+        # anything the route didn't commit is rolled back here
         db.close()
+
+
+def db_connection(request: Request) -> Generator:
+    """
+    Database connection generator.
+    Returns a generator object yielding a session of the request.
+    The session is bound to a request scoped unit of work: CRUD operations
+    only flush and the route commits once after the handler returns.
+    """
+    yield from _connect(request, deferred=True)
+
+
+def db_connection_immediate(request: Request) -> Generator:
+    """
+    Database connection generator which opts out of the deferred unit of work.
+    Every CRUD write is committed as soon as it is flushed.
+    """
+    yield from _connect(request, deferred=False)
+
+
+def read_db_connection(request: Request) -> Generator:
+    """
+    Database connection generator for read only handlers.
+    Queries are served by the replica unless the caller wrote within the
+    last DB_REPLICA_STICKY_SECONDS, in which case the primary answers so
+    the caller always reads its own writes.
+    """
+    yield from _connect(request, deferred=True, read_only=True)
@@ -0,0 +1,87 @@
+"""
+Unit of work module.
+A request shares a single database transaction: CRUD operations only flush
+their changes and the transaction is committed once when the request completes.
+"""
+
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+UNIT_OF_WORK_KEY = "unit_of_work"
+
+
+class UnitOfWork:
+    """
+    Request scoped unit of work class.
+
+    Attributes:
+        session -- database session shared by the request
+        deferred -- when false every write is committed right away (opt-out)
+        has_writes -- true once the session flushed changes to the database
+    """
+
+    def __init__(self, session: Session, deferred: bool = True):
+        self.session = session
+        self.deferred = deferred
+        self.has_writes = False
+        session.info[UNIT_OF_WORK_KEY] = self
+
+    @classmethod
+    def of(cls, session: Session) -> Optional["UnitOfWork"]:
+        """
+        Returns the unit of work the given session is bound to, if any.
+        """
+        return session.info.get(UNIT_OF_WORK_KEY)
+
+    @property
+    def has_pending_changes(self) -> bool:
+        session = self.session
+        return bool(self.has_writes or session.new or session.dirty or session.deleted)
+
+    def commit(self) -> None:
+        self.session.commit()
+        self.has_writes = False
+
+    def rollback(self) -> None:
+        self.session.rollback()
+        self.has_writes = False
+
+    def complete(self, succeeded: bool) -> None:
+        """
+        Completes the unit of work. Pending changes are committed if the
+        request succeeded and rolled back otherwise. Read only requests
+        don't pay for a commit.
+        """
+        if not succeeded:
+            self.rollback()
+        elif self.has_pending_changes:
+            self.commit()
+
+
+def save(db: Session) -> None:
+    """
+    Flushes pending changes of the given session.
+    Changes are committed right away unless the session belongs to a
+    deferred unit of work, in which case the commit happens once at the
+    end of the request.
+    """
+    db.flush()
+
+    unit_of_work = UnitOfWork.of(db)
+    if unit_of_work is None or not unit_of_work.deferred:
+        db.commit()
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_writes(session: Session, _flush_context) -> None:
+    unit_of_work = UnitOfWork.of(session)
+    if unit_of_work is not None and unit_of_work.deferred:
+        unit_of_work.has_writes = True
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _mark_bulk_writes(update_context) -> None:
+    # UPDATE statements executed by the session never go through a flush
+    _mark_writes(update_context.session, None)
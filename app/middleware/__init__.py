@@ -0,0 +1,12 @@
+"""
+Module imports
+"""
+
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.request_context import RequestContextMiddleware
+from app.middleware.sql_stats import SQLStatsMiddleware
+from app.middleware.tracing import TracingMiddleware
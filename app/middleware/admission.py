@@ -0,0 +1,192 @@
+"""
+Admission control middleware module
+"""
+
+import asyncio
+import re
+from collections import deque
+from fnmatch import translate
+from time import perf_counter
+from typing import Deque, Dict, List, Optional, Pattern, Tuple
+
+from loguru import logger
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.utils import tracing
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.responses import FastJSONResponse
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+in_flight_requests = Gauge(
+    "admission_in_flight_requests",
+    "Requests admitted and being handled",
+    labelnames=("route_class",),
+)
+queued_requests = Gauge(
+    "admission_queued_requests",
+    "Requests waiting to be admitted",
+    labelnames=("route_class",),
+)
+shed_requests = Counter(
+    "admission_shed_requests_total",
+    "Requests rejected with 503 instead of being admitted",
+    labelnames=("route_class", "reason"),
+)
+queue_wait = Histogram(
+    "admission_queue_wait_seconds",
+    "Time admitted requests waited in the queue",
+    labelnames=("route_class",),
+)
+
+
+class Budget:
+    """
+    Concurrency budget of a route class: at most `limit` requests are
+    handled at a time, up to `queue` more wait (FIFO) for at most `timeout`
+    seconds to be admitted. Anything beyond that is shed.
+
+    Budgets live on the worker's event loop, they're never shared across
+    threads or processes.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Waits for a slot. Returns None once the request is admitted and the
+        reason when it's shed.
+        """
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return None
+
+        if len(self.waiters) >= self.queue:
+            return QUEUE_FULL
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as the timeout fired
+                return None
+            self.waiters.remove(waiter)
+            return QUEUE_TIMEOUT
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+        return None
+
+    def release(self) -> None:
+        """
+        Hands the slot over to the longest waiting request, if any.
+        """
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    """
+    Limits the number of requests handled concurrently per route class
+    (e.g. trading, read, analytics, auth) so that a spike of one class
+    can't exhaust the database pool for the others. Requests over the
+    budget are queued up to a bound and then answered with 503 and a
+    Retry-After header.
+
+    Requests are classified by the first of `route_classes` matching
+    "<METHOD> <path>" (shell-style patterns, e.g. "GET /transaction/*/export"),
+    those matching none belong to `default_class`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        budgets: Dict[str, Dict[str, float]],
+        route_classes: Dict[str, str],
+        default_class: str,
+        retry_after: int,
+    ):
+        self.app = app
+        self.budgets = {
+            name: Budget(
+                name,
+                limit=int(budget["limit"]),
+                queue=int(budget.get("queue", 0)),
+                timeout=float(budget.get("timeout", 0)),
+            )
+            for name, budget in budgets.items()
+        }
+        self.rules: List[Tuple[Pattern, str]] = [
+            (re.compile(translate(pattern)), route_class)
+            for pattern, route_class in route_classes.items()
+        ]
+        self.default_class = default_class
+        self.retry_after = retry_after
+
+    def classify(self, scope: Scope) -> str:
+        request = f"{scope['method']} {scope['path']}"
+        for pattern, route_class in self.rules:
+            if pattern.match(request):
+                return route_class
+        return self.default_class
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.budgets.get(self.classify(scope))
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        queued_at = perf_counter()
+        queued_requests.inc(route_class=budget.name)
+        try:
+            with tracing.span("admission", route_class=budget.name):
+                reason = await budget.acquire()
+        finally:
+            queued_requests.dec(route_class=budget.name)
+
+        if reason is not None:
+            await self.shed(budget, reason, scope, receive, send)
+            return
+
+        queue_wait.observe(perf_counter() - queued_at, route_class=budget.name)
+        in_flight_requests.inc(route_class=budget.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight_requests.dec(route_class=budget.name)
+            budget.release()
+
+    async def shed(
+        self, budget: Budget, reason: str, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        shed_requests.inc(route_class=budget.name, reason=reason)
+        logger.warning(
+            f"LOAD_SHED: {scope['method']} {scope['path']} ({budget.name}, {reason})"
+        )
+
+        response = FastJSONResponse(
+            {"status": False, "message": "Server is busy, try again later"},
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,251 @@
+"""
+Response compression middleware module
+"""
+
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli and zstd are optional, gzip is always available
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# bodies larger than this are compressed in the threadpool so that
+# compressing megabytes of JSON doesn't block the event loop
+THREADPOOL_MIN_SIZE = 256 * 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+class StreamCompressor:
+    """
+    Incremental compressor of a single response body.
+    """
+
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+
+
+def gzip_compressor() -> StreamCompressor:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return StreamCompressor(
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def brotli_compressor() -> StreamCompressor:
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return StreamCompressor(
+        lambda chunk: compressor.process(chunk) + compressor.flush(),
+        compressor.finish,
+    )
+
+
+def zstd_compressor() -> StreamCompressor:
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return StreamCompressor(
+        lambda chunk: compressor.compress(chunk)
+        + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+
+def gzip_compress(body: bytes) -> bytes:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(body) + compressor.flush()
+
+
+def brotli_compress(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def zstd_compress(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+# supported encodings in the order of preference:
+# name -> (one shot compressor, streaming compressor factory)
+ENCODINGS: Dict[
+    str, Tuple[Callable[[bytes], bytes], Callable[[], StreamCompressor]]
+] = {}
+if zstandard is not None:
+    ENCODINGS["zstd"] = (zstd_compress, zstd_compressor)
+if brotli is not None:
+    ENCODINGS["br"] = (brotli_compress, brotli_compressor)
+ENCODINGS["gzip"] = (gzip_compress, gzip_compressor)
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    Parses an Accept-Encoding header into the list of codings the client
+    accepts, i.e. the ones without `q=0`.
+    """
+    accepted = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, encodings: Iterable[str]) -> Optional[str]:
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in encodings:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with zstd, brotli (when the packages are
+    installed) or gzip, whichever the client accepts first in that order.
+
+    Only responses with an allowed content type are compressed. Complete
+    bodies smaller than minimum_size are sent untouched; streamed bodies
+    are compressed chunk by chunk and flushed so that each chunk reaches
+    the client right away.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        content_types: Iterable[str] = ("application/json",),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), ENCODINGS
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def is_compressible(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "").partition(";")[0].strip()
+        return content_type in self.content_types and "content-encoding" not in headers
+
+
+class CompressionResponder:
+    """
+    Compresses the messages of a single response.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.compress, self.compressor_factory = ENCODINGS[encoding]
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            # held back until the first body chunk shows whether the
+            # response is worth compressing
+            self.start_message = message
+            if not self.middleware.is_compressible(Headers(raw=message["headers"])):
+                self.passthrough = True
+                await self.downstream(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            # subsequent chunks of a streamed response
+            chunk = self.compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += self.compressor.flush()
+            await self.downstream(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+            return
+
+        if not more_body:
+            # complete body in a single message
+            if len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.downstream(self.start_message)
+                await self.downstream(message)
+                return
+
+            if len(body) >= THREADPOOL_MIN_SIZE:
+                compressed = await run_in_threadpool(self.compress, body)
+            else:
+                compressed = self.compress(body)
+
+            self.update_headers(content_length=len(compressed))
+            await self.downstream(self.start_message)
+            await self.downstream(
+                {"type": "http.response.body", "body": compressed, "more_body": False}
+            )
+            return
+
+        # first chunk of a streamed response, its total size is unknown
+        self.compressor = self.compressor_factory()
+        self.update_headers(content_length=None)
+        await self.downstream(self.start_message)
+        await self.downstream(
+            {
+                "type": "http.response.body",
+                "body": self.compressor.compress(body) if body else b"",
+                "more_body": True,
+            }
+        )
+
+    def update_headers(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(scope=self.start_message)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # a strong entity tag promises byte identical bodies, which doesn't
+        # hold across codings anymore
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
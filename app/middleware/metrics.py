@@ -0,0 +1,61 @@
+"""
+HTTP metrics middleware module
+"""
+
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.scope import route_name
+from app.utils.metrics import Counter, Gauge, Histogram
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request until its response was sent",
+    labelnames=("route",),
+)
+responses = Counter(
+    "http_responses_total",
+    "Responses sent by route and status code",
+    labelnames=("route", "status"),
+)
+in_flight_requests = Gauge(
+    "http_requests_in_flight",
+    "Requests being handled",
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and the status code of every request by route, and
+    the number of requests in flight.
+
+    Requests answered before routing (e.g. shed or rate limited ones) are
+    recorded under the `unmatched` route.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started_at = perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight_requests.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight_requests.dec()
+            route = route_name(scope)
+            request_duration.observe(perf_counter() - started_at, route=route)
+            responses.inc(route=route, status=str(status))
@@ -0,0 +1,66 @@
+"""
+Request profiling middleware module
+"""
+
+import os
+import re
+import time
+
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import profiler
+
+UNSAFE_CHARACTERS = re.compile(r"[^\w.-]+")
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests sent with an X-Profile header while they're being
+    handled. Their collapsed stacks are written to `output_dir` and the
+    file's name is sent back in X-Profile-Name, admins can fetch it from
+    /admin/profiles/<name>. Meant for non production environments.
+
+    Requests are profiled one at a time, others are served as usual.
+    """
+
+    def __init__(self, app: ASGIApp, output_dir: str, interval: float = 0.001):
+        self.app = app
+        self.output_dir = output_dir
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or "x-profile" not in Headers(scope=scope)
+            or not profiler.profiling.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = UNSAFE_CHARACTERS.sub("_", scope["path"]).strip("_")
+        name = f"{time.time_ns()}-{scope['method']}-{path}.collapsed"
+
+        async def send_with_name(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Name", name)
+            await send(message)
+
+        sampler = profiler.Sampler(self.interval).start()
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            stacks = sampler.stop()
+            profiler.profiling.release()
+            self.save(name, stacks)
+
+    def save(self, name: str, stacks: str) -> None:
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(
+                os.path.join(self.output_dir, name), "w", encoding="utf-8"
+            ) as file:
+                file.write(stacks)
+        except OSError as err:
+            logger.error(f"PROFILE_SAVE_ERROR: {err}")
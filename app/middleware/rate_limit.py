@@ -0,0 +1,132 @@
+"""
+Rate limit middleware module
+"""
+
+import re
+from fnmatch import translate
+from typing import Any, Dict, List, NamedTuple, Optional, Pattern
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.auth import token_subject
+from app.utils import tracing
+from app.utils.metrics import Counter
+from app.utils.rate_limit import Decision
+from app.utils.responses import FastJSONResponse
+
+rate_limited_requests = Counter(
+    "rate_limited_requests_total",
+    "Requests rejected with 429 by a rate limit",
+    labelnames=("rule",),
+)
+
+
+class Rule(NamedTuple):
+    """
+    Rate limit of the requests matching a "<METHOD> <path>" pattern.
+
+    Attributes:
+        pattern -- the pattern as configured, it names the rule's buckets
+        matcher -- compiled pattern
+        limit -- requests allowed per period, and the burst size
+        period -- seconds
+        key -- `ip` (client address) or `user` (email of the bearer token,
+               client address of anonymous requests)
+    """
+
+    pattern: str
+    matcher: Pattern
+    limit: int
+    period: float
+    key: str
+
+
+class RateLimitMiddleware:
+    """
+    Limits the request rate per rule and per user or client address with
+    token buckets of the given store (see app.utils.rate_limit).
+
+    Responses of limited requests carry the RateLimit-Limit, -Remaining,
+    -Reset and -Policy headers, rejected requests are answered with 429 and
+    Retry-After. Requests matching none of the rules aren't limited.
+    """
+
+    def __init__(self, app: ASGIApp, rules: Dict[str, Dict[str, Any]], store: Any):
+        self.app = app
+        self.rules: List[Rule] = [
+            Rule(
+                pattern,
+                re.compile(translate(pattern)),
+                limit=int(rule["limit"]),
+                period=float(rule["period"]),
+                key=rule.get("key", "user"),
+            )
+            for pattern, rule in rules.items()
+        ]
+        self.store = store
+
+    def match(self, scope: Scope) -> Optional[Rule]:
+        request = f"{scope['method']} {scope['path']}"
+        for rule in self.rules:
+            if rule.matcher.match(request):
+                return rule
+        return None
+
+    @staticmethod
+    def client_key(rule: Rule, scope: Scope) -> str:
+        if rule.key == "user":
+            scheme, _, token = (
+                Headers(scope=scope).get("authorization", "").partition(" ")
+            )
+            if scheme == "Bearer" and (subject := token_subject(token)):
+                return f"user:{subject}"
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (rule := self.match(scope)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        with tracing.span("rate_limit", rule=rule.pattern):
+            key = f"{rule.pattern}|{self.client_key(rule, scope)}"
+            if self.store.blocking:
+                decision = await run_in_threadpool(
+                    self.store.take, key, rule.limit, rule.period
+                )
+            else:
+                decision = self.store.take(key, rule.limit, rule.period)
+
+        if not decision.allowed:
+            rate_limited_requests.inc(rule=rule.pattern)
+            response = FastJSONResponse(
+                {"status": False, "message": "Too many requests, slow down"},
+                status_code=429,
+                headers={
+                    **self.headers(rule, decision),
+                    "Retry-After": str(decision.retry_after),
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in self.headers(rule, decision).items():
+                    headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    def headers(rule: Rule, decision: Decision) -> Dict[str, str]:
+        return {
+            "RateLimit-Limit": str(decision.limit),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(decision.reset),
+            "RateLimit-Policy": f"{rule.limit};w={rule.period:g}",
+        }
@@ -0,0 +1,44 @@
+"""
+Request context middleware module
+"""
+
+import re
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.log_config import current_request_id, reset_request_id, set_request_id
+
+REQUEST_ID = re.compile(r"^[\w.-]{1,64}$")
+
+
+class RequestContextMiddleware:
+    """
+    Gives every request an id, the caller's X-Request-Id when it's a sane
+    one, which the request's log records carry and which is sent back in
+    the X-Request-Id response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id")
+        if request_id is not None and not REQUEST_ID.match(request_id):
+            request_id = None
+        token = set_request_id(request_id)
+        request_id = current_request_id()
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-Id"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            reset_request_id(token)
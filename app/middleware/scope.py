@@ -0,0 +1,16 @@
+"""
+ASGI scope helpers for the middlewares
+"""
+
+from starlette.types import Scope
+
+
+def route_name(scope: Scope) -> str:
+    """
+    Returns the method and path template of the route which handled the
+    request, e.g. `GET /portfolio/{user_id}`. Only available once the router
+    matched the request.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope.get('method', '')} {path}"
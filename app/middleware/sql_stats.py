@@ -0,0 +1,94 @@
+"""
+SQL statistics middleware module
+"""
+
+from time import perf_counter
+
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.instrumentation import current_stats, end_request, start_request
+from app.middleware.scope import route_name
+from app.utils.metrics import Counter, Histogram
+
+request_statements = Histogram(
+    "db_request_statements",
+    "SQL statements executed per request",
+    labelnames=("route",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+request_db_duration = Histogram(
+    "db_request_duration_seconds",
+    "Time a request spent in the database",
+    labelnames=("route",),
+)
+n_plus_one_requests = Counter(
+    "db_n_plus_one_requests_total",
+    "Requests which repeated a statement shape more often than allowed",
+    labelnames=("route",),
+)
+
+
+class SQLStatsMiddleware:
+    """
+    Collects SQL statistics for every request and flags requests which
+    execute the same statement shape more than n_plus_one_threshold times.
+
+    The statistics are logged, recorded as metrics and, when expose_headers
+    is set (non production environments), sent back as response headers.
+    """
+
+    def __init__(
+        self, app: ASGIApp, n_plus_one_threshold: int, expose_headers: bool = False
+    ):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request()
+        stats = current_stats()
+        started_at = perf_counter()
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.expose_headers:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Statements", str(stats.statements))
+                headers.append("X-DB-Time-Ms", f"{stats.duration * 1000:.2f}")
+                headers.append("X-DB-Max-Repeats", str(stats.max_repeats))
+                if stats.max_repeats > self.n_plus_one_threshold:
+                    headers.append("X-DB-N-Plus-One", "true")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            end_request(token)
+            self.report(scope, stats, perf_counter() - started_at)
+
+    def report(self, scope: Scope, stats, elapsed: float) -> None:
+        route = route_name(scope)
+        request_statements.observe(stats.statements, route=route)
+        request_db_duration.observe(stats.duration, route=route)
+
+        record = logger.bind(
+            route=route,
+            db_statements=stats.statements,
+            db_time_ms=round(stats.duration * 1000, 2),
+            request_time_ms=round(elapsed * 1000, 2),
+        )
+
+        if repeated := stats.repeated(self.n_plus_one_threshold):
+            n_plus_one_requests.inc(route=route)
+            record.bind(repeated_statements=repeated).warning(
+                f"N_PLUS_ONE_QUERIES: {route} repeated {len(repeated)} "
+                f"statement shape(s) more than {self.n_plus_one_threshold} times"
+            )
+            return
+
+        record.debug(f"SQL_STATS: {route} executed {stats.statements} statement(s)")
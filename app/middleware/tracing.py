@@ -0,0 +1,62 @@
+"""
+Tracing middleware module
+"""
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.scope import route_name
+from app.utils import tracing
+
+
+class TracingMiddleware:
+    """
+    Starts a trace for the sampled requests, a `sample_rate` share of them
+    or those whose `traceparent` header says so, and hands its spans over
+    to the exporter once the response was sent.
+
+    Responses of sampled requests carry the trace id in X-Trace-Id.
+    """
+
+    def __init__(
+        self, app: ASGIApp, sample_rate: float, exporter: tracing.FileExporter
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled, trace_id, parent_id = tracing.should_sample(
+            Headers(scope=scope).get("traceparent"), self.sample_rate
+        )
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        root, token = tracing.start_trace(
+            f"{scope['method']} {scope['path']}",
+            trace_id,
+            parent_id,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                MutableHeaders(scope=message).append("X-Trace-Id", trace_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as err:
+            root.set_error(err)
+            raise
+        finally:
+            # the route is only known once the router matched the request
+            root.name = route_name(scope)
+            root.set_attribute("http.route", root.name.partition(" ")[2])
+            self.exporter.export(tracing.end_trace(root, token))
@@ -4,7 +4,16 @@ User models module
 import enum
 import uuid
 
-from sqlalchemy import Boolean, Column, Enum, Identity, Integer, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Enum,
+    Identity,
+    Integer,
+    String,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -50,12 +59,14 @@ class AdminUser(Base):
         Gets admin user from database based on the given id.
         """
 
-        return (
-            db.query(AdminUser)
-            .where(AdminUser.deleted_at == None)
-            .filter(AdminUser.id == primary_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(AdminUser)
+                .where(AdminUser.deleted_at == None)
+                .where(AdminUser.id == primary_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_user_id(cls, db: Session, user_id: str):
@@ -63,33 +74,39 @@ class AdminUser(Base):
         Gets admin user from database based on the given user id.
         """
 
-        return (
-            db.query(AdminUser)
-            .where(AdminUser.deleted_at == None)
-            .filter(AdminUser.user_id == user_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(AdminUser)
+                .where(AdminUser.deleted_at == None)
+                .where(AdminUser.user_id == user_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_email(cls, db: Session, email: str):
         """
         Gets admin user from database based on the given email.
         """
-        return (
-            db.query(AdminUser)
-            .where(AdminUser.deleted_at == None)
-            .filter(AdminUser.email == email)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(AdminUser)
+                .where(AdminUser.deleted_at == None)
+                .where(AdminUser.email == email)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_username(cls, db: Session, username: str):
         """
         Gets admin user from database based on the given username.
         """
-        return (
-            db.query(AdminUser)
-            .where(AdminUser.deleted_at == None)
-            .filter(AdminUser.username == username)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(AdminUser)
+                .where(AdminUser.deleted_at == None)
+                .where(AdminUser.username == username)
+                .limit(1)
+            )
+        ).first()
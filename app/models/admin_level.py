@@ -16,8 +16,9 @@ class AdminLevel(Enum):
     user = 1
 
     @classmethod
-    def is_admin(cls, level: str) -> bool:
-        return level in [cls.tt_admin.value]
+    def is_admin(cls, level) -> bool:
+        # the level of a jsonable_encoder'd admin is the enum value
+        return level in [cls.admin, cls.admin.value, cls.admin.name]
 
     def __str__(self):
         return self.name
@@ -3,8 +3,19 @@ Assets models module
 """
 import enum
 import uuid
+from typing import Dict, List, Tuple
 
-from sqlalchemy import Column, Enum, Float, Identity, Integer, String
+from sqlalchemy import (
+    Column,
+    Enum,
+    Float,
+    Identity,
+    Integer,
+    String,
+    func,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -48,17 +59,33 @@ class Assets(Base):
     volume: int = Column(Integer, nullable=False)
     market_cap: float = Column(Float, nullable=False)
 
+    public_columns = (
+        "asset_id",
+        "symbol",
+        "name",
+        "exchange",
+        "current_price",
+        "previous_close_price",
+        "open",
+        "high",
+        "low",
+        "volume",
+        "market_cap",
+    )
+
     # Relationships
     # market_data_historical = relationship(MarketDataHistorical, back_populates="assets")
 
     @classmethod
     def get_by_asset_id(cls, db: Session, asset_id: str):
-        return (
-            db.query(Assets)
-            .where(Assets.deleted_at == None)
-            .filter(Assets.asset_id == asset_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Assets)
+                .where(Assets.deleted_at == None)
+                .where(Assets.asset_id == asset_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_symbol(cls, db: Session, symbol: str, exchange: Exchange):
@@ -66,13 +93,15 @@ class Assets(Base):
         Gets all historical market data from database based on given symbol and asset type.
         """
 
-        return (
-            db.query(Assets)
-            .where(Assets.deleted_at == None)
-            .filter(Assets.symbol == symbol)
-            .filter(Assets.exchange == exchange)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Assets)
+                .where(Assets.deleted_at == None)
+                .where(Assets.symbol == symbol)
+                .where(Assets.exchange == exchange)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_name(cls, db: Session, name: str):
@@ -80,9 +109,103 @@ class Assets(Base):
         Gets all historical market data from database based on given name.
         """
 
-        return (
-            db.query(Assets)
-            .where(Assets.deleted_at == None)
-            .filter(Assets.name == name)
-            .first()
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Assets)
+                .where(Assets.deleted_at == None)
+                .where(Assets.name == name)
+                .limit(1)
+            )
+        ).first()
+
+    @classmethod
+    def read_by_asset_id(cls, db: Session, asset_id: str):
+        """
+        Reads the public columns of an asset based on given asset id.
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*Assets.projection())
+                .where(Assets.deleted_at == None)
+                .where(Assets.asset_id == asset_id)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_by_symbol(cls, db: Session, symbol: str, exchange: Exchange):
+        """
+        Reads the public columns of an asset based on given symbol and exchange.
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*Assets.projection())
+                .where(Assets.deleted_at == None)
+                .where(Assets.symbol == symbol)
+                .where(Assets.exchange == exchange)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_by_name(cls, db: Session, name: str):
+        """
+        Reads the public columns of an asset based on given name.
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*Assets.projection())
+                .where(Assets.deleted_at == None)
+                .where(Assets.name == name)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_multi(cls, db: Session):
+        """
+        Reads the public columns of all the assets.
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*Assets.projection())
+                .where(Assets.deleted_at == None)
+                .order_by(Assets.id)
+            ),
+        )
+
+    @classmethod
+    def revision(cls, db: Session) -> Tuple:
+        """
+        Returns the row count and the latest update of the assets. Soft
+        deleted rows are included as deleting a row updates it too.
+        """
+
+        return tuple(
+            db.execute(
+                lambda_stmt(lambda: select(func.count(), func.max(Assets.updated_at)))
+            ).one()
+        )
+
+    @classmethod
+    def read_names(cls, db: Session, asset_ids: List[str]) -> Dict:
+        """
+        Reads the names of the given asset ids, keyed by asset id.
+        """
+
+        rows = db.execute(
+            lambda_stmt(
+                lambda: select(Assets.asset_id, Assets.name)
+                .where(Assets.deleted_at == None)
+                .where(Assets.asset_id.in_(asset_ids))
+            )
         )
+        return dict(rows.all())
@@ -3,10 +3,11 @@ Base module for all the models
 """
 
 from datetime import datetime
-from typing import Any
+from typing import Any, Dict, Iterator, List, Tuple
 
 from sqlalchemy import Column, DateTime
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
+from sqlalchemy.orm import Session
 
 DeclarativeBase = declarative_base()
 
@@ -30,6 +31,38 @@ class Base(DeclarativeBase):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     deleted_at = Column(DateTime)
 
+    # Columns of the model's read projection. Metadata columns and password
+    # hashes are never part of it, so they don't leave the database layer.
+    public_columns: Tuple[str, ...] = ()
+
+    @classmethod
+    def projection(cls) -> List[Column]:
+        """Returns the columns of the read projection"""
+        return [getattr(cls, name) for name in cls.public_columns]
+
+    @staticmethod
+    def read_rows(db: Session, statement: Any) -> List[Dict]:
+        """Executes a projection and returns its rows as dictionaries"""
+        return [dict(row) for row in db.execute(statement).mappings()]
+
+    @staticmethod
+    def read_row(db: Session, statement: Any) -> Any:
+        """Executes a projection and returns its first row, if any"""
+        row = db.execute(statement).mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    def stream_rows(
+        db: Session, statement: Any, chunk_size: int
+    ) -> Iterator[List[Dict]]:
+        """
+        Executes a projection with a server side cursor and yields its rows
+        as dictionaries, chunk_size rows at a time
+        """
+        result = db.execute(statement, execution_options={"yield_per": chunk_size})
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
     @classmethod
     def get_searchable_fields(cls, key=None):
         """Converts searchable_fields into objects"""
@@ -2,8 +2,21 @@
 Market Data Historical models module
 """
 import uuid
+from datetime import datetime as Timestamp  # shadowed by the datetime column
+from typing import Optional, Tuple
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Identity, Integer
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    func,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -18,6 +31,14 @@ class MarketDataHistorical(Base):
     """
 
     __tablename__ = "market_data_historical"
+    # serves the lookups by asset and time range, ordered by datetime
+    __table_args__ = (
+        Index(
+            "ix_market_data_historical_asset_id_datetime",
+            "asset_id",
+            "datetime",
+        ),
+    )
 
     id: int = Column(
         Integer,
@@ -46,6 +67,17 @@ class MarketDataHistorical(Base):
     close: float = Column(Float, nullable=False)
     volume: int = Column(Integer, nullable=False)
 
+    public_columns = (
+        "market_data_historical_id",
+        "asset_id",
+        "datetime",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+    )
+
     # Relationships
     # asset = relationship(Assets, back_populates="market_data_historical")
 
@@ -53,24 +85,95 @@ class MarketDataHistorical(Base):
     def get_by_market_data_historical_id(
         cls, db: Session, market_data_historical_id: str
     ):
-        return (
-            db.query(MarketDataHistorical)
-            .where(MarketDataHistorical.deleted_at == None)
-            .filter(
-                MarketDataHistorical.market_data_historical_id
-                == market_data_historical_id
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(MarketDataHistorical)
+                .where(MarketDataHistorical.deleted_at == None)
+                .where(
+                    MarketDataHistorical.market_data_historical_id
+                    == market_data_historical_id
+                )
+                .limit(1)
             )
-            .first()
-        )
+        ).first()
 
     @classmethod
     def get_by_asset_id(cls, db: Session, asset_id: str):
         """
         Gets historical data based on given asset id
         """
-        return (
-            db.query(MarketDataHistorical)
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(MarketDataHistorical)
+                .where(MarketDataHistorical.deleted_at == None)
+                .where(MarketDataHistorical.asset_id == asset_id)
+            )
+        ).all()
+
+    @classmethod
+    def read_by_asset_id(
+        cls,
+        db: Session,
+        asset_id: str,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+    ):
+        """
+        Reads the public columns of the historical data of a given asset id,
+        optionally within [start, end], ordered by datetime
+        """
+        statement = lambda_stmt(
+            lambda: select(*MarketDataHistorical.projection())
             .where(MarketDataHistorical.deleted_at == None)
-            .filter(MarketDataHistorical.asset_id == asset_id)
-            .all()
+            .where(MarketDataHistorical.asset_id == asset_id)
+            .order_by(MarketDataHistorical.datetime)
         )
+        statement = cls.within(statement, start, end)
+        return cls.read_rows(db, statement)
+
+    @classmethod
+    def read_ticks(cls, db: Session, asset_id: str, after: Timestamp):
+        """
+        Reads the (datetime, close) of the historical data of a given asset id
+        after a given datetime, ordered by datetime
+        """
+        return db.execute(
+            lambda_stmt(
+                lambda: select(
+                    MarketDataHistorical.datetime, MarketDataHistorical.close
+                )
+                .where(MarketDataHistorical.deleted_at == None)
+                .where(MarketDataHistorical.asset_id == asset_id)
+                .where(MarketDataHistorical.datetime > after)
+                .order_by(MarketDataHistorical.datetime)
+            )
+        ).all()
+
+    @classmethod
+    def revision(
+        cls,
+        db: Session,
+        asset_id: str,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+    ) -> Tuple:
+        """
+        Returns the row count and the latest update of the historical data
+        of a given asset id. Soft deleted rows are included as deleting a
+        row updates it too.
+        """
+        statement = lambda_stmt(
+            lambda: select(
+                func.count(), func.max(MarketDataHistorical.updated_at)
+            ).where(MarketDataHistorical.asset_id == asset_id)
+        )
+        statement = cls.within(statement, start, end)
+        return tuple(db.execute(statement).one())
+
+    @staticmethod
+    def within(statement, start: Optional[Timestamp], end: Optional[Timestamp]):
+        if start is not None:
+            statement += lambda s: s.where(MarketDataHistorical.datetime >= start)
+        if end is not None:
+            statement += lambda s: s.where(MarketDataHistorical.datetime <= end)
+        return statement
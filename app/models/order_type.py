@@ -8,8 +8,13 @@ from enum import Enum
 
 class OrderType(Enum):
     """
-    Enum class for order types (buy/sell)
+    Enum class for order types. Stop, stop limit, take profit and trailing
+    stop orders rest until the price of their asset triggers them.
     """
 
     MARKET = "market"
     LIMIT = "limit"
+    STOP = "stop"
+    STOP_LIMIT = "stop_limit"
+    TAKE_PROFIT = "take_profit"
+    TRAILING_STOP = "trailing_stop"
@@ -4,7 +4,16 @@ Portfolio models module
 
 import uuid
 
-from sqlalchemy import Column, Float, ForeignKey, Identity, Integer, String
+from sqlalchemy import (
+    Column,
+    Float,
+    ForeignKey,
+    Identity,
+    Integer,
+    String,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -38,10 +47,13 @@ class Portfolio(Base):
         UUID(as_uuid=True),
         ForeignKey("user.user_id"),
         nullable=False,
+        index=True,
     )
     name: str = Column(String(50), nullable=False)
     balance: float = Column(Float, nullable=False, default=1000)
 
+    public_columns = ("portfolio_id", "user_id", "name", "balance")
+
     # Relationships
     # portfolio_stocks = relationship("Portfolio_Stock", back_populates="portfolio")
 
@@ -51,12 +63,14 @@ class Portfolio(Base):
         Gets portfolio from database based on a given portfolio id.
         """
 
-        return (
-            db.query(Portfolio)
-            .where(Portfolio.deleted_at == None)
-            .filter(Portfolio.portfolio_id == portfolio_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Portfolio)
+                .where(Portfolio.deleted_at == None)
+                .where(Portfolio.portfolio_id == portfolio_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_portfolio_by_user_id(cls, db: Session, user_id: str):
@@ -64,9 +78,41 @@ class Portfolio(Base):
         Gets all portfolio from database based on a given user id.
         """
 
-        return (
-            db.query(Portfolio)
-            .where(Portfolio.deleted_at == None)
-            .filter(Portfolio.user_id == user_id)
-            .all()
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Portfolio)
+                .where(Portfolio.deleted_at == None)
+                .where(Portfolio.user_id == user_id)
+            )
+        ).all()
+
+    @classmethod
+    def read_by_portfolio_id(cls, db: Session, portfolio_id: str):
+        """
+        Reads the public columns of a portfolio based on a given portfolio id.
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*Portfolio.projection())
+                .where(Portfolio.deleted_at == None)
+                .where(Portfolio.portfolio_id == portfolio_id)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_by_user_id(cls, db: Session, user_id: str):
+        """
+        Reads the public columns of all portfolios of a given user id.
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*Portfolio.projection())
+                .where(Portfolio.deleted_at == None)
+                .where(Portfolio.user_id == user_id)
+            ),
         )
@@ -4,8 +4,19 @@ Portfolio Stock models module
 
 import uuid
 from datetime import datetime
-
-from sqlalchemy import Column, DateTime, ForeignKey, Identity, Integer, Numeric, String
+from typing import List
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Identity,
+    Integer,
+    Numeric,
+    String,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -40,13 +51,17 @@ class PortfolioStock(Base):
     )
 
     portfolio_id: str = Column(
-        UUID(as_uuid=True), ForeignKey("portfolio.portfolio_id"), nullable=False
+        UUID(as_uuid=True),
+        ForeignKey("portfolio.portfolio_id"),
+        nullable=False,
+        index=True,
     )
 
     asset_id: str = Column(
         UUID(as_uuid=True),
         ForeignKey("assets.asset_id"),
         nullable=False,
+        index=True,
     )
     asset_name: str = Column(String(50), nullable=False)
     quantity: int = Column(Integer, nullable=False)
@@ -56,6 +71,17 @@ class PortfolioStock(Base):
     purchase_price: Numeric = Column(Numeric(10, 2), nullable=False)
     total_investment: Numeric = Column(Numeric(10, 2), nullable=False)
 
+    public_columns = (
+        "portfolio_stock_id",
+        "portfolio_id",
+        "asset_id",
+        "asset_name",
+        "quantity",
+        "purchase_date",
+        "purchase_price",
+        "total_investment",
+    )
+
     # Relationships
     # portfolio = relationship("Portfolio", back_populates="portfolio_stocks")
     # transactions = relationship("Transaction", back_populates="portfolio_stocks")
@@ -66,12 +92,14 @@ class PortfolioStock(Base):
         Gets portfolio stock from database based on a given portfolio id.
         """
 
-        return (
-            db.query(PortfolioStock)
-            .where(PortfolioStock.deleted_at == None)
-            .filter(PortfolioStock.portfolio_stock_id == portfolio_stock_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(PortfolioStock)
+                .where(PortfolioStock.deleted_at == None)
+                .where(PortfolioStock.portfolio_stock_id == portfolio_stock_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_portfolio_id(cls, db: Session, portfolio_id: str):
@@ -79,12 +107,13 @@ class PortfolioStock(Base):
         Gets all portfolio from database based on a given portfolio id.
         """
 
-        return (
-            db.query(PortfolioStock)
-            .where(PortfolioStock.deleted_at == None)
-            .filter(PortfolioStock.portfolio_id == portfolio_id)
-            .all()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(PortfolioStock)
+                .where(PortfolioStock.deleted_at == None)
+                .where(PortfolioStock.portfolio_id == portfolio_id)
+            )
+        ).all()
 
     @classmethod
     def get_by_asset_id(cls, db: Session, asset_id: str):
@@ -92,9 +121,42 @@ class PortfolioStock(Base):
         Gets all portfolio from database based on a given portfolio id.
         """
 
-        return (
-            db.query(PortfolioStock)
-            .where(PortfolioStock.deleted_at == None)
-            .filter(PortfolioStock.asset_id == asset_id)
-            .all()
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(PortfolioStock)
+                .where(PortfolioStock.deleted_at == None)
+                .where(PortfolioStock.asset_id == asset_id)
+            )
+        ).all()
+
+    @classmethod
+    def read_by_portfolio_stock_id(cls, db: Session, portfolio_stock_id: str):
+        """
+        Reads the public columns of a portfolio stock based on a given id.
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*PortfolioStock.projection())
+                .where(PortfolioStock.deleted_at == None)
+                .where(PortfolioStock.portfolio_stock_id == portfolio_stock_id)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_by_portfolio_ids(cls, db: Session, portfolio_ids: List[str]):
+        """
+        Reads the public columns of all portfolio stocks of the given
+        portfolio ids with a single query.
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*PortfolioStock.projection())
+                .where(PortfolioStock.deleted_at == None)
+                .where(PortfolioStock.portfolio_id.in_(portfolio_ids))
+            ),
         )
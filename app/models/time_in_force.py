@@ -0,0 +1,17 @@
+"""
+Time In Force model
+Enum type of the times in force of an order
+"""
+
+from enum import Enum
+
+
+class TimeInForce(Enum):
+    """
+    Enum class for how long a pending order rests: until the end of the
+    trading day, until cancelled, or until a given date
+    """
+
+    DAY = "day"
+    GTC = "gtc"
+    GTD = "gtd"
@@ -5,13 +5,31 @@ Transaction models module
 import enum
 import uuid
 from datetime import datetime
+from typing import List
 
-from sqlalchemy import Column, DateTime, Enum, Float, ForeignKey, Identity, Integer
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    lambda_stmt,
+    or_,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
 from app.models import Base
+from app.models.assets import Assets
 from app.models.order_type import OrderType
+from app.models.portfolio import Portfolio
+from app.models.time_in_force import TimeInForce
 from app.models.transaction_status import TransactionStatus
 from app.models.transaction_type import TransactionType
 
@@ -24,6 +42,33 @@ class Transaction(Base):
     """
 
     __tablename__ = "transaction"
+    # serves the lookups by portfolio and their ordering by date
+    __table_args__ = (
+        Index(
+            "ix_transaction_portfolio_id_transaction_date",
+            "portfolio_id",
+            "transaction_date",
+            "id",
+        ),
+        # the trigger orders by last change, whatever their status, for the
+        # trigger book to follow their changes
+        Index(
+            "ix_transaction_trigger_changes",
+            "updated_at",
+            postgresql_where=text(
+                "order_type IN ('STOP', 'STOP_LIMIT', 'TAKE_PROFIT', 'TRAILING_STOP')"
+            ),
+        ),
+        # the resting orders which expire, by last change, for the scheduler
+        Index(
+            "ix_transaction_pending_expiries",
+            "updated_at",
+            postgresql_where=text(
+                "transaction_status = 'PENDING' AND deleted_at IS NULL AND"
+                " expires_at IS NOT NULL"
+            ),
+        ),
+    )
 
     id: int = Column(
         Integer,
@@ -54,6 +99,7 @@ class Transaction(Base):
         UUID(as_uuid=True),
         ForeignKey("assets.asset_id"),
         nullable=False,
+        index=True,
     )
 
     transaction_type: enum = Column(Enum(TransactionType), nullable=False)
@@ -65,7 +111,38 @@ class Transaction(Base):
     quantity: int = Column(Integer, nullable=False)
     order_type: enum = Column(Enum(OrderType), nullable=False)
     limit_price: float = Column(Float, nullable=True)
+    # trigger price of stop, stop limit and take profit orders, current stop
+    # of trailing stops which follow the price at trail_amount
+    stop_price: float = Column(Float, nullable=True)
+    trail_amount: float = Column(Float, nullable=True)
     transaction_value = Column(Float, nullable=False)
+    time_in_force: enum = Column(
+        Enum(TimeInForce),
+        default=TimeInForce.GTC,
+        server_default=TimeInForce.GTC.name,
+        nullable=False,
+    )
+    # when a pending DAY or GTD order is cancelled, none for GTC orders
+    expires_at: datetime = Column(DateTime, nullable=True)
+
+    public_columns = (
+        "transaction_id",
+        "portfolio_id",
+        "asset_id",
+        "transaction_type",
+        "transaction_status",
+        "transaction_date",
+        "transaction_price",
+        "quantity",
+        "order_type",
+        "limit_price",
+        "stop_price",
+        "trail_amount",
+        "transaction_value",
+        "time_in_force",
+        "expires_at",
+    )
+    export_fields = public_columns + ("portfolio_name", "asset_name")
 
     # Relationships
     # portfolio_stock = relationship("PortfolioStock", back_populates="transactions")
@@ -76,12 +153,14 @@ class Transaction(Base):
         Gets transaction from database based on a given transaction id
         """
 
-        return (
-            db.query(Transaction)
-            .where(Transaction.deleted_at == None)
-            .filter(Transaction.transaction_id == transaction_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Transaction)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.transaction_id == transaction_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_portfolio_id(cls, db: Session, portfolio_id: str):
@@ -89,12 +168,13 @@ class Transaction(Base):
         Gets all transaction from database based on a given portfolio id
         """
 
-        return (
-            db.query(Transaction)
-            .where(Transaction.deleted_at == None)
-            .filter(Transaction.portfolio_id == portfolio_id)
-            .all()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Transaction)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.portfolio_id == portfolio_id)
+            )
+        ).all()
 
     @classmethod
     def get_by_asset_id(cls, db: Session, asset_id: str):
@@ -102,9 +182,266 @@ class Transaction(Base):
         Gets all transaction from database based on a given asset id
         """
 
-        return (
-            db.query(Transaction)
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(Transaction)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.asset_id == asset_id)
+            )
+        ).all()
+
+    @classmethod
+    def read_by_transaction_id(cls, db: Session, transaction_id: str):
+        """
+        Reads the public columns of a transaction based on a given transaction id
+        """
+
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*Transaction.projection())
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.transaction_id == transaction_id)
+                .limit(1)
+            ),
+        )
+
+    @classmethod
+    def read_by_portfolio_ids(cls, db: Session, portfolio_ids: List[str]):
+        """
+        Reads the public columns of all transactions of the given portfolio
+        ids with a single query
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*Transaction.projection())
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.portfolio_id.in_(portfolio_ids))
+            ),
+        )
+
+    @classmethod
+    def read_triggers_since(cls, db: Session, updated_after: datetime):
+        """
+        Reads the stop, stop limit, take profit and trailing stop orders
+        changed after the given time, whatever their status, with their
+        status and deletion time
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(
+                    *Transaction.trigger_columns(),
+                    Transaction.transaction_status,
+                    Transaction.deleted_at,
+                )
+                .where(
+                    Transaction.order_type.in_(
+                        ["STOP", "STOP_LIMIT", "TAKE_PROFIT", "TRAILING_STOP"]
+                    )
+                )
+                .where(Transaction.updated_at > updated_after)
+            ),
+        )
+
+    @classmethod
+    def stream_pending_triggers(cls, db: Session, chunk_size: int):
+        """
+        Streams the resting stop, stop limit, take profit and trailing stop
+        orders, in chunks
+        """
+
+        return cls.stream_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*Transaction.trigger_columns())
+                .where(Transaction.transaction_status == TransactionStatus.PENDING)
+                .where(Transaction.deleted_at == None)
+                .where(
+                    Transaction.order_type.in_(
+                        ["STOP", "STOP_LIMIT", "TAKE_PROFIT", "TRAILING_STOP"]
+                    )
+                )
+            ),
+            chunk_size,
+        )
+
+    @classmethod
+    def trigger_columns(cls) -> List:
+        """
+        Returns the columns the trigger book keeps of a resting order
+        """
+        return [
+            cls.id,
+            cls.transaction_id,
+            cls.asset_id,
+            cls.transaction_type,
+            cls.order_type,
+            cls.transaction_price,
+            cls.quantity,
+            cls.limit_price,
+            cls.stop_price,
+            cls.trail_amount,
+            cls.updated_at,
+        ]
+
+    @classmethod
+    def update_if_unchanged(
+        cls, db: Session, transaction_id: str, updated_at: datetime, values: dict
+    ) -> bool:
+        """
+        Updates a pending transaction unless it changed since updated_at,
+        e.g. it was cancelled or triggered by another worker. Returns whether
+        it was updated.
+        """
+
+        result = db.execute(
+            update(Transaction)
+            .where(Transaction.transaction_id == transaction_id)
+            .where(Transaction.transaction_status == TransactionStatus.PENDING)
+            .where(Transaction.deleted_at == None)
+            .where(Transaction.updated_at == updated_at)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def ratchet_trailing_stops(
+        cls, db: Session, ids: List[int], best_price: float, falls: bool
+    ) -> int:
+        """
+        Moves the stop of the given pending trailing stops to trail_amount
+        from the best price seen, the high of selling stops and the low of
+        buying ones, unless it's already past it. updated_at is left as is:
+        every worker ratchets the stops alike, and it's the version fire()
+        checks. Returns the number of stops moved.
+        """
+
+        if falls:
+            stop = best_price - Transaction.trail_amount
+            behind = Transaction.stop_price < stop
+        else:
+            stop = best_price + Transaction.trail_amount
+            behind = Transaction.stop_price > stop
+        result = db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(ids))
+            .where(Transaction.transaction_status == TransactionStatus.PENDING)
+            .where(Transaction.deleted_at == None)
+            .where(or_(Transaction.stop_price == None, behind))
+            .values(stop_price=stop, updated_at=Transaction.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @classmethod
+    def stream_expiring(cls, db: Session, chunk_size: int):
+        """
+        Streams the id and expiry of all pending orders which expire, in
+        chunks
+        """
+
+        return cls.stream_rows(
+            db,
+            lambda_stmt(
+                lambda: select(Transaction.id, Transaction.expires_at)
+                .where(Transaction.transaction_status == TransactionStatus.PENDING)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.expires_at != None)
+            ),
+            chunk_size,
+        )
+
+    @classmethod
+    def read_expiring_since(cls, db: Session, updated_after: datetime):
+        """
+        Reads the id, expiry and last change of the pending orders which
+        expire and changed after the given time
+        """
+
+        return cls.read_rows(
+            db,
+            lambda_stmt(
+                lambda: select(
+                    Transaction.id, Transaction.expires_at, Transaction.updated_at
+                )
+                .where(Transaction.transaction_status == TransactionStatus.PENDING)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.expires_at != None)
+                .where(Transaction.updated_at > updated_after)
+            ),
+        )
+
+    @classmethod
+    def cancel_expired(cls, db: Session, ids: List[int], now: datetime) -> int:
+        """
+        Cancels the pending orders of the given ids which expired by now,
+        with a single statement. Returns the number of orders cancelled.
+        """
+
+        result = db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(ids))
+            .where(Transaction.transaction_status == TransactionStatus.PENDING)
             .where(Transaction.deleted_at == None)
-            .filter(Transaction.asset_id == asset_id)
-            .all()
+            .where(Transaction.expires_at <= now)
+            .values(transaction_status=TransactionStatus.CANCELLED)
+            .execution_options(synchronize_session=False)
         )
+        return result.rowcount
+
+    @classmethod
+    def export_columns(cls) -> List:
+        """
+        Returns the columns of an export row: the read projection plus the
+        names of the transaction's portfolio and asset
+        """
+        return [
+            *cls.projection(),
+            Portfolio.name.label("portfolio_name"),
+            Assets.name.label("asset_name"),
+        ]
+
+    @classmethod
+    def stream_by_portfolio_id(cls, db: Session, portfolio_id: str, chunk_size: int):
+        """
+        Streams the export rows of all transactions of a given portfolio id
+        in chunks, oldest first
+        """
+
+        return cls.stream_rows(
+            db,
+            lambda_stmt(
+                lambda: select(*Transaction.export_columns())
+                .join(Portfolio, Portfolio.portfolio_id == Transaction.portfolio_id)
+                .outerjoin(Assets, Assets.asset_id == Transaction.asset_id)
+                .where(Transaction.deleted_at == None)
+                .where(Transaction.portfolio_id == portfolio_id)
+                .order_by(Transaction.transaction_date, Transaction.id)
+            ),
+            chunk_size,
+        )
+
+    @classmethod
+    def stream_by_user_id(cls, db: Session, user_id: str, chunk_size: int):
+        """
+        Streams the export rows of all transactions of a given user id, i.e.
+        of all the user's portfolios, in chunks, portfolio by portfolio and
+        oldest first. Each portfolio's rows come in the order of the portfolio
+        index of the transactions, rather than all of them sorted at once
+        """
+
+        portfolio_ids = db.scalars(
+            lambda_stmt(
+                lambda: select(Portfolio.portfolio_id)
+                .where(Portfolio.deleted_at == None)
+                .where(Portfolio.user_id == user_id)
+                .order_by(Portfolio.created_at, Portfolio.id)
+            )
+        ).all()
+        for portfolio_id in portfolio_ids:
+            yield from cls.stream_by_portfolio_id(db, portfolio_id, chunk_size)
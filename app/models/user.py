@@ -4,7 +4,16 @@ User models module
 
 import uuid
 
-from sqlalchemy import Boolean, Column, Enum, Identity, Integer, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Enum,
+    Identity,
+    Integer,
+    String,
+    lambda_stmt,
+    select,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 
@@ -40,27 +49,48 @@ class User(Base):
     is_active: bool = Column(Boolean, default=True)
     profile_status = Column(Enum(ProfileStatus), nullable=True)
 
+    public_columns = ("user_id", "full_name", "email", "is_active", "profile_status")
+
     @classmethod
     def get_by_user_id(cls, db: Session, user_id: str):
         """
         Gets user from database based on the given user id.
         """
 
-        return (
-            db.query(User)
-            .where(User.deleted_at == None)
-            .filter(User.user_id == user_id)
-            .first()
-        )
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(User)
+                .where(User.deleted_at == None)
+                .where(User.user_id == user_id)
+                .limit(1)
+            )
+        ).first()
 
     @classmethod
     def get_by_email(cls, db: Session, email: str):
         """
         Gets user from database based on the given email.
         """
-        return (
-            db.query(User)
-            .where(User.deleted_at == None)
-            .filter(User.email == email)
-            .first()
+        return db.scalars(
+            lambda_stmt(
+                lambda: select(User)
+                .where(User.deleted_at == None)
+                .where(User.email == email)
+                .limit(1)
+            )
+        ).first()
+
+    @classmethod
+    def read_by_email(cls, db: Session, email: str):
+        """
+        Reads the public columns of the user with the given email.
+        """
+        return cls.read_row(
+            db,
+            lambda_stmt(
+                lambda: select(*User.projection())
+                .where(User.deleted_at == None)
+                .where(User.email == email)
+                .limit(1)
+            ),
         )
@@ -8,6 +8,7 @@ from typing import Any, Optional
 from pydantic import BaseModel, Field
 
 from app.models.order_type import OrderType
+from app.models.time_in_force import TimeInForce
 from app.models.transaction_status import TransactionStatus
 from app.models.transaction_type import TransactionType
 
@@ -27,7 +28,11 @@ class TransactionBase(BaseModel):
     quantity: Optional[str] = None
     order_type: Optional[OrderType] = None
     limit_price: Optional[str] = None
+    stop_price: Optional[str] = None
+    trail_amount: Optional[str] = None
     transaction_value: Optional[str] = None
+    time_in_force: Optional[TimeInForce] = None
+    expires_at: Optional[datetime] = None
 
 
 class TransactionResponseBase(BaseModel):
@@ -56,7 +61,11 @@ class GetTransactionResponse(TransactionResponseBase):
                     "quantity": 10,
                     "order_type": "market",
                     "limit_price": "",
+                    "stop_price": "",
+                    "trail_amount": "",
                     "transaction_value": 235,
+                    "time_in_force": "gtc",
+                    "expires_at": "",
                 },
             }
         }
@@ -76,7 +85,12 @@ class CreateTransaction(TransactionBase):
     quantity: int = Field(...)
     order_type: str = Field(...)
     limit_price: Optional[float] = None
+    stop_price: Optional[float] = None
+    trail_amount: Optional[float] = None
     transaction_value: float = Field(...)
+    # GTC by default, expires_at is set for DAY orders and given for GTD ones
+    time_in_force: str = TimeInForce.GTC.name
+    expires_at: Optional[datetime] = None
 
     class Config:
         schema_extra = {
@@ -89,7 +103,11 @@ class CreateTransaction(TransactionBase):
                 "quantity": 10,
                 "order_type": "MARKET",
                 "limit_price": None,
+                "stop_price": None,
+                "trail_amount": None,
                 "transaction_value": 235,
+                "time_in_force": "GTC",
+                "expires_at": None,
             }
         }
 
@@ -113,7 +131,11 @@ class CreateTransactionResponse(TransactionResponseBase):
                     "quantity": 10,
                     "order_type": "market",
                     "limit_price": "",
+                    "stop_price": "",
+                    "trail_amount": "",
                     "transaction_value": 235,
+                    "time_in_force": "gtc",
+                    "expires_at": "",
                 },
             }
         }
@@ -134,7 +156,11 @@ class UpdateTransaction(TransactionBase):
     quantity: Optional[str] = None
     order_type: Optional[str] = None
     limit_price: Optional[str] = None
+    stop_price: Optional[str] = None
+    trail_amount: Optional[str] = None
     transaction_value: Optional[str] = None
+    time_in_force: Optional[str] = None
+    expires_at: Optional[datetime] = None
 
     class Config:
         schema_extra = {
@@ -148,7 +174,11 @@ class UpdateTransaction(TransactionBase):
                 "quantity": 10,
                 "order_type": "MARKET",
                 "limit_price": "",
+                "stop_price": "",
+                "trail_amount": "",
                 "transaction_value": 235,
+                "time_in_force": "GTC",
+                "expires_at": "",
             }
         }
 
@@ -172,7 +202,11 @@ class UpdateTransactionResponse(TransactionResponseBase):
                     "quantity": 10,
                     "order_type": "market",
                     "limit_price": "",
+                    "stop_price": "",
+                    "trail_amount": "",
                     "transaction_value": 235,
+                    "time_in_force": "gtc",
+                    "expires_at": "",
                 },
             }
         }
@@ -2,40 +2,180 @@
 
 import sys
 
-import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from loguru import logger
 
-from app.api.v1 import api_router
 from app.core import settings
 
-app = FastAPI(title=settings.PROJECT_NAME)
-
 origins = ["*"]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+VALID_ENVS = ["local", "dev", "stg", "prd"]
 
-app.include_router(api_router)
 
-VALID_ENVS = ["local", "dev", "stg", "prd"]
-ENV = settings.ENVIRONMENT
+def create_app() -> FastAPI:
+    """
+    Application factory.
+    Settings are read, and the API routers and middlewares imported, only
+    when the app is created. Nothing touches the database until the first
+    request, or the first run of the order expiry scheduler.
+    """
+    # pylint: disable=import-outside-toplevel
+    from app.api.v1 import include_routers
+    from app.middleware import (
+        AdmissionMiddleware,
+        CompressionMiddleware,
+        MetricsMiddleware,
+        ProfilingMiddleware,
+        RateLimitMiddleware,
+        RequestContextMiddleware,
+        SQLStatsMiddleware,
+        TracingMiddleware,
+    )
+    from app.utils.log_config import configure_logging
+    from app.utils.rate_limit import create_store
+    from app.utils.responses import FastJSONResponse
+    from app.utils.tracing import FileExporter
+
+    configure_logging()
+
+    env = settings.ENVIRONMENT
+
+    if env not in VALID_ENVS:
+        logger.error(
+            f"{env} is not a valid value for environment, supported values: {VALID_ENVS}"
+        )
+        sys.exit(1)
+
+    application = FastAPI(
+        title=settings.PROJECT_NAME, default_response_class=FastJSONResponse
+    )
+
+    # innermost, the profile covers the handling of the request only
+    if settings.PROFILING_ENABLED and env != "prd":
+        application.add_middleware(
+            ProfilingMiddleware, output_dir=settings.PROFILE_OUTPUT_DIR
+        )
+
+    application.add_middleware(
+        SQLStatsMiddleware,
+        n_plus_one_threshold=settings.SQL_N_PLUS_ONE_THRESHOLD,
+        expose_headers=env != "prd",
+    )
+
+    application.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+
+    # requests are shed before any other work is done for them
+    if settings.ADMISSION_CONTROL:
+        application.add_middleware(
+            AdmissionMiddleware,
+            budgets=settings.ADMISSION_BUDGETS,
+            route_classes=settings.ADMISSION_ROUTE_CLASSES,
+            default_class=settings.ADMISSION_DEFAULT_CLASS,
+            retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+        )
+
+    # rate limited requests never take an admission slot
+    if settings.RATE_LIMIT:
+        application.add_middleware(
+            RateLimitMiddleware,
+            rules=settings.RATE_LIMITS,
+            store=create_store(
+                settings.RATE_LIMIT_STORE,
+                settings.RATE_LIMIT_STORE_PATH,
+                idle_seconds=max(
+                    [rule["period"] for rule in settings.RATE_LIMITS.values()],
+                    default=0,
+                ),
+            ),
+        )
+
+    if settings.TRACING_ENABLED:
+        application.add_middleware(
+            TracingMiddleware,
+            sample_rate=settings.TRACING_SAMPLE_RATE,
+            exporter=FileExporter(
+                settings.TRACING_EXPORT_PATH, settings.TRACING_SERVICE_NAME
+            ),
+        )
+
+    # every response is recorded, including shed and rate limited ones
+    application.add_middleware(MetricsMiddleware)
+
+    # outermost but CORS, every log record of a request carries its id
+    application.add_middleware(RequestContextMiddleware)
 
-if ENV not in VALID_ENVS:
-    logger.error(
-        f"{ENV} is not a valid value for environment, supported values: {VALID_ENVS}"
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
     )
-    sys.exit(1)
 
-logger.info(f"ENVIRONMENT is set to {ENV} and running on {settings.PORT}")
+    include_routers(application)
+
+    if settings.LOOP_MONITOR_ENABLED:
+        add_loop_monitor(application, env)
+
+    if settings.ORDER_TRIGGERS_ENABLED:
+        add_trigger_engine(application)
+
+    if settings.ORDER_EXPIRY_ENABLED:
+        add_expiry_scheduler(application)
+
+    if env in VALID_ENVS[:3]:
+        add_documentation_routes(application)
+
+    logger.info(f"ENVIRONMENT is set to {env} and running on {settings.PORT}")
+
+    return application
+
+
+def add_loop_monitor(application: FastAPI, env: str) -> None:
+    # pylint: disable=import-outside-toplevel
+    from app.utils.loop_monitor import LoopMonitor
+
+    capture_stacks = settings.LOOP_BLOCKED_STACKS
+    if capture_stacks is None:
+        capture_stacks = env in VALID_ENVS[:2]
+
+    # started on the event loop of each worker
+    monitor = LoopMonitor(
+        interval=settings.LOOP_MONITOR_INTERVAL,
+        threshold=settings.LOOP_BLOCKED_THRESHOLD_MS / 1000,
+        capture_stacks=capture_stacks,
+    )
+    application.add_event_handler("startup", monitor.start)
+    application.add_event_handler("shutdown", monitor.stop)
+
+
+def add_trigger_engine(application: FastAPI) -> None:
+    # pylint: disable=import-outside-toplevel
+    from app.trading import trigger_engine
+
+    # the book is loaded in the background, bars are evaluated once it is
+    application.add_event_handler("startup", trigger_engine.start)
+    application.add_event_handler("shutdown", trigger_engine.stop)
+
+
+def add_expiry_scheduler(application: FastAPI) -> None:
+    # pylint: disable=import-outside-toplevel
+    from app.trading import ExpiryScheduler
+
+    # started in each worker, the one holding the leader lock expires orders
+    scheduler = ExpiryScheduler(
+        interval=settings.ORDER_EXPIRY_INTERVAL,
+        batch_size=settings.ORDER_EXPIRY_BATCH_SIZE,
+    )
+    application.add_event_handler("startup", scheduler.start)
+    application.add_event_handler("shutdown", scheduler.stop)
 
 
 # For local/dev/stg env:
@@ -43,46 +183,71 @@ logger.info(f"ENVIRONMENT is set to {ENV} and running on {settings.PORT}")
 #   endpoints are overridden as following. API documentation can be
 #   browsed using basic auth.
 
+
 # For production env:
 #   > API documentation urls are disabled
 # ----------------------------------------------------------------
-if ENV in VALID_ENVS[:3]:
-    # pylint: disable=unused-argument
+def add_documentation_routes(application: FastAPI) -> None:
+    # pylint: disable=unused-argument,unused-variable
 
-    @app.get("/", include_in_schema=False)
+    @application.get("/", include_in_schema=False)
     async def get_root():
         return {
             "status": True,
             "message": "Welcome to the Paper Trade API service. Authenticate to proceed further.",
         }
 
-    @app.get("/apidoc", include_in_schema=False)
+    @application.get("/apidoc", include_in_schema=False)
     async def get_swagger_documentation():
         return get_swagger_ui_html(
             openapi_url="/openapi.json", title=settings.PROJECT_NAME
         )
 
-    @app.get("/redoc", include_in_schema=False)
+    @application.get("/redoc", include_in_schema=False)
     async def get_redoc_documentation():
         return get_redoc_html(openapi_url="/openapi.json", title=settings.PROJECT_NAME)
 
-    @app.get("/openapi.json", include_in_schema=False)
+    @application.get("/openapi.json", include_in_schema=False)
     async def openapi():
         return get_openapi(
-            title=settings.PROJECT_NAME, version=settings.VERSION, routes=app.routes
+            title=settings.PROJECT_NAME,
+            version=settings.VERSION,
+            routes=application.routes,
         )
 
 
+def __getattr__(name: str):
+    # `app.server:app` keeps working, the app is created on first access
+    if name == "app":
+        application = globals()["app"] = create_app()
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def init_server() -> None:
     """
     Configure logging and log format.
     Spin up the server.
+
+    > local: a single uvicorn process which reloads on code changes.
+    > dev/stg/prd: the pre-fork multi-worker server of app.workers.
     """
+    # pylint: disable=import-outside-toplevel
+
+    if settings.ENVIRONMENT != "local":
+        from app.workers import run_prefork_server
+
+        run_prefork_server()
+        return
+
+    import uvicorn
 
     # Run the server
     uvicorn.run(
-        "app.server:app",
+        "app.server:create_app",
+        factory=True,
         host="0.0.0.0",
         port=int(settings.PORT),
         reload=True,
+        log_config=None,
     )
@@ -1,16 +1,29 @@
 """Database initialisation and migration module"""
 
-from typing import Optional
+import re
+from pathlib import Path
+from typing import Optional, Set
 
-from alembic import command
-from alembic.config import Config
-from app.db.session import initialise
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from app.core import settings
+from app.db.session import get_engine, initialise
+
+REVISION_PATTERN = re.compile(
+    r"^(down_revision|revision)\s*=\s*(?:[\"']([0-9a-z_]+)[\"']|None)", re.MULTILINE
+)
 
 
 def run_migrations(script_location: str, db_url: Optional[str]) -> None:
     """
     Runs migrations
     """
+    # alembic is only imported when there's something to migrate
+    # pylint: disable=import-outside-toplevel
+    from alembic import command
+    from alembic.config import Config
 
     alembic_cfg = Config()
     alembic_cfg.set_main_option("script_location", script_location)
@@ -18,8 +31,54 @@ def run_migrations(script_location: str, db_url: Optional[str]) -> None:
     command.upgrade(alembic_cfg, "head")
 
 
+def head_revisions(script_location: str) -> Set[str]:
+    """
+    Returns the head revisions of the migration scripts, i.e. revisions no
+    other script revises. The scripts are scanned as plain text, which is a
+    lot cheaper than loading alembic's script directory.
+    """
+    revisions, down_revisions = set(), set()
+    for script in Path(script_location, "versions").glob("*.py"):
+        for name, revision in REVISION_PATTERN.findall(script.read_text()):
+            if name == "revision":
+                revisions.add(revision)
+            elif revision:
+                down_revisions.add(revision)
+    return revisions - down_revisions
+
+
+def current_revisions() -> Set[str]:
+    """
+    Returns the revisions the database is at, none for a fresh database.
+    """
+    with get_engine().connect() as connection:
+        try:
+            rows = connection.execute(text("SELECT version_num FROM alembic_version"))
+            return {row.version_num for row in rows}
+        except ProgrammingError:
+            return set()
+
+
+def migrate() -> None:
+    """
+    Upgrades the database to head unless it's already there.
+    """
+    script_location = settings.MIGRATION_SCRIPT_LOCATION
+    if current_revisions() == head_revisions(script_location):
+        logger.info("Database is already at head. Nothing to migrate!")
+        return
+
+    run_migrations(script_location, settings.DB_URL)
+
+
 def init_db() -> None:
     """
-    Initialises database engine.
+    Initialises database engine, migrates the database and seeds the
+    initial data. Both steps only do work when something is missing.
     """
+    # pylint: disable=import-outside-toplevel
+    from migrations.seed import seed
+
     initialise()
+    migrate()
+    seed()
@@ -2,7 +2,9 @@
 
 from app.server import init_server
 from app.services import init_db
+from app.utils.log_config import configure_logging
 
 if __name__ == "__main__":
+    configure_logging()
     init_db()
     init_server()
@@ -0,0 +1,15 @@
+"""
+Module imports
+"""
+
+from app.trading.engine import TriggerEngine, trigger_engine
+from app.trading.expiry import TimingWheel, order_expiry
+from app.trading.scheduler import ExpiryScheduler
+from app.trading.triggers import (
+    TRIGGER_ORDER_TYPES,
+    PriceHeap,
+    TrailingStops,
+    Trigger,
+    TriggerBook,
+    validate_order,
+)
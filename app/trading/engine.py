@@ -0,0 +1,314 @@
+"""
+Trigger engine module.
+Fires the resting orders of an asset when market data of it is ingested.
+Every worker keeps a trigger book of its own, streamed from the database by
+a thread when the worker starts and kept in step with it:
+
+- bars ingested while the book loads are evaluated once it's loaded,
+- orders placed or changed since, through any worker, are added, replaced
+  or removed before a bar is evaluated (by updated_at, through a partial
+  index of the trigger orders). Changes are read again for
+  REQUEST_DEADLINE_SECONDS, a request may commit them that much after it
+  made them. An order changed to another type is dropped once its stop is
+  crossed, when it fails to fire,
+- the bars of the asset ingested since the last one the worker evaluated,
+  by any worker, are evaluated in order, so trailing stops follow the same
+  prices everywhere,
+- an order is only fired when its row is unchanged since it was loaded. One
+  cancelled, updated or fired elsewhere in the meantime is reloaded instead,
+- trailing stops which moved are saved with the bar, as their stop_price.
+  A book loaded later, by this worker or another, starts from it.
+
+The close of a bar is its price. Triggered orders are filled at it, stop
+limit orders only when it's within their limit and otherwise rest as limit
+orders. Fills are committed along with the bar, orders of a rolled back
+request are put back in the book.
+"""
+
+import gc
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import settings
+from app.db.session import SessionLocal
+from app.db.unit_of_work import save
+from app.models import MarketDataHistorical, Transaction
+from app.models.order_type import OrderType
+from app.models.transaction_status import TransactionStatus
+from app.models.transaction_type import TransactionType
+from app.trading.triggers import (
+    TRIGGER_ORDER_TYPES,
+    Trigger,
+    TriggerBook,
+    validate_order,
+)
+from app.utils.exceptions import InvalidOrderError
+from app.utils.metrics import Counter, Gauge
+
+FIRED_KEY = "fired_triggers"
+
+# trailing stops moved per statement
+RATCHET_BATCH_SIZE = 1000
+# seconds between attempts to load the book
+LOAD_RETRY_SECONDS = 5.0
+
+resting_orders = Gauge(
+    "trigger_book_orders",
+    "Resting trigger orders in the book of the worker",
+)
+fired_orders = Counter(
+    "trigger_orders_fired_total",
+    "Trigger orders fired by a price tick",
+    labelnames=("order_type", "outcome"),
+)
+
+
+class TriggerEngine:
+    """
+    Keeps the worker's trigger book and evaluates ingested bars against it.
+    """
+
+    def __init__(self, chunk_size: int = 10_000):
+        self.book = TriggerBook()
+        self.loaded = False
+        # latest updated_at of the orders synced so far
+        self.orders_watermark: Optional[datetime] = None
+        # version of the orders fired by uncommitted requests, by transaction id
+        self.fired: Dict[Any, datetime] = {}
+        # datetime of the last bar evaluated, per asset
+        self.watermarks: Dict[str, datetime] = {}
+        self.lock = threading.Lock()
+        self.chunk_size = chunk_size
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        """
+        Loads the book in a thread, as a startup event handler.
+        """
+        self._stopped.clear()
+        threading.Thread(target=self._run, name="trigger-book", daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.load()
+                return
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error(f"TRIGGER_BOOK_LOAD_ERROR: {err}")
+            if self._stopped.wait(LOAD_RETRY_SECONDS):
+                return
+
+    def load(self) -> None:
+        """
+        Streams the resting orders into a new book, chunk_size rows at a
+        time, and starts evaluating bars against it.
+        """
+        # orders changed while they're read are synced afterwards
+        book, watermark = TriggerBook(), datetime.utcnow()
+        with SessionLocal() as db:
+            for rows in Transaction.stream_pending_triggers(db, self.chunk_size):
+                for row in rows:
+                    trigger = Trigger(**row)
+                    if is_valid(trigger):
+                        book.add(trigger)
+            db.commit()  # ends the read, the cursor's snapshot with it
+
+        with self.lock:
+            self.book, self.orders_watermark, self.loaded = book, watermark, True
+        # the orders live as long as the worker, full collections skip them
+        gc.freeze()
+        logger.info(f"TRIGGER_BOOK_LOADED: {len(book)} resting orders")
+        resting_orders.set(len(book))
+
+    def sync(self, db: Session) -> None:
+        """
+        Follows the orders placed or changed since the last sync, or the
+        load: resting ones are added or replaced, the others removed.
+        """
+        rows = Transaction.read_triggers_since(
+            db,
+            self.orders_watermark
+            - timedelta(seconds=settings.REQUEST_DEADLINE_SECONDS),
+        )
+        for row in rows:
+            self.orders_watermark = max(self.orders_watermark, row["updated_at"])
+            transaction_id = row["transaction_id"]
+            trigger = self.book.orders.get(transaction_id)
+            if (trigger is not None and trigger.updated_at == row["updated_at"]) or (
+                self.fired.get(transaction_id) == row["updated_at"]
+            ):
+                continue  # the version the book has, or fired
+            if (
+                row["transaction_status"] == TransactionStatus.PENDING
+                and row["deleted_at"] is None
+            ):
+                self.track(Trigger(**{name: row[name] for name in Trigger._fields}))
+            else:
+                self.book.remove(transaction_id)
+        resting_orders.set(len(self.book))
+
+    def on_bar(self, db: Session, bar: MarketDataHistorical) -> List[Dict[str, Any]]:
+        """
+        Evaluates the bars of the asset ingested since the last one the
+        worker evaluated, up to the given (flushed) one. Returns the fills.
+        """
+        asset_id = str(bar.asset_id)
+        with self.lock:
+            if not self.loaded:
+                # evaluated from this bar on once the book is loaded
+                self.watermarks.setdefault(
+                    asset_id, bar.datetime - timedelta(microseconds=1)
+                )
+                return []
+            since = self.watermarks.get(asset_id)
+            if since is not None and bar.datetime <= since:
+                return []  # history, not a new price
+            self.sync(db)
+
+            if since is None:
+                ticks = [(bar.datetime, bar.close)]
+            else:
+                ticks = MarketDataHistorical.read_ticks(db, asset_id, since)
+
+            fills = []
+            for moment, price in ticks:
+                for trigger, stop in self.book.tick(bar.asset_id, price):
+                    if fill := self.fire(db, trigger, stop, price, moment):
+                        fills.append(fill)
+                self.watermarks[asset_id] = moment
+            moved = self.ratchet(db, bar.asset_id)
+            resting_orders.set(len(self.book))
+
+        if fills or moved:
+            save(db)
+        return fills
+
+    def ratchet(self, db: Session, asset_id: Any) -> int:
+        """
+        Saves the stops of the trailing stops of the asset which moved.
+        """
+        moved = 0
+        for falls, best_price, triggers in self.book.take_moved(asset_id):
+            ids = [trigger.id for trigger in triggers]
+            for start in range(0, len(ids), RATCHET_BATCH_SIZE):
+                moved += Transaction.ratchet_trailing_stops(
+                    db, ids[start : start + RATCHET_BATCH_SIZE], best_price, falls
+                )
+        return moved
+
+    def fire(
+        self,
+        db: Session,
+        trigger: Trigger,
+        stop: float,
+        price: float,
+        moment: datetime,
+    ) -> Optional[Dict[str, Any]]:
+        values = fill_values(trigger, stop, price, moment)
+        if Transaction.update_if_unchanged(
+            db, trigger.transaction_id, trigger.updated_at, values
+        ):
+            db.info.setdefault(FIRED_KEY, []).append(trigger)
+            self.fired[trigger.transaction_id] = trigger.updated_at
+            outcome = "filled" if "transaction_value" in values else "rested"
+            fired_orders.inc(order_type=trigger.order_type.name, outcome=outcome)
+            return {"transaction_id": str(trigger.transaction_id), **values}
+
+        # changed since it was loaded, track the current version if it rests
+        fired_orders.inc(order_type=trigger.order_type.name, outcome="stale")
+        row = Transaction.get_by_transaction_id(db, trigger.transaction_id)
+        if (
+            row is not None
+            and row.transaction_status == TransactionStatus.PENDING
+            and row.order_type in TRIGGER_ORDER_TYPES
+        ):
+            self.track(
+                Trigger(**{name: getattr(row, name) for name in Trigger._fields})
+            )
+        return None
+
+    def track(self, trigger: Trigger) -> None:
+        if is_valid(trigger):
+            self.book.add(trigger)
+
+    def forget(self, triggers: List[Trigger]) -> None:
+        """
+        Forgets orders whose fills were committed, sync sees them changed.
+        """
+        with self.lock:
+            for trigger in triggers:
+                self.fired.pop(trigger.transaction_id, None)
+
+    def restore(self, triggers: List[Trigger]) -> None:
+        """
+        Puts back orders whose fills were rolled back.
+        """
+        with self.lock:
+            for trigger in triggers:
+                self.fired.pop(trigger.transaction_id, None)
+                self.book.add(trigger)
+            resting_orders.set(len(self.book))
+
+
+def is_valid(trigger: Trigger) -> bool:
+    """
+    Returns whether a resting order has the prices of its type, logs it
+    otherwise.
+    """
+    try:
+        validate_order(
+            trigger.order_type.name,
+            trigger.stop_price,
+            trigger.limit_price,
+            trigger.trail_amount,
+        )
+    except InvalidOrderError as err:
+        logger.warning(f"TRIGGER_ORDER_SKIPPED: {trigger.transaction_id} {err}")
+        return False
+    return True
+
+
+def fill_values(
+    trigger: Trigger, stop: float, price: float, moment: datetime
+) -> Dict[str, Any]:
+    """
+    Returns the columns of a fired order: filled at the price, or for a stop
+    limit order beyond its limit, resting as a limit order.
+    """
+    values: Dict[str, Any] = {"stop_price": stop}
+    if trigger.order_type == OrderType.STOP_LIMIT:
+        buys = trigger.transaction_type == TransactionType.BUY
+        if (price > trigger.limit_price) if buys else (price < trigger.limit_price):
+            values["order_type"] = OrderType.LIMIT
+            return values
+
+    values.update(
+        transaction_status=TransactionStatus.FULFILLED,
+        transaction_date=moment,
+        transaction_price=price,
+        transaction_value=price * trigger.quantity,
+    )
+    return values
+
+
+trigger_engine = TriggerEngine()
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_fired(session: Session) -> None:
+    if fired := session.info.pop(FIRED_KEY, None):
+        trigger_engine.forget(fired)
+
+
+@event.listens_for(Session, "after_rollback")
+def _restore_fired(session: Session) -> None:
+    if fired := session.info.pop(FIRED_KEY, None):
+        trigger_engine.restore(fired)
@@ -0,0 +1,151 @@
+"""
+Order expiry module.
+Pending DAY orders expire at the end of the trading day they were placed
+on, GTD orders at their expires_at and GTC orders never.
+
+Expiries are kept in a hierarchical timing wheel: scheduling and removing
+an order are O(1) and the clock only visits the orders it passes, instead
+of keeping millions of them sorted. The wheel has LEVELS levels of SLOTS
+slots, a slot of level 0 spans a tick and one of level n the whole of level
+n - 1. An expiry lands on the level of the highest digit (base SLOTS) in
+which its tick differs from the current one. When the clock reaches its
+slot the lower digits of the clock are all 0 and the slot's orders are
+moved down, each order moves at most LEVELS - 1 times.
+"""
+
+import math
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.time_in_force import TimeInForce
+from app.utils.exceptions import InvalidOrderError
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+# 2**48 ticks, past the year 9999 with ticks of a millisecond or more
+LEVELS = 8
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def order_expiry(
+    time_in_force: str,
+    expires_at: Optional[datetime],
+    placed_at: datetime,
+    day_end: time,
+) -> Optional[datetime]:
+    """
+    Returns when an order placed at `placed_at` expires, in UTC: DAY orders
+    at the first `day_end` after it, GTD orders at their expires_at.
+    Raises InvalidOrderError for an unknown time in force or an expiry which
+    doesn't go with it.
+    """
+    if time_in_force not in TimeInForce.__members__:
+        raise InvalidOrderError(
+            f"Unknown time in force {time_in_force}", status_code=400
+        )
+    if time_in_force != TimeInForce.GTD.name:
+        if expires_at is not None:
+            raise InvalidOrderError(
+                f"{time_in_force} orders can't have an expires_at", status_code=400
+            )
+        if time_in_force == TimeInForce.GTC.name:
+            return None
+
+        expires_at = datetime.combine(placed_at.date(), day_end)
+        return expires_at if expires_at > placed_at else expires_at + timedelta(1)
+
+    if expires_at is None:
+        raise InvalidOrderError("GTD orders need an expires_at", status_code=400)
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if expires_at <= placed_at:
+        raise InvalidOrderError("GTD orders need a future expires_at", status_code=400)
+    return expires_at
+
+
+class TimingWheel:
+    """
+    Items scheduled at a time, handed out by `advance` once the clock
+    passed it. Rescheduled and removed items stay in their slot until the
+    clock reaches it and are skipped then.
+    """
+
+    def __init__(self, now: datetime, tick_seconds: float = 1.0):
+        self.tick_seconds = tick_seconds
+        self.now = self._tick(now, math.floor)
+        self.slots: List[List[List[Tuple[int, Any]]]] = [
+            [[] for _ in range(SLOTS)] for _ in range(LEVELS)
+        ]
+        self.counts = [0] * LEVELS  # entries per level, removed ones included
+        self.due: List[Tuple[int, Any]] = []
+        self.expiries: Dict[Any, int] = {}  # tick of each scheduled item
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+    def _tick(self, moment: datetime, rounding) -> int:
+        return int(rounding((moment - EPOCH).total_seconds() / self.tick_seconds))
+
+    def schedule(self, item: Any, moment: datetime) -> None:
+        """
+        Schedules an item, or reschedules it, at the given (naive UTC) time.
+        """
+        tick = self._tick(moment, math.ceil)  # never handed out early
+        if self.expiries.get(item) != tick:
+            self.expiries[item] = tick
+            self._place(tick, item)
+
+    def remove(self, item: Any) -> None:
+        self.expiries.pop(item, None)
+
+    def _place(self, tick: int, item: Any) -> None:
+        if tick <= self.now:
+            self.due.append((tick, item))
+            return
+        level = ((tick ^ self.now).bit_length() - 1) // SLOT_BITS
+        self.slots[level][(tick >> (level * SLOT_BITS)) & (SLOTS - 1)].append(
+            (tick, item)
+        )
+        self.counts[level] += 1
+
+    def advance(self, moment: datetime) -> List[Any]:
+        """
+        Moves the clock to the given time and returns the items due by then.
+        The clock jumps from one slot holding entries to the next.
+        """
+        target = self._tick(moment, math.floor)
+        while self.now < target:
+            lowest = next(
+                (level for level, count in enumerate(self.counts) if count), None
+            )
+            if lowest is None:
+                self.now = target
+                break
+            step = 1 << (lowest * SLOT_BITS)
+            self.now = min(target, (self.now // step + 1) * step)
+            self._cascade()
+
+        due, self.due = self.due, []
+        fired = []
+        for tick, item in due:
+            if self.expiries.get(item) == tick:
+                del self.expiries[item]
+                fired.append(item)
+        return fired
+
+    def _cascade(self) -> None:
+        # the slots the clock entered, the highest level first so entries
+        # moved down are moved again if their new slot was entered too
+        for level in range(LEVELS - 1, -1, -1):
+            if self.now & ((1 << (level * SLOT_BITS)) - 1):
+                continue
+            index = (self.now >> (level * SLOT_BITS)) & (SLOTS - 1)
+            entries = self.slots[level][index]
+            if not entries:
+                continue
+            self.slots[level][index] = []
+            self.counts[level] -= len(entries)
+            for tick, item in entries:
+                if self.expiries.get(item) == tick:
+                    self._place(tick, item)
@@ -0,0 +1,191 @@
+"""
+Expiry scheduler module.
+Cancels pending DAY and GTD orders once they expire. The scheduler runs in
+a thread of every worker but only one of them, holding a postgres advisory
+lock, keeps the timing wheel and cancels orders. Another worker takes over
+when its connection goes away.
+
+The leader builds the wheel from the database when it's elected, then
+every ORDER_EXPIRY_INTERVAL seconds:
+
+- schedules the orders placed or changed since, through any worker (by
+  updated_at, through a partial index of the orders which expire). Writes
+  are read again for REQUEST_DEADLINE_SECONDS, a request may commit them
+  that much after it made them,
+- cancels the orders the clock passed, ORDER_EXPIRY_BATCH_SIZE at a time
+  with a single UPDATE each. Orders filled, cancelled or given a later
+  expiry in the meantime are left alone.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core import settings
+from app.db.session import SessionLocal, get_engine
+from app.db.unit_of_work import save
+from app.models import Transaction
+from app.trading.expiry import TimingWheel
+from app.utils.metrics import Counter, Gauge
+
+# key of the advisory lock electing the worker which expires orders
+LEADER_LOCK_KEY = 0x6F726465725F6578  # "order_ex"
+
+scheduled_orders = Gauge(
+    "order_expiry_scheduled",
+    "Pending orders in the timing wheel of the expiry scheduler",
+)
+expired_orders = Counter(
+    "orders_expired_total",
+    "Pending orders cancelled by the expiry scheduler",
+)
+
+
+class ExpiryScheduler:
+    """
+    Keeps the expiries of the pending orders in a timing wheel and cancels
+    the orders which expired, on the worker elected to.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        batch_size: int = 1000,
+        chunk_size: int = 10_000,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.wheel: Optional[TimingWheel] = None
+        # latest updated_at of the orders scheduled so far
+        self.watermark: Optional[datetime] = None
+        self._leader: Optional[Connection] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """
+        Starts the scheduler's thread, as a startup event handler.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="order-expiry", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error(f"ORDER_EXPIRY_ERROR: {err}")
+                self.resign()
+        self.resign()
+
+    def run_once(self) -> int:
+        """
+        Brings the wheel up to date and cancels the expired orders, if this
+        worker is the leader. Returns the number of orders cancelled.
+        """
+        if self._leader is None and not self.elect():
+            return 0
+        with self._leader.begin():  # fails once the lock went with the connection
+            self._leader.execute(text("SELECT 1"))
+
+        with SessionLocal() as db:
+            now = datetime.utcnow()
+            if self.wheel is None:
+                self.rebuild(db, now)
+            else:
+                self.sync(db)
+            cancelled = self.expire(db, now)
+        scheduled_orders.set(len(self.wheel))
+        return cancelled
+
+    def elect(self) -> bool:
+        """
+        Takes the leader lock, on a connection of its own held as long as
+        the worker leads.
+        """
+        connection = get_engine().connect()
+        try:
+            with connection.begin():
+                elected = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": LEADER_LOCK_KEY},
+                ).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not elected:
+            connection.close()
+            return False
+        self._leader = connection
+        logger.info("ORDER_EXPIRY_LEADER: this worker expires orders")
+        return True
+
+    def resign(self) -> None:
+        """
+        Releases the leader lock, along with the connection, and drops the
+        wheel. It's built again by the next leader.
+        """
+        if self._leader is not None:
+            try:
+                # closed for real, back in the pool it would keep the lock
+                self._leader.invalidate()
+                self._leader.close()
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning(f"ORDER_EXPIRY_RESIGN_ERROR: {err}")
+        self._leader = None
+        self.wheel = None
+        self.watermark = None
+
+    def rebuild(self, db: Session, now: datetime) -> None:
+        """
+        Builds the wheel from all the pending orders which expire.
+        """
+        # orders changed while they're read are scheduled by the next sync
+        self.watermark = now
+        self.wheel = TimingWheel(now)
+        for rows in Transaction.stream_expiring(db, self.chunk_size):
+            for row in rows:
+                self.wheel.schedule(row["id"], row["expires_at"])
+        db.commit()  # ends the read, the cursor's snapshot with it
+        logger.info(f"ORDER_EXPIRY_LOADED: {len(self.wheel)} pending orders")
+
+    def sync(self, db: Session) -> None:
+        """
+        Schedules the orders placed or changed since the last sync.
+        """
+        rows = Transaction.read_expiring_since(
+            db,
+            self.watermark - timedelta(seconds=settings.REQUEST_DEADLINE_SECONDS),
+        )
+        for row in rows:
+            self.wheel.schedule(row["id"], row["expires_at"])
+            self.watermark = max(self.watermark, row["updated_at"])
+        db.commit()
+
+    def expire(self, db: Session, now: datetime) -> int:
+        """
+        Cancels the orders due by now, in batches.
+        """
+        due: List[int] = self.wheel.advance(now)
+        cancelled = 0
+        for start in range(0, len(due), self.batch_size):
+            cancelled += Transaction.cancel_expired(
+                db, due[start : start + self.batch_size], now
+            )
+            save(db)
+        if cancelled:
+            expired_orders.inc(cancelled)
+            logger.info(f"ORDERS_EXPIRED: {cancelled} of {len(due)} due")
+        return cancelled
@@ -0,0 +1,378 @@
+"""
+Trigger book module.
+Stop, stop limit, take profit and trailing stop orders rest until the price
+of their asset reaches their stop price. The book keeps them per asset in
+heaps sorted by stop price, so a price tick only visits the orders it
+triggers, O(log n + k), instead of every pending order.
+
+Selling stops and buying take profits fire when the price falls to their
+stop price, the others when it rises to it. A trailing stop follows the
+best price seen since it was placed at a distance of trail_amount: a sell
+stop rises with the highs, a buy stop falls with the lows. The stops which
+moved are handed out by take_moved, to be saved as their stop_price which
+the book starts from when it loads them.
+"""
+
+import itertools
+from bisect import bisect_left
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.models.order_type import OrderType
+from app.models.transaction_type import TransactionType
+from app.utils.exceptions import InvalidOrderError
+
+TRIGGER_ORDER_TYPES = (
+    OrderType.STOP,
+    OrderType.STOP_LIMIT,
+    OrderType.TAKE_PROFIT,
+    OrderType.TRAILING_STOP,
+)
+
+# heaps are rebuilt once removed entries outnumber live ones, past this size
+COMPACT_SIZE = 1024
+
+
+class Trigger(NamedTuple):
+    """
+    A resting order as the book keeps it, a row of
+    Transaction.trigger_columns().
+    """
+
+    id: int
+    transaction_id: Any
+    asset_id: Any
+    transaction_type: TransactionType
+    order_type: OrderType
+    transaction_price: float
+    quantity: int
+    limit_price: Optional[float]
+    stop_price: Optional[float]
+    trail_amount: Optional[float]
+    updated_at: datetime
+
+    @property
+    def falls(self) -> bool:
+        """
+        True when the order fires as the price falls to its stop price.
+        """
+        sells = self.transaction_type == TransactionType.SELL
+        return not sells if self.order_type == OrderType.TAKE_PROFIT else sells
+
+
+def validate_order(
+    order_type: str,
+    stop_price: Optional[float],
+    limit_price: Optional[float],
+    trail_amount: Optional[float],
+) -> None:
+    """
+    Raises InvalidOrderError when a trigger order misses its prices.
+    """
+    needs = {
+        OrderType.STOP.name: ("stop_price",),
+        OrderType.STOP_LIMIT.name: ("stop_price", "limit_price"),
+        OrderType.TAKE_PROFIT.name: ("stop_price",),
+        OrderType.TRAILING_STOP.name: ("trail_amount",),
+    }.get(order_type, ())
+    prices = {
+        "stop_price": stop_price,
+        "limit_price": limit_price,
+        "trail_amount": trail_amount,
+    }
+    for name in needs:
+        if prices[name] is None or prices[name] <= 0:
+            raise InvalidOrderError(
+                f"{order_type} orders need a positive {name}", status_code=400
+            )
+
+
+class PriceHeap:
+    """
+    Min-heap of items keyed by price. Removed items stay in the heap until
+    they surface, or until they outnumber the live ones and the heap is
+    rebuilt.
+    """
+
+    def __init__(self, is_live: Callable[[Any], bool]):
+        self.entries: List[Tuple[float, int, Any]] = []
+        self.removed = 0
+        self.is_live = is_live
+        self.sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.entries) - self.removed
+
+    def push(self, price: float, item: Any) -> None:
+        heappush(self.entries, (price, next(self.sequence), item))
+
+    def discard(self) -> None:
+        """
+        Accounts for an item removed from the book.
+        """
+        self.removed += 1
+        if self.removed > len(self.entries) // 2 > COMPACT_SIZE:
+            self.entries = [entry for entry in self.entries if self.is_live(entry[2])]
+            heapify(self.entries)
+            self.removed = 0
+
+    def pop_upto(self, price: float) -> List[Any]:
+        """
+        Pops the live items priced at most `price`.
+        """
+        popped = []
+        while self.entries and self.entries[0][0] <= price:
+            item = heappop(self.entries)[2]
+            if self.is_live(item):
+                popped.append(item)
+            else:
+                self.removed -= 1
+        return popped
+
+
+class _Level:
+    """
+    Trailing stops sharing their best price, in a heap by trail.
+    """
+
+    __slots__ = ("peak", "stops", "merged")
+
+    def __init__(self, peak: float):
+        self.peak = peak
+        self.stops: List[Tuple[float, int, Any]] = []
+        self.merged = False
+
+
+class TrailingStops:
+    """
+    Trailing stops firing when the price falls `trail` below the highest
+    price seen since they were placed. Buy stops, which follow the lows,
+    are kept in an instance fed negated prices.
+
+    A new high lifts every stop which saw a lower high to it, so stops
+    collapse into levels sharing their high. Levels are kept sorted by high:
+    a tick merges the levels it lifts, the smaller heaps into the largest,
+    and a heap over the levels keyed by the highest stop of each yields the
+    stops it fires. Following a favorable move costs the levels merged,
+    not a visit of every stop.
+    """
+
+    def __init__(self, is_live: Callable[[Any], bool]):
+        self.levels: List[_Level] = []  # by decreasing peak
+        self.keys: List[float] = []  # negated peaks of the levels, for bisect
+        # (-highest stop, sequence, level), stale once the level changed
+        self.candidates: List[Tuple[float, int, _Level]] = []
+        self.lifted: Set[_Level] = set()  # since the last take_lifted
+        self.is_live = is_live
+        self.sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(len(level.stops) for level in self.levels)
+
+    def add(self, item: Any, peak: float, trail: float) -> None:
+        index = bisect_left(self.keys, -peak)
+        if index < len(self.keys) and self.keys[index] == -peak:
+            level = self.levels[index]
+        else:
+            level = _Level(peak)
+            self.levels.insert(index, level)
+            self.keys.insert(index, -peak)
+        heappush(level.stops, (trail, next(self.sequence), item))
+        self._offer(level)
+
+    def tick(self, price: float) -> List[Tuple[Any, float]]:
+        """
+        Follows a new price and returns the (item, stop) it fires.
+        """
+        if self.levels and self.levels[-1].peak <= price:
+            self._lift(price)
+
+        fired = []
+        while self.candidates and -self.candidates[0][0] >= price:
+            stop, _, level = heappop(self.candidates)
+            if level.merged or not self._prune(level):
+                continue
+            if level.peak - level.stops[0][0] != -stop:
+                # stale, the level changed since, e.g. its top stop was removed
+                self._offer(level)
+                continue
+            fired.append((heappop(level.stops)[2], -stop))
+            self._offer(level)
+        if len(self.candidates) > 2 * len(self.levels) + COMPACT_SIZE:
+            self._compact()
+        return fired
+
+    def _lift(self, price: float) -> None:
+        lifted = []
+        while self.levels and self.levels[-1].peak <= price:
+            self.keys.pop()
+            lifted.append(self.levels.pop())
+        level = max(lifted, key=lambda lifted_level: len(lifted_level.stops))
+        for other in lifted:
+            if other is not level:
+                other.merged = True
+                self.lifted.discard(other)
+                for stop in other.stops:
+                    heappush(level.stops, stop)
+        level.peak = price
+        if level.stops:
+            self.levels.append(level)
+            self.keys.append(-price)
+            self._offer(level)
+            self.lifted.add(level)
+
+    def take_lifted(self) -> List[Tuple[float, List[Any]]]:
+        """
+        Returns the (peak, live items) of the levels lifted since the last
+        call, the stops which moved.
+        """
+        lifted, self.lifted = self.lifted, set()
+        moved = []
+        for level in lifted:
+            items = [item for _, _, item in level.stops if self.is_live(item)]
+            if items and not level.merged:
+                moved.append((level.peak, items))
+        return moved
+
+    def _prune(self, level: _Level) -> bool:
+        """
+        Drops the removed stops on top of the level, returns whether it has
+        stops left.
+        """
+        while level.stops and not self.is_live(level.stops[0][2]):
+            heappop(level.stops)
+        return bool(level.stops)
+
+    def _offer(self, level: _Level) -> None:
+        if self._prune(level):
+            stop = level.peak - level.stops[0][0]
+            heappush(self.candidates, (-stop, next(self.sequence), level))
+
+    def _compact(self) -> None:
+        self.candidates = []
+        levels = [level for level in self.levels if self._prune(level)]
+        self.levels = levels
+        self.keys = [-level.peak for level in levels]
+        for level in levels:
+            self._offer(level)
+
+
+class AssetTriggers:
+    """
+    The resting orders of an asset: stops firing on a falling price (their
+    stop negated in a min-heap), on a rising one, and trailing stops.
+    """
+
+    def __init__(self, is_live: Callable[[Any], bool]):
+        self.falling = PriceHeap(is_live)
+        self.rising = PriceHeap(is_live)
+        self.trailing_sells = TrailingStops(is_live)
+        self.trailing_buys = TrailingStops(is_live)  # fed negated prices
+
+    def add(self, trigger: Trigger) -> None:
+        if trigger.order_type == OrderType.TRAILING_STOP:
+            trail = trigger.trail_amount
+            if trigger.falls:
+                peak = (
+                    trigger.stop_price + trail
+                    if trigger.stop_price
+                    else trigger.transaction_price
+                )
+                self.trailing_sells.add(trigger, peak, trail)
+            else:
+                trough = (
+                    trigger.stop_price - trail
+                    if trigger.stop_price
+                    else trigger.transaction_price
+                )
+                self.trailing_buys.add(trigger, -trough, trail)
+        elif trigger.falls:
+            self.falling.push(-trigger.stop_price, trigger)
+        else:
+            self.rising.push(trigger.stop_price, trigger)
+
+    def discard(self, trigger: Trigger) -> None:
+        if trigger.order_type == OrderType.TRAILING_STOP:
+            return  # pruned when they surface
+        (self.falling if trigger.falls else self.rising).discard()
+
+    def tick(self, price: float) -> List[Tuple[Trigger, float]]:
+        fired = [
+            (trigger, trigger.stop_price) for trigger in self.falling.pop_upto(-price)
+        ]
+        fired += [
+            (trigger, trigger.stop_price) for trigger in self.rising.pop_upto(price)
+        ]
+        fired += self.trailing_sells.tick(price)
+        fired += [(trigger, -stop) for trigger, stop in self.trailing_buys.tick(-price)]
+        return fired
+
+    def take_moved(self) -> List[Tuple[bool, float, List[Trigger]]]:
+        """
+        Returns the trailing stops which moved since the last call, as
+        (falls, best price, triggers): the high of selling stops, the low of
+        buying ones.
+        """
+        moved = [
+            (True, peak, triggers)
+            for peak, triggers in self.trailing_sells.take_lifted()
+        ]
+        moved += [
+            (False, -peak, triggers)
+            for peak, triggers in self.trailing_buys.take_lifted()
+        ]
+        return moved
+
+
+class TriggerBook:
+    """
+    Resting trigger orders of all assets, by transaction id.
+    """
+
+    def __init__(self):
+        self.orders: Dict[Any, Trigger] = {}
+        self.assets: Dict[Any, AssetTriggers] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def _is_live(self, trigger: Trigger) -> bool:
+        return self.orders.get(trigger.transaction_id) is trigger
+
+    def add(self, trigger: Trigger) -> None:
+        """
+        Adds an order, or replaces the version of it the book has.
+        """
+        self.remove(trigger.transaction_id)
+        self.orders[trigger.transaction_id] = trigger
+        if trigger.asset_id not in self.assets:
+            self.assets[trigger.asset_id] = AssetTriggers(self._is_live)
+        self.assets[trigger.asset_id].add(trigger)
+
+    def remove(self, transaction_id: Any) -> Optional[Trigger]:
+        trigger = self.orders.pop(transaction_id, None)
+        if trigger is not None:
+            self.assets[trigger.asset_id].discard(trigger)
+        return trigger
+
+    def tick(self, asset_id: Any, price: float) -> List[Tuple[Trigger, float]]:
+        """
+        Follows a new price of an asset and returns the orders it fires,
+        with their stop price, removed from the book.
+        """
+        if asset_id not in self.assets:
+            return []
+        fired = self.assets[asset_id].tick(price)
+        for trigger, _ in fired:
+            del self.orders[trigger.transaction_id]
+        return fired
+
+    def take_moved(self, asset_id: Any) -> List[Tuple[bool, float, List[Trigger]]]:
+        """
+        Returns the trailing stops of an asset which moved since the last
+        call, see AssetTriggers.take_moved.
+        """
+        if asset_id not in self.assets:
+            return []
+        return self.assets[asset_id].take_moved()
@@ -7,6 +7,7 @@ from app.utils.exceptions import (
     CustomTokenError,
     CustomTransferError,
     DatabaseOperationError,
+    InvalidOrderError,
     InvalidUUIDError,
     SQLAlchemyObjectNotFoundError,
 )
@@ -0,0 +1,69 @@
+"""
+Conditional GET helpers.
+Entity tags are derived from a resource's revision, i.e. a cheap query
+over its rows, so unchanged resources are answered with 304 before the
+rows are read or serialized.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# clients may keep the response but have to revalidate it on every use
+REVALIDATE = "private, no-cache"
+
+
+def max_age(seconds: int) -> str:
+    """
+    Cache-Control of a response clients may use for the given seconds
+    before revalidating it with its entity tag.
+    """
+    return f"private, max-age={seconds}"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Returns a strong entity tag for the given revision parts.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    Returns true when the request's If-None-Match matches the given entity
+    tag. As required for If-None-Match, the comparison is weak: a tag
+    weakened by a compressing proxy or middleware still matches.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in header.split(",")
+    )
+
+
+def cache_headers(etag: str, cache_control: str = REVALIDATE) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Converts an aware datetime into the naive UTC datetimes the database
+    stores.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
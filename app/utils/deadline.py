@@ -0,0 +1,34 @@
+"""
+Request deadline module.
+Keeps the deadline of the current request so that work further down the
+stack (e.g. SQL statements) can be bounded by the time that is left.
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def set_deadline(seconds: Optional[float]) -> Token:
+    """
+    Sets the deadline of the current request to `seconds` from now.
+    No deadline is set if seconds is empty or zero.
+    """
+    return _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Returns the seconds left until the deadline of the current request,
+    or None when there is no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
@@ -80,3 +80,15 @@ class CustomTransferError(PaperTradeCustomError):
         super().__init__(*args)
         self.message = str(*args)
         self.status_code = kwargs.get("status_code")
+
+
+class InvalidOrderError(PaperTradeCustomError):
+    """
+    Custom order error class.
+    This error is raised if an order misses the prices its type needs
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args)
+        self.message = str(*args)
+        self.status_code = kwargs.get("status_code")
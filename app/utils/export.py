@@ -0,0 +1,90 @@
+"""
+Export module.
+Streams chunks of database rows as NDJSON or CSV without holding more than
+a single chunk in memory.
+"""
+
+import csv
+import io
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from starlette.responses import StreamingResponse
+
+from app.utils.responses import json_dumps
+
+
+class ExportFormat(str, Enum):
+    """
+    Enum class for export formats
+    """
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def ndjson_chunks(chunks: Iterable[List[Dict]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join([json_dumps(row) + b"\n" for row in rows])
+
+
+def csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(chunks: Iterable[List[Dict]], fields: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    for rows in chunks:
+        writer.writerows([csv_value(row[field]) for field in fields] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # header only export
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(
+    chunks: Iterable[List[Dict]],
+    fields: Sequence[str],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """
+    Returns a streaming response of the given row chunks.
+
+    The chunks are produced by a plain generator, which Starlette iterates
+    in the threadpool, so fetching from the database's cursor doesn't block
+    the event loop.
+    """
+    if export_format == ExportFormat.CSV:
+        content = csv_chunks(chunks, fields)
+    else:
+        content = ndjson_chunks(chunks)
+
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{export_format.value}"'
+            )
+        },
+    )
@@ -5,13 +5,14 @@ Custom error handling module
 from fastapi import Response
 from loguru import logger
 from pydantic import ValidationError
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 from app.utils.exceptions import (
     CustomAuthError,
     CustomTokenError,
     CustomTransferError,
     DatabaseOperationError,
+    InvalidOrderError,
     InvalidUUIDError,
     PaperTradeCustomError,
     SQLAlchemyObjectNotFoundError,
@@ -19,6 +20,9 @@ from app.utils.exceptions import (
 
 # psycopg2.errors.NotNullViolation
 
+# SQLSTATE of statements cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
 
 class HandleError(PaperTradeCustomError):
     """
@@ -65,6 +69,14 @@ class HandleError(PaperTradeCustomError):
             logger.error(f"TimeoutError: {error}")
             return {"status": False, "message": "Request timed out"}
 
+        if (
+            isinstance(error, OperationalError)
+            and getattr(error.orig, "pgcode", None) == QUERY_CANCELED
+        ):
+            response.status_code = 504
+            logger.error(f"StatementTimeout: {error.orig}")
+            return {"status": False, "message": "Request timed out"}
+
         if isinstance(error, CustomAuthError):
             logger.error(f"CustomAuthError: {error}")
             if error.status_code:
@@ -99,6 +111,11 @@ class HandleError(PaperTradeCustomError):
             response.status_code = 400
             return {"status": False, "message": error.message}
 
+        if isinstance(error, InvalidOrderError):
+            logger.error(f"InvalidOrderError: {error}")
+            response.status_code = error.status_code or 400
+            return {"status": False, "message": error.message}
+
         if isinstance(error, CustomTransferError):
             logger.error(f"CustomTransferError: {error}")
             response.status_code = 406
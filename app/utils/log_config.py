@@ -1,25 +1,237 @@
 """
-Logging configuration module
+Logging configuration module.
+A single loguru sink configured for the whole process:
+
+> Records are written by a background thread (enqueue), a slow stderr or
+log pipe never blocks request handling.
+> Records are JSON lines (text locally) carrying the id of the request and
+the user they were logged for.
+> Every call site may log at most LOG_RATE_LIMIT records per second,
+messages can additionally be sampled by type (LOG_SAMPLE_RATES). The
+records a call site dropped are counted on its next record.
+> Records of the standard logging module (uvicorn, gunicorn, sqlalchemy)
+are routed through the same sink.
 """
 
-from uvicorn.config import LOGGING_CONFIG
-from uvicorn.logging import ColourizedFormatter
+import logging
+import os
+import random
+import sys
+import time
+import traceback
+import uuid
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Optional, TextIO, Tuple
 
-log_config = LOGGING_CONFIG
+import orjson
+from loguru import logger
 
-# Log format
-log_config["formatters"]["access"][
-    "fmt"
-] = "%(asctime)s.%(msecs)d | %(levelname)-8s | %(name)s:%(filename)s:%(lineno)d - %(message)s"
-log_config["formatters"]["default"][
-    "fmt"
-] = "%(asctime)s.%(msecs)d | %(levelname)-8s | %(name)s:%(filename)s:%(lineno)d - %(message)s"
+from app.core import settings
+from app.utils.metrics import Counter
+from app.utils.rate_limit import take_token
 
-# Date format
-date_fmt = "%Y-%m-%d:%H:%M:%S"
-log_config["formatters"]["default"]["datefmt"] = date_fmt
-log_config["formatters"]["access"]["datefmt"] = date_fmt
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[request_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:"
+    "<cyan>{line}</cyan> - <level>{message}</level>\n{exception}"
+)
 
-console_formatter = ColourizedFormatter(
-    "{asctime} {levelprefix} : {message}", style="{", use_colors=True
+suppressed_records = Counter(
+    "log_suppressed_records_total",
+    "Log records dropped by sampling or rate limiting",
+    labelnames=("reason",),
 )
+
+_request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_user: ContextVar[str] = ContextVar("user", default="-")
+
+
+def set_request_id(request_id: Optional[str] = None) -> Token:
+    """
+    Sets the id records of the current request are logged with, a new one
+    is generated unless given.
+    """
+    return _request_id.set(request_id or uuid.uuid4().hex)
+
+
+def reset_request_id(token: Token) -> None:
+    _request_id.reset(token)
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def set_user(user: str) -> None:
+    """
+    Sets the user records of the current request are logged for.
+    """
+    _user.set(user)
+
+
+def add_context(record: Dict[str, Any]) -> None:
+    record["extra"].setdefault("request_id", _request_id.get())
+    record["extra"].setdefault("user", _user.get())
+
+
+class Throttle:
+    """
+    Filter which rate limits records per call site with token buckets and
+    samples records whose message starts with one of `sample_rates`' keys,
+    e.g. {"DECODE_TOKEN_ERROR": 0.1} keeps one in ten.
+
+    Filters run in the thread which logs, there's no lock: under a race a
+    call site may log a record more than its limit.
+    """
+
+    def __init__(self, rate_limit: float, sample_rates: Dict[str, float]):
+        self.rate_limit = rate_limit
+        self.sample_rates = sample_rates
+        self._buckets: Dict[Tuple[str, str, int], Tuple[float, float]] = {}
+        self._suppressed: Dict[Tuple[str, str, int], int] = {}
+
+    def sample_rate(self, message: str) -> float:
+        for prefix, rate in self.sample_rates.items():
+            if message.startswith(prefix):
+                return rate
+        return 1.0
+
+    def __call__(self, record: Dict[str, Any]) -> bool:
+        site = (record["name"], record["function"], record["line"])
+
+        rate = self.sample_rate(record["message"]) if self.sample_rates else 1.0
+        if rate < 1.0 and random.random() >= rate:
+            return self.suppress(site, "sampled")
+
+        if self.rate_limit > 0:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(site, (self.rate_limit, now))
+            tokens, decision = take_token(
+                tokens, updated_at, now, int(self.rate_limit), 1.0
+            )
+            self._buckets[site] = (tokens, now)
+            if not decision.allowed:
+                return self.suppress(site, "rate_limited")
+
+        if suppressed := self._suppressed.pop(site, 0):
+            record["extra"]["suppressed"] = suppressed
+        return True
+
+    def suppress(self, site: Tuple[str, str, int], reason: str) -> bool:
+        self._suppressed[site] = self._suppressed.get(site, 0) + 1
+        suppressed_records.inc(reason=reason)
+        return False
+
+
+def json_format(record: Dict[str, Any]) -> str:
+    """
+    Renders the record as a single JSON line. Loguru formats with
+    str.format_map, the line is stashed in `extra` and referenced there.
+    """
+    extra = dict(record["extra"])
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "request_id": extra.pop("request_id", "-"),
+        "user": extra.pop("user", "-"),
+    }
+    if extra:
+        payload["extra"] = extra
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+
+    record["extra"]["serialized"] = orjson.dumps(payload, default=str).decode()
+    return "{extra[serialized]}\n"
+
+
+class InterceptHandler(logging.Handler):
+    """
+    Handler of the standard logging module which passes records on to
+    loguru, keeping their level and call site.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level: Any = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        # skip the frames of the logging module to point at the caller
+        frame, depth = sys._getframe(1), 1  # pylint: disable=protected-access
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def intercept_standard_logging(level: str) -> None:
+    # libraries are chatty at DEBUG (e.g. every pool checkout), INFO at most
+    levelno = max(logging.getLevelName(level), logging.INFO)
+    logging.basicConfig(handlers=[InterceptHandler()], level=levelno, force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error"):
+        standard_logger = logging.getLogger(name)
+        standard_logger.handlers = []
+        standard_logger.propagate = True
+
+
+def setup_logging(
+    level: str = "INFO",
+    as_json: bool = True,
+    rate_limit: float = 0,
+    sample_rates: Optional[Dict[str, float]] = None,
+    sink: TextIO = sys.stderr,
+    enqueue: bool = True,
+) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Replaces loguru's handlers with the application's sink. Called in every
+    process, forked workers included, so each writes with its own thread.
+    Returns the filter of the sink.
+    """
+    throttle = Throttle(rate_limit, sample_rates or {})
+
+    logger.remove()
+    logger.configure(patcher=add_context)
+    logger.add(
+        sink,
+        level=level,
+        format=json_format if as_json else TEXT_FORMAT,
+        filter=throttle,
+        enqueue=enqueue,
+        colorize=False if as_json else None,
+        backtrace=False,
+        diagnose=False,
+    )
+    intercept_standard_logging(level)
+
+    return throttle
+
+
+_configured_pid: Optional[int] = None
+
+
+def configure_logging() -> None:
+    """
+    Sets up logging from the LOG_* settings, once per process.
+    """
+    global _configured_pid  # pylint: disable=global-statement
+    if _configured_pid == os.getpid():
+        return
+    _configured_pid = os.getpid()
+
+    as_json = settings.LOG_JSON
+    if as_json is None:
+        as_json = settings.ENVIRONMENT != "local"
+
+    setup_logging(
+        level=settings.LOG_LEVEL,
+        as_json=as_json,
+        rate_limit=settings.LOG_RATE_LIMIT,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+    )
@@ -0,0 +1,132 @@
+"""
+Event loop monitor module.
+Handlers are `async def` but still do blocking work (SQL, bcrypt), which
+stalls every request of the worker while it runs. The monitor measures how
+late the event loop runs a callback (its lag) and, when asked to, captures
+the stack of whatever blocks the loop beyond a threshold:
+
+    EVENT_LOOP_BLOCKED: 212ms+ in passlib/context.py:verify called from
+    app/auth/auth.py:248 verify_password
+
+The monitor lives in a thread of its own, a blocked loop can't hide from it.
+"""
+
+import asyncio
+import sys
+import threading
+import traceback
+from time import perf_counter
+from types import FrameType
+from typing import List, Optional
+
+from loguru import logger
+
+from app.utils.metrics import Counter, Histogram
+from app.utils.profiler import short_path
+
+loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop in running a scheduled callback",
+)
+loop_blocked = Counter(
+    "event_loop_blocked_total",
+    "Times the event loop was blocked beyond the threshold",
+)
+
+# frames of files under these directories are the application's own
+APP_PREFIXES = ("app/",)
+
+
+class LoopMonitor:
+    """
+    Every `interval` seconds schedules a callback on the loop and records
+    how late it ran. When the callback is more than `threshold` seconds
+    late and `capture_stacks` is set the stack of the loop's thread is
+    logged, once per stall.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        threshold: float = 0.05,
+        capture_stacks: bool = False,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.capture_stacks = capture_stacks
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_ident: Optional[int] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """
+        Starts monitoring the running loop, as a startup event handler.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_ident = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="loop-monitor", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            ran = threading.Event()
+            scheduled_at = perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(ran.set)
+            except RuntimeError:  # the loop is closed
+                return
+
+            if not ran.wait(self.threshold):
+                loop_blocked.inc()
+                if self.capture_stacks:
+                    self.report(perf_counter() - scheduled_at)
+                while not ran.wait(self.interval) and not self._stopped.is_set():
+                    pass
+            loop_lag.observe(perf_counter() - scheduled_at)
+
+    def report(self, blocked: float) -> None:
+        # pylint: disable=protected-access
+        frame = sys._current_frames().get(self._loop_ident)
+        if frame is None:
+            return
+        logger.warning(
+            f"EVENT_LOOP_BLOCKED: {blocked * 1000:.0f}ms+ in {call_site(frame)}\n"
+            + "".join(traceback.format_stack(frame))
+        )
+
+
+def call_site(frame: FrameType) -> str:
+    """
+    Describes the blocking call: the innermost call the application made
+    and where it made it from, e.g. `sqlalchemy/orm/query.py:all called
+    from app/crud/assets.py:31 get_multi`.
+    """
+    stack: List[FrameType] = []
+    while frame is not None:
+        stack.append(frame)
+        frame = frame.f_back
+
+    for depth, caller in enumerate(stack):
+        if short_path(caller.f_code.co_filename).startswith(APP_PREFIXES):
+            if depth == 0:  # blocked in the application's own code
+                return _location(caller)
+            callee = stack[depth - 1]
+            return (
+                f"{short_path(callee.f_code.co_filename)}:{callee.f_code.co_name}"
+                f" called from {_location(caller)}"
+            )
+    return _location(stack[0])
+
+
+def _location(frame: FrameType) -> str:
+    return (
+        f"{short_path(frame.f_code.co_filename)}:{frame.f_lineno} "
+        f"{frame.f_code.co_name}"
+    )
@@ -0,0 +1,388 @@
+"""
+Metrics module.
+In-process counters, gauges and histograms for the application.
+
+Samples are recorded into per-thread shards so the hot path never takes a
+lock; shards are only summed up when the metrics are collected.
+
+Under the prefork server the workers share a directory (use_directory):
+each one writes its samples to a file of it every few seconds, and the
+metrics exposed by any of them are merged from all the files. Counters and
+histograms are summed up, those of exited workers included so they never
+go down, gauges are exposed per live worker with a `pid` label.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+LabelValues = Tuple[str, ...]
+
+# latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric:
+    """
+    Base class for all the metrics.
+
+    Attributes:
+        name -- metric name
+        documentation -- help text of the metric
+        labelnames -- names of the labels every sample is keyed by
+        registry -- registry the metric is exposed by, the process' by default
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()
+        _register(self, registry)
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            # first sample of this thread, the only time a lock is taken
+            values: Dict = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _snapshots(self) -> List[Dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # copying a dict is atomic under the GIL
+        return [dict(shard) for shard in shards]
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        values = self._shard()
+        key = self._label_values(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def collect(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def value(self, **labels: str) -> float:
+        return self.collect().get(self._label_values(labels), 0)
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed upper bounds. Every sample is counted in the first
+    bucket whose bound is greater than or equal to it.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels: str) -> None:
+        values = self._shard()
+        key = self._label_values(labels)
+        state = values.get(key)
+        if state is None:
+            # bucket counts (+Inf last), sum
+            state = values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def collect(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        totals: Dict[LabelValues, Tuple[List[int], float]] = {}
+        for shard in self._snapshots():
+            for key, (counts, total) in shard.items():
+                counts = list(counts)
+                if key in totals:
+                    merged_counts, merged_total = totals[key]
+                    counts = [a + b for a, b in zip(merged_counts, counts)]
+                    total += merged_total
+                totals[key] = (counts, total)
+        return totals
+
+
+class Gauge(Metric):
+    """
+    Value which goes up and down, e.g. the number of queued requests.
+    Unlike counters a gauge is set rather than summed up, its samples are
+    kept in a single dict shared by all the threads.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._label_values(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._shards_lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> Dict[LabelValues, float]:
+        return dict(self._values)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+
+class Registry:
+    """
+    Collection of all the metrics of the process.
+
+    Collectors are callbacks run right before the metrics are exposed, they
+    set gauges whose value is cheaper to read on demand than to keep up to
+    date (e.g. connection pool sizes).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def run_collectors(self) -> None:
+        for collector in list(self._collectors):
+            collector()
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def __iter__(self) -> Iterator[Metric]:
+        return iter(list(self._metrics.values()))
+
+
+registry = Registry()
+
+# directory the worker processes share their samples through, if any
+_directory: Optional[str] = None
+
+
+def _register(metric: Metric, target: Optional[Registry]) -> None:
+    (registry if target is None else target).register(metric)
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def use_directory(directory: str) -> None:
+    """
+    Shares the samples of the processes forked from now on through the
+    given directory. The files of an earlier run are removed.
+    """
+    global _directory  # pylint: disable=global-statement
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+    _directory = directory
+
+
+def flush(metrics: Optional[Registry] = None) -> None:
+    """
+    Writes the samples of this process to the shared directory.
+    """
+    if _directory is None:
+        return
+    metrics = metrics or registry
+    metrics.run_collectors()
+    samples = {
+        metric.name: [[list(key), value] for key, value in metric.collect().items()]
+        for metric in metrics
+    }
+    path = os.path.join(_directory, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(samples, file)
+    os.replace(f"{path}.tmp", path)  # readers never see a partial file
+
+
+def start_flushing(interval: float) -> None:
+    """
+    Flushes the samples of this process every `interval` seconds, from a
+    thread of its own.
+    """
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                flush()
+            except OSError as err:
+                logger.warning(f"METRICS_FLUSH_ERROR: {err}")
+
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged(metrics: Registry) -> Dict[str, Dict[LabelValues, Any]]:
+    """
+    Returns the samples of all the processes by metric, see the module.
+    """
+    merged: Dict[str, Dict[LabelValues, Any]] = {}
+    for name in sorted(os.listdir(_directory)):
+        if not name.endswith(".json"):
+            continue
+        pid = name[: -len(".json")]
+        try:
+            with open(os.path.join(_directory, name), encoding="utf-8") as file:
+                samples = json.load(file)
+        except (OSError, ValueError):
+            continue  # replaced or removed meanwhile
+        alive = _is_alive(int(pid))
+
+        for metric_name, entries in samples.items():
+            metric = metrics.get(metric_name)
+            if metric is None:
+                continue
+            totals = merged.setdefault(metric_name, {})
+            for key, value in entries:
+                key = tuple(key)
+                if isinstance(metric, Gauge):
+                    if alive:
+                        totals[key + (pid,)] = value
+                elif isinstance(metric, Histogram):
+                    counts, total = value
+                    if key in totals:
+                        merged_counts, merged_total = totals[key]
+                        counts = [a + b for a, b in zip(merged_counts, counts)]
+                        total += merged_total
+                    totals[key] = (counts, total)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+    return merged
+
+
+def exposition(metrics: Optional[Registry] = None) -> str:
+    """
+    Renders the metrics of the registry in the Prometheus text format, those
+    of all the processes sharing the directory if there's one.
+    """
+    metrics = metrics or registry
+    if _directory is None:
+        metrics.run_collectors()
+        collected = {metric.name: metric.collect() for metric in metrics}
+    else:
+        flush(metrics)  # this process' samples as of now
+        collected = _merged(metrics)
+
+    lines: List[str] = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation, False)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        samples = collected.get(metric.name, {})
+
+        if not isinstance(metric, Histogram):
+            labelnames = metric.labelnames
+            if _directory is not None and isinstance(metric, Gauge):
+                labelnames += ("pid",)
+            for key, value in sorted(samples.items()):
+                labels = _labels(labelnames, key)
+                lines.append(f"{metric.name}{labels} {_number(value)}")
+            continue
+
+        names = metric.labelnames + ("le",)
+        for key, (counts, total) in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _labels(names, key + (_number(bound),))
+                lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+            labels = _labels(metric.labelnames, key)
+            lines.append(f"{metric.name}_sum{labels} {_number(total)}")
+            lines.append(f"{metric.name}_count{labels} {cumulative}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+"""
+Profiler module.
+Statistical profiler which samples the stacks of all the threads of the
+process from a background thread. Samples are aggregated as collapsed
+stacks, one `frame;frame;frame count` line per distinct stack, the input
+format of flamegraph.pl, speedscope and most flame graph viewers.
+
+The sampling thread only exists while a profile is being taken, there's no
+overhead at all otherwise.
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from types import CodeType, FrameType
+from typing import Dict, Optional, Tuple
+
+# (file name, function) of frames threads sit in while waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+}
+
+# only one profile is taken at a time per process
+profiling = threading.Lock()
+
+
+class Sampler:
+    """
+    Samples the stack of every thread (but its own) each `interval`
+    seconds until stopped. Threads waiting for work are left out unless
+    `include_idle` is set.
+
+    Note that the sampling thread needs the GIL to take a sample, CPU bound
+    Python code is sampled at most once per switch interval (5ms).
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: "Counter[str]" = Counter()
+        self.samples = 0
+        self._labels: Dict[CodeType, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Sampler":
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        """
+        Stops sampling and returns the collapsed stacks.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[
+                code
+            ] = f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _is_idle(self, frame: FrameType) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def _sample(self, own_ident: int, names: Dict[int, str]) -> None:
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident or (not self.include_idle and self._is_idle(frame)):
+                continue
+
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(f"thread:{names.get(ident, ident)}")
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        names = thread_names()
+        while not self._stopped.wait(self.interval):
+            self._sample(own_ident, names)
+            if self.samples % 100 == 0:
+                names = thread_names()
+
+
+def thread_names() -> Dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+@lru_cache(maxsize=None)
+def _path_prefixes() -> Tuple[str, ...]:
+    entries = (os.path.join(os.path.abspath(entry), "") for entry in sys.path)
+    return tuple(sorted(entries, key=len, reverse=True))
+
+
+def short_path(path: str) -> str:
+    """
+    Returns the path relative to the longest matching sys.path entry, e.g.
+    `app/crud/user.py` or `sqlalchemy/orm/session.py`.
+    """
+    for prefix in _path_prefixes():
+        if path.startswith(prefix):
+            return path[len(prefix) :]
+    return path
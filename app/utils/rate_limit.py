@@ -0,0 +1,169 @@
+"""
+Rate limit module.
+Token buckets: every key has a bucket holding up to `limit` tokens which
+refills at `limit / period` tokens per second. A request takes a token and
+is rejected when the bucket is empty.
+
+Buckets are kept by a store. MemoryStore keeps the buckets of a single
+process, SQLiteStore shares them between the workers of a host through a
+SQLite file, a stand-in for a network store such as Redis.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+
+class Decision(NamedTuple):
+    """
+    Outcome of taking a token.
+
+    Attributes:
+        allowed -- whether a token was taken
+        limit -- size of the bucket
+        remaining -- tokens left in the bucket
+        reset -- seconds until the bucket is full again
+        retry_after -- seconds until the next token is available, 0 when allowed
+    """
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int
+
+
+def take_token(
+    tokens: float, updated_at: float, now: float, limit: int, period: float
+) -> Tuple[float, Decision]:
+    """
+    Refills the bucket for the time passed since it was updated and takes a
+    token out of it. Returns the tokens left and the decision.
+    """
+    rate = limit / period
+    tokens = min(limit, tokens + max(now - updated_at, 0) * rate)
+
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+
+    return tokens, Decision(
+        allowed=allowed,
+        limit=limit,
+        remaining=int(tokens),
+        reset=math.ceil((limit - tokens) / rate),
+        retry_after=0 if allowed else math.ceil((1 - tokens) / rate),
+    )
+
+
+class MemoryStore:
+    """
+    Buckets of this process. Only the `max_keys` most recently used buckets
+    are kept, an evicted bucket starts over full.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, limit: int, period: float) -> Decision:
+        now = time.time()
+        tokens, updated_at = self._buckets.pop(key, (limit, now))
+        tokens, decision = take_token(tokens, updated_at, now, limit, period)
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return decision
+
+
+class SQLiteStore:
+    """
+    Buckets shared by the processes using the same SQLite file. Every take
+    is a single IMMEDIATE transaction, so concurrent workers never lose an
+    update. Buckets idle for longer than `idle_seconds` are full anyway and
+    get pruned every now and then.
+
+    Errors of the store fail open: the request is allowed and logged.
+    """
+
+    blocking = True
+
+    PRUNE_EVERY = 10_000
+
+    def __init__(self, path: str, idle_seconds: float = 3600):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        try:
+            return self._local.connection
+        except AttributeError:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._local.connection = connection
+            return connection
+
+    def take(self, key: str, limit: int, period: float) -> Decision:
+        try:
+            return self._take(self._connection(), key, limit, period)
+        except sqlite3.Error as err:
+            logger.error(f"RATE_LIMIT_STORE_ERROR: {err}")
+            return Decision(True, limit, limit, 0, 0)
+
+    def _take(
+        self, connection: sqlite3.Connection, key: str, limit: int, period: float
+    ) -> Decision:
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_limit_bucket WHERE key = ?",
+                (key,),
+            ).fetchone()
+            tokens, updated_at = row or (limit, now)
+            tokens, decision = take_token(tokens, updated_at, now, limit, period)
+            connection.execute(
+                "INSERT INTO rate_limit_bucket (key, tokens, updated_at) "
+                "VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM rate_limit_bucket WHERE updated_at < ?",
+                    (now - self.idle_seconds,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return decision
+
+
+def create_store(kind: str, path: Optional[str], idle_seconds: float):
+    """
+    Returns the bucket store of the given kind, `memory` or `sqlite`.
+    """
+    if kind == "sqlite":
+        return SQLiteStore(path, idle_seconds)
+    if kind == "memory":
+        return MemoryStore()
+    raise ValueError(f"Unknown rate limit store: {kind}")
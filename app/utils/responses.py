@@ -0,0 +1,41 @@
+"""
+Responses module.
+JSON response class of the application, rendered with orjson.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from app.utils import tracing
+
+
+def _default(obj: Any) -> Any:
+    # orjson natively serializes UUID, datetime, date and enum members,
+    # Numeric columns are rendered as floats just like jsonable_encoder does
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Handlers can return it with a pre-shaped payload built from database
+    rows (UUID, datetime, enum and Decimal values included). Returning a
+    response instance skips FastAPI's response_model validation and the
+    jsonable_encoder pass, so the payload is walked only once.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if tracing.current_span() is None:
+            return json_dumps(content)
+        with tracing.span("serialize"):
+            return json_dumps(content)
@@ -0,0 +1,314 @@
+"""
+Tracing module.
+Lightweight spans kept in a context variable, so they follow a request
+through the event loop and into the threadpool. A request's spans are
+exported together, in the OTLP JSON format, once its root span ends.
+
+Nothing is recorded for requests which aren't sampled: every helper returns
+right away when there's no current span.
+"""
+
+import functools
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from loguru import logger
+
+from app.utils.metrics import Counter
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+dropped_traces = Counter(
+    "tracing_dropped_traces_total",
+    "Sampled traces dropped because the export queue was full",
+)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation of a trace.
+
+    Attributes:
+        trace -- spans of the trace the span belongs to, ended ones only
+        trace_id -- 32 hex digits
+        span_id -- 16 hex digits
+        parent_id -- span_id of the parent, empty for the root span
+        name -- operation name, e.g. `crud.portfolio.read_by_user_id`
+        kind -- one of INTERNAL, SERVER and CLIENT
+        attributes -- key/value pairs describing the operation
+    """
+
+    __slots__ = (
+        "trace",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        trace: List["Span"],
+        trace_id: str,
+        parent_id: str,
+        name: str,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, err: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(err).__name__}: {err}"
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        # list.append is atomic, spans may end in the threadpool
+        self.trace.append(self)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def should_sample(traceparent: Optional[str], rate: float) -> Tuple[bool, str, str]:
+    """
+    Returns whether a request is sampled along with its trace id and the
+    parent span id. A valid W3C `traceparent` header continues the caller's
+    trace and decision, other requests are sampled at the given rate.
+    """
+    if traceparent and (match := TRACEPARENT.match(traceparent.strip())):
+        trace_id, parent_id, flags = match.groups()
+        return bool(int(flags, 16) & 1), trace_id, parent_id
+
+    return random.random() < rate, f"{random.getrandbits(128):032x}", ""
+
+
+def start_trace(name: str, trace_id: str, parent_id: str, **attributes: Any):
+    """
+    Starts the root span of a sampled request and makes it the current span.
+    Returns the span and the token to pass to end_trace.
+    """
+    root = Span([], trace_id, parent_id, name, SERVER, attributes)
+    return root, _current_span.set(root)
+
+
+def end_trace(root: Span, token) -> List[Span]:
+    """
+    Ends the root span and returns all the ended spans of its trace.
+    """
+    _current_span.reset(token)
+    root.end()
+    return root.trace
+
+
+def start_span(
+    name: str, kind: int = INTERNAL, attributes: Optional[Dict[str, Any]] = None
+) -> Optional[Span]:
+    """
+    Starts a child of the current span without making it the current span,
+    for leaf operations such as SQL statements. Returns None when the
+    request isn't traced.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, parent.trace_id, parent.span_id, name, kind, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Runs the block in a child span of the current span.
+    """
+    child = start_span(name, attributes=attributes)
+    if child is None:
+        yield None
+        return
+
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as err:
+        child.set_error(err)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator which runs the function in a child span of the current span.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(prefix: str) -> Callable:
+    """
+    Class decorator which traces every static method of the class as
+    `<prefix>.<method>`, e.g. the CRUD classes.
+    """
+
+    def decorator(cls: type) -> type:
+        for attribute, value in list(vars(cls).items()):
+            if isinstance(value, staticmethod):
+                wrapped = traced(f"{prefix}.{attribute}")(value.__func__)
+                setattr(cls, attribute, staticmethod(wrapped))
+        return cls
+
+    return decorator
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _attribute_value(value)}
+        for key, value in attributes.items()
+    ]
+
+
+def otlp_json(spans: List[Span], service_name: str) -> bytes:
+    """
+    Returns the spans as an OTLP/JSON ExportTraceServiceRequest.
+    """
+    return orjson.dumps(
+        {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _attributes({"service.name": service_name})
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [
+                                {
+                                    "traceId": item.trace_id,
+                                    "spanId": item.span_id,
+                                    "parentSpanId": item.parent_id,
+                                    "name": item.name,
+                                    "kind": item.kind,
+                                    "startTimeUnixNano": str(item.start_ns),
+                                    "endTimeUnixNano": str(item.end_ns),
+                                    "attributes": _attributes(item.attributes),
+                                    "status": {
+                                        "code": item.status,
+                                        "message": item.status_message,
+                                    },
+                                }
+                                for item in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+    )
+
+
+class FileExporter:
+    """
+    Appends every exported trace as a line of OTLP JSON to a file, the
+    format of the OpenTelemetry collector's file exporter, so the file can
+    be replayed into a collector or loaded by any OTLP aware tool.
+
+    Traces are queued and written by a background thread, request handling
+    never waits for the file. Traces are dropped (and counted) when the
+    queue is full.
+    """
+
+    def __init__(self, path: str, service_name: str, max_queue_size: int = 1000):
+        self.path = path
+        self.service_name = service_name
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            dropped_traces.inc()
+
+    def _start(self) -> None:
+        # the writer thread is started on first use in every (forked) process
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._write, name="trace-exporter", daemon=True
+            ).start()
+
+    def _write(self) -> None:
+        with open(self.path, "ab") as file:
+            while True:
+                lines = [otlp_json(self._queue.get(), self.service_name)]
+                while not self._queue.empty() and len(lines) < 100:
+                    lines.append(otlp_json(self._queue.get(), self.service_name))
+                try:
+                    file.write(b"\n".join(lines) + b"\n")
+                    file.flush()
+                except OSError as err:
+                    logger.error(f"TRACE_EXPORT_ERROR: {err}")
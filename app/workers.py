@@ -0,0 +1,120 @@
+"""
+Production server module.
+Runs the application in a pre-fork multi-worker gunicorn process manager
+with uvicorn workers configured by the SERVER_* settings.
+"""
+
+import os
+from typing import Any, Dict
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from app.core import settings
+
+
+def worker_count() -> int:
+    """
+    Returns SERVER_WORKERS or, when it isn't set, one worker per CPU core
+    available to the process.
+    """
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+class AppWorker(UvicornWorker):
+    """
+    Uvicorn worker with the event loop and HTTP parser implementations and
+    the concurrency limit of the settings. With `auto` uvicorn picks uvloop
+    and httptools whenever they're installed.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": settings.SERVER_LOOP,
+        "http": settings.SERVER_HTTP,
+        "limit_concurrency": settings.SERVER_LIMIT_CONCURRENCY,
+    }
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """
+    Drops the database connections a worker inherited from the master, the
+    application is preloaded before forking. Connections are never shared
+    across processes, each worker opens its own.
+    """
+    # pylint: disable=unused-argument,import-outside-toplevel
+    from app.db.session import dispose_engines
+    from app.utils.log_config import configure_logging
+    from app.utils.metrics import start_flushing
+
+    dispose_engines(close=False)
+    # the log writer thread of the master isn't forked along
+    configure_logging()
+    if settings.METRICS_ENABLED:
+        start_flushing(settings.METRICS_FLUSH_INTERVAL)
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    """
+    Writes the last samples of an exiting worker, its counters are still
+    exposed once it's gone.
+    """
+    # pylint: disable=unused-argument,import-outside-toplevel
+    from app.utils.metrics import flush
+
+    if settings.METRICS_ENABLED:
+        flush()
+
+
+class PreforkServer(BaseApplication):
+    """
+    Gunicorn application serving app.server:app.
+
+    The application is imported once in the master and the workers are
+    forked from it, which keeps their start up fast and shares the
+    imported modules' memory copy-on-write.
+    """
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> Any:
+        # pylint: disable=import-outside-toplevel
+        from app.server import create_app
+
+        return create_app()
+
+
+def run_prefork_server() -> None:
+    """
+    Spins up the production server.
+    """
+    if settings.METRICS_ENABLED:
+        # pylint: disable=import-outside-toplevel
+        from app.utils.metrics import use_directory
+
+        # inherited by the workers, the metrics of all are merged
+        use_directory(settings.METRICS_DIR)
+
+    PreforkServer(
+        {
+            "bind": f"0.0.0.0:{settings.PORT}",
+            "workers": worker_count(),
+            "worker_class": "app.workers.AppWorker",
+            "backlog": settings.SERVER_BACKLOG,
+            "keepalive": settings.SERVER_KEEP_ALIVE,
+            "preload_app": True,
+            "post_fork": post_fork,
+            "worker_exit": worker_exit,
+        }
+    ).run()
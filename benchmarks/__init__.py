@@ -0,0 +1,3 @@
+"""
+Benchmark modules. Each module can be executed with `python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,101 @@
+"""
+Error storm benchmark.
+Measures the latency of a handler which fails on every request, logging
+the error the way the routes do (`logger.error` then
+`handle_error.send_error`), while the log sink is slow, e.g. a congested
+pipe to the log collector (SINK_DELAY per record).
+
+    $ python -m benchmarks.error_storm
+
+Before: a synchronous text sink, every record written by the handler.
+After: the application's sink (app.utils.log_config), records written by a
+background thread and rate limited per call site.
+
+No database is needed.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, List
+
+from fastapi import Response
+from loguru import logger
+
+from app.utils.exceptions import SQLAlchemyObjectNotFoundError
+from app.utils.handle_error import HandleError
+from app.utils.log_config import setup_logging
+from benchmarks.utils import latency_summary
+
+SINK_DELAY = 0.0005
+THREADS = 8
+REQUESTS = 4000
+
+handle_error = HandleError()
+
+
+class SlowSink:
+    """
+    Sink taking SINK_DELAY to write a record, one writer at a time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def __call__(self, message: str) -> None:
+        with self.lock:
+            time.sleep(SINK_DELAY)
+            self.records += 1
+
+
+def failing_handler() -> dict:
+    try:
+        raise SQLAlchemyObjectNotFoundError("Asset not found")
+    except Exception as err:  # pylint: disable=broad-except
+        logger.error(err)
+        return handle_error.send_error(err, Response())
+
+
+def run(handler: Callable[[], dict]) -> List[float]:
+    """
+    Calls the handler REQUESTS times from THREADS threads, like the
+    threadpool sync routes run in, and returns the latencies in ms.
+    """
+
+    def timed(_) -> float:
+        started_at = perf_counter()
+        handler()
+        return (perf_counter() - started_at) * 1000
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(timed, range(REQUESTS)))
+
+
+def print_summary(title: str, latencies: List[float], sink: SlowSink) -> None:
+    timing = latency_summary(latencies)
+    print(
+        f"{title:<10} p50 {timing['p50']:>8.3f}ms  p99 {timing['p99']:>8.3f}ms"
+        f"  max {timing['max']:>8.3f}ms  records written {sink.records}"
+    )
+
+
+def main() -> None:
+    print(f"{REQUESTS} failing requests from {THREADS} threads")
+
+    sink = SlowSink()
+    setup_logging(level="INFO", as_json=False, sink=sink, enqueue=False)
+    latencies = run(failing_handler)
+    logger.remove()
+    print_summary("before", latencies, sink)
+
+    sink = SlowSink()
+    setup_logging(level="INFO", as_json=True, rate_limit=20, sink=sink, enqueue=True)
+    latencies = run(failing_handler)
+    logger.remove()  # waits for the queue to be written
+    print_summary("after", latencies, sink)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Order expiry benchmark.
+Measures the cost of scheduling the expiries of millions of pending orders
+and of advancing the clock second by second to find the ones due, while
+new orders keep coming in. A third of the orders are DAY orders, expiring
+together at the end of the day, the others GTD orders expiring within
+--days days.
+
+    $ python -m benchmarks.expiry --orders 1000000 --hours 48
+
+Before: a heap of the expiries, O(log n) to schedule or expire an order.
+After: the timing wheel of app.trading, O(1) to schedule and to expire.
+
+No database is needed.
+"""
+
+import argparse
+import heapq
+import math
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+from app.trading.expiry import EPOCH, TimingWheel
+from benchmarks.utils import latency_summary
+
+START = datetime(2023, 7, 3, 9, 30)
+DAY_END = datetime(2023, 7, 4)
+
+
+class HeapSchedule:
+    """
+    The expiries in a heap, with the interface of the timing wheel.
+    """
+
+    def __init__(self, now: datetime, tick_seconds: float = 1.0):
+        self.tick_seconds = tick_seconds
+        self.entries: List[Tuple[int, Any]] = []
+        self.expiries: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+    def schedule(self, item: Any, moment: datetime) -> None:
+        tick = math.ceil((moment - EPOCH).total_seconds() / self.tick_seconds)
+        self.expiries[item] = tick
+        heapq.heappush(self.entries, (tick, item))
+
+    def advance(self, moment: datetime) -> List[Any]:
+        target = math.floor((moment - EPOCH).total_seconds() / self.tick_seconds)
+        fired = []
+        while self.entries and self.entries[0][0] <= target:
+            tick, item = heapq.heappop(self.entries)
+            if self.expiries.get(item) == tick:
+                del self.expiries[item]
+                fired.append(item)
+        return fired
+
+
+class Orders:
+    """
+    Random DAY and GTD expiries, ids counting up.
+    """
+
+    def __init__(self, seed: int, days: int):
+        self.random = random.Random(seed)
+        self.span = days * 86400
+        self.next_id = 0
+
+    def make(self, now: datetime) -> Tuple[int, datetime]:
+        self.next_id += 1
+        if self.random.random() < 1 / 3 and now < DAY_END:
+            return self.next_id, DAY_END
+        return self.next_id, now + timedelta(seconds=self.random.uniform(1, self.span))
+
+
+def run(
+    title: str,
+    schedule_class,
+    resting: List[Tuple[int, datetime]],
+    placed: List[Tuple[datetime, List[Tuple[int, datetime]]]],
+) -> None:
+    schedule = schedule_class(START)
+    started_at = perf_counter()
+    for item, moment in resting:
+        schedule.schedule(item, moment)
+    loaded_in = perf_counter() - started_at
+
+    latencies, expired, largest = [], 0, 0
+    for now, orders in placed:
+        started_at = perf_counter()
+        for item, moment in orders:
+            schedule.schedule(item, moment)
+        due = schedule.advance(now)
+        latencies.append((perf_counter() - started_at) * 1000)
+        expired += len(due)
+        largest = max(largest, len(due))
+
+    timing = latency_summary(latencies)
+    print(
+        f"{title:<8} schedule {loaded_in / len(resting) * 1e9:>6.0f}ns/order"
+        f"  expired {expired:>8} (largest batch {largest:>7})"
+        f"  per second p50 {timing['p50']:>7.3f}ms  p99 {timing['p99']:>7.3f}ms"
+        f"  max {timing['max']:>8.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Order expiry benchmark.")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--days", type=int, default=7, help="span of GTD expiries")
+    parser.add_argument("--rate", type=int, default=20, help="orders placed a second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    orders = Orders(args.seed, args.days)
+    resting = [orders.make(START) for _ in range(args.orders)]
+    placed = []
+    for second in range(1, args.hours * 3600 + 1):
+        now = START + timedelta(seconds=second)
+        placed.append((now, [orders.make(now) for _ in range(args.rate)]))
+
+    print(f"{args.orders} pending orders, {args.hours}h at {args.rate} orders/s")
+    run("before", HeapSchedule, resting, placed)
+    run("after", TimingWheel, resting, placed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Import time budget.
+Starts a fresh interpreter with `-X importtime`, creates the app the way a
+worker does and fails when the application's own share of it takes longer
+than the budget.
+
+    $ python -m benchmarks.import_time [--budget-ms 500] [--top 15]
+
+The share is measured in another interpreter which imports the third party
+modules of the boot (FastAPI, SQLAlchemy...) first: their import time
+depends on their versions and the machine, not on the application. The
+total boot is reported along with it.
+
+Besides the totals it lists the slowest top level imports and their direct
+imports (cumulative time), so a regression points straight at the module
+which caused it. tests/test_import_time.py runs the check. Creating the
+app doesn't connect to the database: without a .env the settings it
+requires are given placeholder values.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+# milliseconds the application's imports and create_app() may take
+BUDGET_MS = 500
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the settings without a default, for a checkout without a .env
+REQUIRED_SETTINGS = {
+    "ENVIRONMENT": "dev",
+    "DB_URL": "postgresql://papertrade@localhost/papertrade",
+    "MIGRATION_SCRIPT_LOCATION": "./migrations",
+    "SIGNING_KEY": "import-time",
+    "SIGNING_ALGORITHM": "HS256",
+    "VALIDATION_PERIOD": "1",
+    "TOKEN_ISSUER": "import-time",
+    "TOKEN_AUDIENCE": "import-time",
+    "BA_API_DOC_USERNAME": "import-time",
+    "BA_API_DOC_PASSWORD": "import-time",
+    "SUPER_ADMIN_USER": "import-time",
+    "SUPER_ADMIN_PW": "import-time",
+}
+
+WORKER_BOOT = """
+import time
+started_at = time.perf_counter()
+from app.server import create_app
+create_app()
+print(f"BOOT_SECONDS={time.perf_counter() - started_at}")
+"""
+
+# the modules given as arguments are imported before the clock starts
+APP_BOOT = """
+import importlib
+import sys
+import time
+for module in sys.argv[1:]:
+    try:
+        importlib.import_module(module)
+    except Exception:
+        pass
+started_at = time.perf_counter()
+from app.server import create_app
+create_app()
+print(f"BOOT_SECONDS={time.perf_counter() - started_at}")
+"""
+
+
+class Boot(NamedTuple):
+    total_ms: float
+    app_ms: float
+    # (module, cumulative us, depth) of every import of the boot
+    imports: List[Tuple[str, int, int]]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Returns (module, cumulative us, depth) of every import in the given
+    `-X importtime` output.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if match := IMPORT_LINE.match(line):
+            _, cumulative, indent, module = match.groups()
+            imports.append((module, int(cumulative), len(indent) // 2))
+    return imports
+
+
+def _boot_seconds(stdout: str) -> float:
+    return float(re.search(r"BOOT_SECONDS=(\S+)", stdout)[1])
+
+
+def boot_env() -> Dict[str, str]:
+    """
+    Returns the environment of the measured interpreters: this one's, plus
+    REQUIRED_SETTINGS unless a .env provides the settings.
+    """
+    env = dict(os.environ)
+    if not os.path.exists(os.path.join(ROOT, ".env")):
+        for name, value in REQUIRED_SETTINGS.items():
+            env.setdefault(name, value)
+    return env
+
+
+def _boot(*args: str) -> subprocess.CompletedProcess:
+    result = subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=boot_env(),
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"the app failed to boot:\n{result.stderr[-2000:]}")
+    return result
+
+
+def measure(repeat: int = 3) -> Boot:
+    """
+    Measures a worker boot and the application's share of it, the best of
+    `repeat` runs of the latter.
+    """
+    result = _boot("-X", "importtime", "-c", WORKER_BOOT)
+    imports = parse_importtime(result.stderr)
+    third_party = [
+        module
+        for module, _, _ in imports
+        if module != "app" and not module.startswith("app.")
+    ]
+
+    app_seconds = min(
+        _boot_seconds(_boot("-c", APP_BOOT, *third_party).stdout) for _ in range(repeat)
+    )
+    return Boot(_boot_seconds(result.stdout) * 1000, app_seconds * 1000, imports)
+
+
+def run(budget_ms: float, top: int) -> bool:
+    boot = measure()
+
+    top_level = sorted(
+        (entry for entry in boot.imports if entry[2] <= 1),
+        key=lambda entry: entry[1],
+        reverse=True,
+    )
+    print(f"{'module':<40} {'cumulative':>12}")
+    for module, cumulative, _ in top_level[:top]:
+        print(f"{module:<40} {cumulative / 1000:>10.1f}ms")
+
+    within_budget = boot.app_ms <= budget_ms
+    print(
+        f"\nworker boot (imports + create_app): {boot.total_ms:.1f}ms, "
+        f"of which the application: {boot.app_ms:.1f}ms, "
+        f"budget {budget_ms:.0f}ms -> {'OK' if within_budget else 'OVER BUDGET'}"
+    )
+    return within_budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.budget_ms, args.top) else 1)
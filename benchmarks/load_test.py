@@ -0,0 +1,536 @@
+"""
+Load test.
+Virtual users drive every v1 endpoint through weighted scenarios (signup
+and signin, portfolio and portfolio stock CRUD, order placement, market
+data reads and ingestion) for a fixed duration. Latency percentiles and
+throughput are reported per endpoint and written as JSON.
+
+    $ python -m benchmarks.load_test --users 16 --duration 60
+
+Unless --url is given the database is migrated and a server is started on
+a free local port for the run, with rate limiting turned off. Only the
+standard library is used on the client side, no network access is needed
+beyond the local database.
+
+Scenario picks and payloads come from --seed, two runs against the same
+build issue the same sequence of requests per virtual user (but for the
+email addresses of the accounts, unique per run).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.utils import latency_summary
+
+DEFAULT_OUTPUT = "benchmarks/results/load_test.json"
+
+# environment of the server started for the run
+SERVER_ENV = {"RATE_LIMIT": "false", "LOG_LEVEL": "WARNING"}
+
+RUN_ID = uuid.uuid4().hex[:8]
+
+
+class Recorder:
+    """
+    Latencies (ms) and status codes per endpoint, shared by the virtual
+    users.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, latency: float, status: int, ok: bool) -> None:
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][status] += 1
+            if not ok:
+                self.failures[endpoint] += 1
+
+
+class VirtualUser:
+    """
+    A user of the API with its own keep-alive connection, account, token
+    and the ids of what it created.
+    """
+
+    def __init__(self, index: int, url: str, seed: int, recorder: Recorder):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(
+            parts.hostname, parts.port or 80, timeout=30
+        )
+        self.random = random.Random(seed * 1000 + index)
+        self.recorder = recorder
+        self.index = index
+        # accounts are unique per run, an interrupted run leaves its users behind
+        self.email = f"load-{RUN_ID}-{index}@loadtest.papertrade.live"
+        self.password = "load-test"
+        self.user_id = ""
+        self.token = ""
+        self.portfolio_id = ""
+        self.asset_id = ""
+        self.ticks = 0
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        expect: Tuple[int, ...] = (200, 201),
+    ) -> Dict[str, Any]:
+        """
+        Sends a request, `endpoint` is the route it's recorded under, e.g.
+        "GET /portfolio/{user_id}". Returns the JSON body, {} otherwise.
+        """
+        headers = {"Accept": "application/json"}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        started_at = perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            data, status = b"", 0
+        latency = (perf_counter() - started_at) * 1000
+
+        self.recorder.record(endpoint, latency, status, status in expect)
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {}
+
+    def details(self, response: Dict[str, Any], key: str) -> str:
+        details = response.get("details") or {}
+        return details.get(key, "") if isinstance(details, dict) else ""
+
+    def next_datetime(self) -> str:
+        # market data points are unique per asset and time
+        self.ticks += 1
+        moment = datetime(2020, 1, 1) + timedelta(minutes=self.ticks)
+        return moment.isoformat()
+
+    def price(self) -> float:
+        return round(self.random.uniform(10, 500), 2)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# Scenarios, each a short session of a virtual user
+
+
+def setup(user: VirtualUser) -> None:
+    response = user.request(
+        "POST",
+        "POST /users/signup",
+        "/users/signup",
+        {
+            "full_name": f"Load User{user.index}",
+            "email": user.email,
+            "password": user.password,
+        },
+    )
+    user.user_id = user.details(response, "user_id")
+    user.token = user.details(response, "access_token")
+
+    response = user.request(
+        "POST",
+        "POST /portfolio/{user_id}",
+        f"/portfolio/{user.user_id}",
+        {"name": "Load"},
+    )
+    user.portfolio_id = user.details(response, "portfolio_id")
+    create_asset(user)
+
+
+def teardown(user: VirtualUser) -> None:
+    user.request("DELETE", "DELETE /users/{user_id}", f"/users/{user.user_id}")
+
+
+def create_asset(user: VirtualUser) -> None:
+    price = user.price()
+    response = user.request(
+        "POST",
+        "POST /assets",
+        "/assets",
+        {
+            "symbol": f"L{user.random.randrange(10 ** 8):08d}",
+            "name": f"Load Asset {user.index}",
+            "exchange": user.random.choice(["NYSE", "LSE"]),
+            "current_price": price,
+            "previous_close_price": price,
+            "open": price,
+            "high": price,
+            "low": price,
+            "volume": user.random.randrange(1, 10**6),
+            "market_cap": price * 10**6,
+        },
+    )
+    user.asset_id = user.details(response, "asset_id") or user.asset_id
+
+
+def auth(user: VirtualUser) -> None:
+    response = user.request(
+        "POST",
+        "POST /users/signin",
+        "/users/signin",
+        {"email": user.email, "password": user.password},
+    )
+    user.token = user.details(response, "access_token") or user.token
+    user.request(
+        "GET", "GET /users/{user_id}/details", f"/users/{user.user_id}/details"
+    )
+    user.request(
+        "PUT",
+        "PUT /users/{user_id}/updates",
+        f"/users/{user.user_id}/updates",
+        {"full_name": f"Load User{user.random.randrange(1000)}"},
+    )
+
+
+def portfolio(user: VirtualUser) -> None:
+    response = user.request(
+        "POST",
+        "POST /portfolio/{user_id}",
+        f"/portfolio/{user.user_id}",
+        {"name": "Scratch"},
+    )
+    portfolio_id = user.details(response, "portfolio_id")
+    user.request("GET", "GET /portfolio/{user_id}", f"/portfolio/{user.user_id}")
+    user.request(
+        "PUT",
+        "PUT /portfolio/{user_id}",
+        f"/portfolio/{user.user_id}",
+        {"portfolio_id": portfolio_id, "name": "Renamed"},
+    )
+
+    price, quantity = user.price(), user.random.randrange(1, 100)
+    response = user.request(
+        "POST",
+        "POST /portfolio_stock/{portfolio_id}",
+        f"/portfolio_stock/{portfolio_id}",
+        {
+            "asset_id": user.asset_id,
+            "asset_name": "Load Asset",
+            "quantity": quantity,
+            "purchase_price": price,
+            "total_investment": price * quantity,
+            "purchase_date": user.next_datetime(),
+        },
+    )
+    stock_id = user.details(response, "portfolio_stock_id")
+    user.request(
+        "GET", "GET /portfolio_stock/{portfolio_id}", f"/portfolio_stock/{portfolio_id}"
+    )
+    user.request(
+        "PUT",
+        "PUT /portfolio_stock/{portfolio_stock_id}",
+        f"/portfolio_stock/{stock_id}",
+        {"quantity": quantity + 1},
+    )
+    user.request(
+        "GET",
+        "GET /portfolio_stock/user/{user_id}",
+        f"/portfolio_stock/user/{user.user_id}",
+    )
+    user.request(
+        "DELETE",
+        "DELETE /portfolio_stock/{portfolio_stock_id}",
+        f"/portfolio_stock/{stock_id}",
+    )
+    user.request(
+        "DELETE",
+        "DELETE /portfolio/{user_id}",
+        f"/portfolio/{user.user_id}",
+        {"portfolio_id": portfolio_id},
+    )
+
+
+def orders(user: VirtualUser) -> None:
+    price, quantity = user.price(), user.random.randrange(1, 100)
+    limit = user.random.random() < 0.3
+    response = user.request(
+        "POST",
+        "POST /transaction/{portfolio_id}",
+        f"/transaction/{user.portfolio_id}",
+        {
+            "asset_id": user.asset_id,
+            "transaction_type": user.random.choice(["BUY", "SELL"]),
+            "transaction_status": "PENDING",
+            "transaction_date": user.next_datetime(),
+            "transaction_price": price,
+            "quantity": quantity,
+            "order_type": "LIMIT" if limit else "MARKET",
+            "limit_price": price if limit else None,
+            "transaction_value": price * quantity,
+        },
+    )
+    transaction_id = user.details(response, "transaction_id")
+    user.request(
+        "GET", "GET /transaction/{portfolio_id}", f"/transaction/{user.portfolio_id}"
+    )
+    user.request(
+        "PUT",
+        "PUT /transaction/{transaction_id}",
+        f"/transaction/{transaction_id}",
+        {"quantity": str(quantity + 1)},
+    )
+    user.request(
+        "GET", "GET /transaction/user/{user_id}", f"/transaction/user/{user.user_id}"
+    )
+    # every other order is cancelled, the transaction history keeps growing
+    if user.random.random() < 0.5:
+        user.request(
+            "DELETE",
+            "DELETE /transaction/{transaction_id}",
+            f"/transaction/{transaction_id}",
+        )
+
+
+def exports(user: VirtualUser) -> None:
+    user.request(
+        "GET",
+        "GET /transaction/{portfolio_id}/export",
+        f"/transaction/{user.portfolio_id}/export?format=ndjson",
+    )
+    user.request(
+        "GET",
+        "GET /transaction/user/{user_id}/export",
+        f"/transaction/user/{user.user_id}/export?format=csv",
+    )
+
+
+def market_data(user: VirtualUser) -> None:
+    user.request("GET", "GET /home", "/home")
+    user.request("GET", "GET /assets", "/assets")
+    user.request("GET", "GET /assets", f"/assets?asset_id={user.asset_id}")
+    user.request("GET", "GET /marketdata/{asset_id}", f"/marketdata/{user.asset_id}")
+
+
+def ingestion(user: VirtualUser) -> None:
+    for _ in range(5):
+        low = user.price()
+        high = round(low * 1.02, 2)
+        user.request(
+            "POST",
+            "POST /marketdata",
+            "/marketdata",
+            {
+                "asset_id": user.asset_id,
+                "datetime": user.next_datetime(),
+                "open": low,
+                "high": high,
+                "low": low,
+                "close": high,
+                "volume": user.random.randrange(1, 10**6),
+            },
+        )
+    if user.random.random() < 0.1:
+        create_asset(user)
+
+
+# scenario, weight
+SCENARIOS: List[Tuple[Callable[[VirtualUser], None], int]] = [
+    (market_data, 40),
+    (orders, 25),
+    (portfolio, 15),
+    (ingestion, 10),
+    (auth, 5),
+    (exports, 5),
+]
+
+
+def run_user(user: VirtualUser, deadline: float) -> None:
+    scenarios, weights = zip(*SCENARIOS)
+    try:
+        setup(user)
+        while time.monotonic() < deadline:
+            user.random.choices(scenarios, weights)[0](user)
+        teardown(user)
+    finally:
+        user.close()
+
+
+def run(url: str, users: int, duration: float, seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=run_user,
+            args=(VirtualUser(index, url, seed, recorder), deadline),
+            daemon=True,
+        )
+        for index in range(users)
+    ]
+    started_at = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started_at
+
+    endpoints = {}
+    for endpoint in sorted(recorder.latencies):
+        latencies = recorder.latencies[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "failures": recorder.failures[endpoint],
+            "throughput_rps": len(latencies) / elapsed,
+            "latency_ms": latency_summary(latencies),
+            "statuses": {
+                str(status): count
+                for status, count in recorder.statuses[endpoint].items()
+            },
+        }
+
+    every = [
+        latency for latencies in recorder.latencies.values() for latency in latencies
+    ]
+    return {
+        "meta": {
+            "url": url,
+            "users": users,
+            "duration_s": duration,
+            "elapsed_s": elapsed,
+            "seed": seed,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "total": {
+            "requests": len(every),
+            "failures": sum(recorder.failures.values()),
+            "throughput_rps": len(every) / elapsed,
+            "latency_ms": latency_summary(every),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(
+        f"{'endpoint':<44} {'reqs':>7} {'fail':>5} {'rps':>8}"
+        f" {'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for endpoint, row in rows:
+        latency = row["latency_ms"]
+        print(
+            f"{endpoint:<44} {row['requests']:>7} {row['failures']:>5}"
+            f" {row['throughput_rps']:>8.1f} {latency['p50']:>6.1f}ms"
+            f" {latency['p95']:>6.1f}ms {latency['p99']:>6.1f}ms"
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, server: subprocess.Popen, timeout: float = 60) -> None:
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"the server exited with {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection(
+                parts.hostname, parts.port, timeout=1
+            )
+            connection.request("GET", "/home")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit(f"the server didn't answer within {timeout:.0f}s")
+
+
+def start_server(workers: int) -> Tuple[str, subprocess.Popen]:
+    """
+    Migrates the database and starts a server for the run.
+    """
+    # pylint: disable=import-outside-toplevel
+    from app.services import init_db
+
+    init_db()
+
+    port = free_port()
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.server:create_app",
+        "--factory",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--no-access-log",
+    ]
+    server = subprocess.Popen(command, env={**os.environ, **SERVER_ENV})
+    url = f"http://127.0.0.1:{port}"
+    wait_until_up(url, server)
+    return url, server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="server to test, one is started otherwise")
+    parser.add_argument("--users", type=int, default=8, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="of the started server")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON file")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_server(args.workers)
+
+    try:
+        print(f"{args.users} users for {args.duration:.0f}s against {url}")
+        results = run(url, args.users, args.duration, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {args.output}")
+
+    if results["total"]["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Metrics overhead benchmark.
+Measures what the instrumentation costs the hot path: a single sample of
+each metric type, a request going through the metrics middleware, samples
+recorded from many threads at once and rendering the exposition.
+
+    $ python -m benchmarks.metrics_overhead
+
+No database is needed.
+"""
+
+import asyncio
+import threading
+from time import perf_counter
+
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.metrics import Counter, Gauge, Histogram, Registry, exposition
+from benchmarks.utils import measure, report
+
+THREADS = 8
+SAMPLES_PER_THREAD = 50_000
+
+
+class LockedHistogram:
+    """
+    Baseline: a histogram guarded by a single lock, the usual approach.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histogram = Histogram("bench_locked", "", registry=Registry())
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.histogram.observe(value)
+
+
+def run_samples() -> None:
+    metrics = Registry()
+    counter = Counter("bench_total", "", labelnames=("route",), registry=metrics)
+    gauge = Gauge("bench_gauge", "", labelnames=("route",), registry=metrics)
+    histogram = Histogram("bench_seconds", "", labelnames=("route",), registry=metrics)
+
+    for title, func in (
+        ("Counter.inc", lambda: counter.inc(route="GET /assets")),
+        ("Gauge.inc", lambda: gauge.inc(route="GET /assets")),
+        ("Histogram.observe", lambda: histogram.observe(0.012, route="GET /assets")),
+    ):
+        timing = measure(func, number=100_000)
+        print(f"{title:<40} {timing['median_us'] * 1000:>9.0f}ns")
+
+
+def run_threads() -> None:
+    """
+    Records samples from THREADS threads at once. The sharded histogram
+    never takes a lock after the first sample of a thread.
+    """
+
+    def timed(observe) -> float:
+        def work():
+            for _ in range(SAMPLES_PER_THREAD):
+                observe(0.012)
+
+        threads = [threading.Thread(target=work) for _ in range(THREADS)]
+        started_at = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - started_at
+        return elapsed / (THREADS * SAMPLES_PER_THREAD) * 1e6
+
+    locked = LockedHistogram()
+    sharded = Histogram("bench_sharded", "", registry=Registry())
+    before, after = timed(locked.observe), timed(sharded.observe)
+    report(
+        f"observe from {THREADS} threads",
+        {"median_us": before},
+        {"median_us": after},
+    )
+
+
+def run_middleware() -> None:
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/assets", "headers": []}
+    instrumented = MetricsMiddleware(endpoint)
+    loop = asyncio.new_event_loop()
+
+    def bare():
+        loop.run_until_complete(endpoint(scope, receive, send))
+
+    def with_metrics():
+        loop.run_until_complete(instrumented(scope, receive, send))
+
+    try:
+        before = measure(bare, number=5000)
+        after = measure(with_metrics, number=5000)
+        report("request through MetricsMiddleware", before, after)
+        overhead = after["median_us"] - before["median_us"]
+        print(f"{'  overhead per request':<40} {overhead:>9.1f}us")
+    finally:
+        loop.close()
+
+
+def run_exposition() -> None:
+    # 50 routes x 10 statuses of a request histogram and a response counter
+    metrics = Registry()
+    histogram = Histogram("bench_request_seconds", "", ("route",), registry=metrics)
+    counter = Counter(
+        "bench_responses_total", "", ("route", "status"), registry=metrics
+    )
+    for route in range(50):
+        histogram.observe(0.01, route=f"GET /route/{route}")
+        for status in range(10):
+            counter.inc(route=f"GET /route/{route}", status=str(200 + status))
+
+    timing = measure(lambda: exposition(metrics), number=100)
+    print(f"{'exposition of 550 series':<40} {timing['median_us'] / 1000:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    run_samples()
+    run_threads()
+    run_middleware()
+    run_exposition()
@@ -0,0 +1,582 @@
+"""
+Microbenchmarks of the hot paths.
+Times JWT encoding and decoding, verify_gty, the response shaping helpers,
+jsonable_encoder on model rows and every CRUD method, and compares the
+timings against a stored baseline.
+
+    # record the baseline, e.g. on the main branch
+    $ python -m benchmarks.microbench --save-baseline
+
+    # compare, exits non-zero when a hot path got slower
+    $ python -m benchmarks.microbench --threshold 0.1
+
+A benchmark regressed when its median per call time grew by more than the
+threshold and the Mann-Whitney U test says the rounds of the baseline and
+of the run differ (p < --alpha). Baselines are only comparable on the same
+machine.
+
+The CRUD benchmarks need the database of DB_URL, they run in a single
+transaction which is rolled back, and are skipped when it's unreachable.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import uuid
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+
+from app import crud
+from app.api.v1.portfolio import merge_portfolio_stocks
+from app.auth import auth
+from app.db.session import SessionLocal
+from app.db.unit_of_work import UnitOfWork
+from app.models import MarketDataHistorical, Transaction, User
+from app.schemas import (
+    CreateAsset,
+    CreateMarketDataHistorical,
+    CreatePortfolio,
+    CreatePortfolioStock,
+    CreateTransaction,
+)
+from app.utils.general import General
+from benchmarks.utils import mann_whitney_u
+
+DEFAULT_BASELINE = "benchmarks/baselines/microbench.json"
+
+# benchmark: (run, prepare), prepare's result is passed to run and isn't timed
+Runner = Tuple[Callable, Optional[Callable[[], Any]]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    needs_db: bool
+    factory: Callable[["Fixtures"], Runner]
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, needs_db: bool = False):
+    def register(factory: Callable[["Fixtures"], Runner]):
+        BENCHMARKS.append(Benchmark(name, needs_db, factory))
+        return factory
+
+    return register
+
+
+class Fixtures:
+    """
+    Rows the benchmarks work on: a user with a portfolio of 100 transactions
+    and 10 stocks, and an asset with 500 bars. All of them live in a
+    transaction which is rolled back by close(), each database benchmark
+    runs in a savepoint of its own.
+    """
+
+    password = "microbench"
+
+    def __init__(self):
+        self.db = None
+        self.transactions: List[Transaction] = [make_transaction() for _ in range(100)]
+
+    def open_db(self) -> None:
+        self.db = SessionLocal()
+        UnitOfWork(self.db)
+        self.db.connection()  # fails right away when the database is unreachable
+
+        self.email = f"microbench-{uuid.uuid4().hex[:8]}@papertrade.live"
+        self.user = crud.user.create(
+            self.db,
+            {
+                "full_name": "Micro Bench",
+                "email": self.email,
+                "password": self.password,
+            },
+        )
+        self.token = auth.encode_jwt(self.email, self.password)
+        self.portfolio = crud.portfolio.create(
+            self.db, CreatePortfolio(name="Bench", user_id=str(self.user.user_id))
+        )
+        self.asset = crud.assets.create(self.db, asset_payload())
+
+        self.db_transactions = [
+            crud.transaction.create(self.db, self.transaction_payload())
+            for _ in range(100)
+        ]
+        self.stocks = [
+            crud.portfolio_stock.create(self.db, self.stock_payload())
+            for _ in range(10)
+        ]
+        started = datetime(2023, 1, 2)
+        self.db.add_all(
+            MarketDataHistorical(
+                asset_id=self.asset.asset_id,
+                datetime=started + timedelta(minutes=minute),
+                open=1,
+                high=1,
+                low=1,
+                close=1,
+                volume=1,
+            )
+            for minute in range(500)
+        )
+        self.db.flush()
+        self.bar = crud.market_data_historical.create(
+            self.db, self.bar_payload(started - timedelta(days=1))
+        )
+        self.ticks = 0
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.rollback()
+            self.db.close()
+
+    @property
+    def ids(self) -> Dict[str, str]:
+        return {
+            "user_id": str(self.user.user_id),
+            "portfolio_id": str(self.portfolio.portfolio_id),
+            "asset_id": str(self.asset.asset_id),
+        }
+
+    def transaction_payload(self) -> CreateTransaction:
+        return CreateTransaction(
+            portfolio_id=self.ids["portfolio_id"],
+            asset_id=self.ids["asset_id"],
+            transaction_type="BUY",
+            transaction_status="PENDING",
+            transaction_date="2023-07-12T15:30:00",
+            transaction_price=2,
+            quantity=3,
+            order_type="MARKET",
+            transaction_value=6,
+        )
+
+    def stock_payload(self) -> CreatePortfolioStock:
+        return CreatePortfolioStock(
+            portfolio_id=self.ids["portfolio_id"],
+            asset_id=self.ids["asset_id"],
+            asset_name="Bench",
+            quantity=3,
+            purchase_price=2,
+            total_investment=6,
+            purchase_date="2023-07-12T15:30:00",
+        )
+
+    def bar_payload(
+        self, moment: Optional[datetime] = None
+    ) -> CreateMarketDataHistorical:
+        if moment is None:
+            self.ticks += 1
+            moment = datetime(2022, 1, 1) + timedelta(minutes=self.ticks)
+        return CreateMarketDataHistorical(
+            asset_id=self.ids["asset_id"],
+            datetime=moment,
+            open=1,
+            high=2,
+            low=1,
+            close=2,
+            volume=5,
+        )
+
+    def request(self) -> Request:
+        return Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/",
+                "headers": [(b"authorization", f"Bearer {self.token}".encode())],
+            }
+        )
+
+
+def asset_payload() -> CreateAsset:
+    return CreateAsset(
+        symbol="BNCH",
+        name="Bench",
+        exchange="NYSE",
+        current_price=1,
+        previous_close_price=1,
+        open=1,
+        high=1,
+        low=1,
+        volume=1,
+        market_cap=1,
+    )
+
+
+def make_transaction() -> Transaction:
+    return Transaction(
+        transaction_id=uuid.uuid4(),
+        portfolio_id=uuid.uuid4(),
+        asset_id=uuid.uuid4(),
+        transaction_type="BUY",
+        transaction_status="FULFILLED",
+        transaction_date=datetime(2023, 7, 12, 15, 30),
+        transaction_price=2.5,
+        quantity=3,
+        order_type="MARKET",
+        transaction_value=7.5,
+        created_at=datetime(2023, 7, 12, 15, 30),
+        updated_at=datetime(2023, 7, 12, 15, 30),
+    )
+
+
+# Auth
+
+
+@benchmark("auth.encode_jwt")
+def bench_encode_jwt(_: Fixtures) -> Runner:
+    return lambda: auth.encode_jwt("bench@papertrade.live", "password"), None
+
+
+@benchmark("auth.decode_jwt")
+def bench_decode_jwt(_: Fixtures) -> Runner:
+    token = auth.encode_jwt("bench@papertrade.live", "password")
+    return lambda: auth.decode_jwt(token), None
+
+
+@benchmark("auth.verify_gty", needs_db=True)
+def bench_verify_gty(fixtures: Fixtures) -> Runner:
+    request, user_id = fixtures.request(), fixtures.ids["user_id"]
+    return lambda: auth.verify_gty(fixtures.db, request, User, user_id), None
+
+
+# Response shaping
+
+
+@benchmark("general.exclude_metadata")
+def bench_exclude_metadata(fixtures: Fixtures) -> Runner:
+    row = jsonable_encoder(fixtures.transactions[0])
+    return lambda: General.exclude_metadata(row), None
+
+
+@benchmark("portfolio.merge_portfolio_stocks")
+def bench_merge_portfolio_stocks(_: Fixtures) -> Runner:
+    assets = [str(uuid.uuid4()) for _ in range(10)]
+    stocks = [
+        {"asset_id": assets[index % 10], "quantity": 3, "total_investment": 7.5}
+        for index in range(100)
+    ]
+    return lambda: merge_portfolio_stocks(stocks), None
+
+
+@benchmark("jsonable_encoder.transaction_rows")
+def bench_jsonable_encoder(fixtures: Fixtures) -> Runner:
+    return lambda: jsonable_encoder(fixtures.transactions), None
+
+
+# CRUD, (module, method, arguments) with the arguments built from the fixtures
+
+CRUD_CALLS: List[Tuple[str, str, Callable[[Fixtures], tuple]]] = [
+    ("user", "get_by_user_id", lambda f: (f.ids["user_id"],)),
+    ("user", "get_by_email", lambda f: (f.email,)),
+    ("user", "read_by_email", lambda f: (f.email,)),
+    ("user", "get_multi", lambda f: ()),
+    ("user", "update", lambda f: (f.ids["user_id"], {"full_name": "Bench Micro"})),
+    (
+        "portfolio",
+        "create",
+        lambda f: (CreatePortfolio(name="Bench", user_id=f.ids["user_id"]),),
+    ),
+    ("portfolio", "get_by_portfolio_id", lambda f: (f.ids["portfolio_id"],)),
+    ("portfolio", "get_by_user_id", lambda f: (f.ids["user_id"],)),
+    ("portfolio", "read_by_portfolio_id", lambda f: (f.ids["portfolio_id"],)),
+    ("portfolio", "read_by_user_id", lambda f: (f.ids["user_id"],)),
+    ("portfolio", "update", lambda f: (f.ids["portfolio_id"], {"name": "Bench"})),
+    ("assets", "create", lambda f: (asset_payload(),)),
+    ("assets", "get_by_asset_id", lambda f: (f.ids["asset_id"],)),
+    ("assets", "get_by_name", lambda f: ("Bench",)),
+    ("assets", "get_by_symbol", lambda f: ("BNCH", "NYSE")),
+    ("assets", "read_by_asset_id", lambda f: (f.ids["asset_id"],)),
+    ("assets", "read_by_name", lambda f: ("Bench",)),
+    ("assets", "read_by_symbol", lambda f: ("BNCH", "NYSE")),
+    ("assets", "read_multi", lambda f: ()),
+    ("assets", "read_names", lambda f: ([f.ids["asset_id"]],)),
+    ("assets", "revision", lambda f: ()),
+    ("assets", "get_multi", lambda f: ()),
+    ("assets", "update", lambda f: (f.ids["asset_id"], {"current_price": 2})),
+    ("portfolio_stock", "create", lambda f: (f.stock_payload(),)),
+    (
+        "portfolio_stock",
+        "get_by_portfolio_stock_id",
+        lambda f: (str(f.stocks[0].portfolio_stock_id),),
+    ),
+    ("portfolio_stock", "get_by_portfolio_id", lambda f: (f.ids["portfolio_id"],)),
+    (
+        "portfolio_stock",
+        "read_by_portfolio_stock_id",
+        lambda f: (str(f.stocks[0].portfolio_stock_id),),
+    ),
+    ("portfolio_stock", "read_by_portfolio_ids", lambda f: ([f.ids["portfolio_id"]],)),
+    (
+        "portfolio_stock",
+        "update",
+        lambda f: (str(f.stocks[0].portfolio_stock_id), {"quantity": 4}),
+    ),
+    ("transaction", "create", lambda f: (f.transaction_payload(),)),
+    (
+        "transaction",
+        "get_by_transaction_id",
+        lambda f: (str(f.db_transactions[0].transaction_id),),
+    ),
+    ("transaction", "get_by_portfolio_id", lambda f: (f.ids["portfolio_id"],)),
+    ("transaction", "get_by_asset_id", lambda f: (f.ids["asset_id"],)),
+    (
+        "transaction",
+        "read_by_transaction_id",
+        lambda f: (str(f.db_transactions[0].transaction_id),),
+    ),
+    ("transaction", "read_by_portfolio_ids", lambda f: ([f.ids["portfolio_id"]],)),
+    ("transaction", "stream_by_portfolio_id", lambda f: (f.ids["portfolio_id"], 1000)),
+    ("transaction", "stream_by_user_id", lambda f: (f.ids["user_id"], 1000)),
+    (
+        "transaction",
+        "update",
+        lambda f: (str(f.db_transactions[0].transaction_id), {"quantity": 4}),
+    ),
+    ("market_data_historical", "create", lambda f: (f.bar_payload(),)),
+    (
+        "market_data_historical",
+        "get_by_market_data_historical_id",
+        lambda f: (str(f.bar.market_data_historical_id),),
+    ),
+    ("market_data_historical", "get_by_asset_id", lambda f: (f.ids["asset_id"],)),
+    ("market_data_historical", "read_by_asset_id", lambda f: (f.ids["asset_id"],)),
+    ("market_data_historical", "revision", lambda f: (f.ids["asset_id"],)),
+    (
+        "market_data_historical",
+        "update",
+        lambda f: (str(f.bar.market_data_historical_id), {"volume": 6}),
+    ),
+]
+
+# delete is soft, each call deletes a row created (untimed) beforehand
+CRUD_DELETES: List[Tuple[str, Callable[[Fixtures], str]]] = [
+    (
+        "portfolio",
+        lambda f: str(
+            crud.portfolio.create(
+                f.db, CreatePortfolio(name="Bench", user_id=f.ids["user_id"])
+            ).portfolio_id
+        ),
+    ),
+    ("assets", lambda f: str(crud.assets.create(f.db, asset_payload()).asset_id)),
+    (
+        "portfolio_stock",
+        lambda f: str(
+            crud.portfolio_stock.create(f.db, f.stock_payload()).portfolio_stock_id
+        ),
+    ),
+    (
+        "transaction",
+        lambda f: str(
+            crud.transaction.create(f.db, f.transaction_payload()).transaction_id
+        ),
+    ),
+    (
+        "market_data_historical",
+        lambda f: str(
+            crud.market_data_historical.create(
+                f.db, f.bar_payload()
+            ).market_data_historical_id
+        ),
+    ),
+]
+
+
+def consume(result: Any) -> Any:
+    # streams only run their query once iterated
+    if hasattr(result, "__next__"):
+        for _ in result:
+            pass
+    return result
+
+
+def register_crud() -> None:
+    for module, method, arguments in CRUD_CALLS:
+
+        def factory(
+            fixtures: Fixtures, module=module, method=method, arguments=arguments
+        ):
+            call = getattr(getattr(crud, module), method)
+            if method == "create":
+                return lambda payload: call(fixtures.db, *payload), lambda: arguments(
+                    fixtures
+                )
+            args = arguments(fixtures)
+            return lambda: consume(call(fixtures.db, *args)), None
+
+        benchmark(f"crud.{module}.{method}", needs_db=True)(factory)
+
+    for module, create in CRUD_DELETES:
+
+        def factory(fixtures: Fixtures, module=module, create=create):
+            delete = getattr(crud, module).delete
+            return lambda row_id: delete(fixtures.db, row_id), lambda: create(fixtures)
+
+        benchmark(f"crud.{module}.delete", needs_db=True)(factory)
+
+
+register_crud()
+
+
+def measure_rounds(runner: Runner, rounds: int, target: float) -> List[float]:
+    """
+    Returns the mean per call time (us) of each round. Rounds last about
+    `target` seconds, calls are batched unless they have a prepare step.
+    """
+    run, prepare = runner
+
+    def timed(number: int) -> float:
+        if prepare is None:
+            started_at = perf_counter()
+            for _ in range(number):
+                run()
+            return perf_counter() - started_at
+
+        elapsed = 0.0
+        for _ in range(number):
+            argument = prepare()
+            started_at = perf_counter()
+            run(argument)
+            elapsed += perf_counter() - started_at
+        return elapsed
+
+    timed(1)  # warm up caches before measuring
+    single = max(timed(1), 1e-7)
+    number = max(1, min(100_000, int(target / single)))
+    return [timed(number) / number * 1e6 for _ in range(rounds)]
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "median_us": statistics.median(samples),
+        "min_us": min(samples),
+        "stdev_us": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples_us": samples,
+    }
+
+
+def run(patterns: List[str], rounds: int, target: float) -> Dict[str, Dict[str, Any]]:
+    selected = [
+        bench
+        for bench in BENCHMARKS
+        if any(fnmatch.fnmatch(bench.name, pattern) for pattern in patterns)
+    ]
+    fixtures = Fixtures()
+    if any(bench.needs_db for bench in selected):
+        try:
+            fixtures.open_db()
+        except OperationalError as err:
+            print(f"database unreachable, skipping the CRUD benchmarks: {err}")
+            fixtures.close()
+            fixtures = Fixtures()
+            selected = [bench for bench in selected if not bench.needs_db]
+
+    results = {}
+    try:
+        for bench in selected:
+            # the rows a benchmark writes are gone before the next one runs,
+            # and a failing benchmark doesn't abort the others' transaction
+            savepoint = fixtures.db.begin_nested() if bench.needs_db else None
+            try:
+                samples = measure_rounds(bench.factory(fixtures), rounds, target)
+            except Exception as err:  # pylint: disable=broad-except
+                print(f"{bench.name:<56} failed: {err!r}")
+                continue
+            finally:
+                if savepoint is not None:
+                    savepoint.rollback()
+            results[bench.name] = summarize(samples)
+            print(f"{bench.name:<56} {results[bench.name]['median_us']:>12.2f}us")
+    finally:
+        fixtures.close()
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    results: Dict[str, Dict[str, Any]],
+    threshold: float,
+    alpha: float,
+) -> List[str]:
+    """
+    Prints the comparison with the baseline and returns the regressions.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<56} {'baseline':>12} {'now':>12} {'change':>8} {'p':>7}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<56} {'-':>12} {result['median_us']:>10.2f}us")
+            continue
+        before, after = baseline[name], result
+        change = after["median_us"] / before["median_us"] - 1
+        p_value = mann_whitney_u(before["samples_us"], after["samples_us"])
+        regressed = change > threshold and p_value < alpha
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<56} {before['median_us']:>10.2f}us {after['median_us']:>10.2f}us"
+            f" {change:>+7.1%} {p_value:>7.3f}{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the hot paths.")
+    parser.add_argument("patterns", nargs="*", default=["*"], help="e.g. 'crud.*'")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--round-seconds", type=float, default=0.05)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="slowdown, 0.1 = 10%%"
+    )
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    args = parser.parse_args()
+
+    results = run(args.patterns, args.rounds, args.round_seconds)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "machine": platform.node(),
+                        "python": platform.python_version(),
+                        "saved_at": datetime.now().isoformat(timespec="seconds"),
+                    },
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        return
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+    if regressions := compare(baseline, results, args.threshold, args.alpha):
+        print(
+            f"\n{len(regressions)} hot path(s) slower by more than {args.threshold:.0%}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+"""
+Query plan regression checks.
+The latency of the API depends on a few access paths: holdings by
+portfolio, transactions by portfolio or asset, bars by asset and time range
+and users by email. A migration can silently turn them into sequential
+scans, so this loads a synthetic dataset into a database of its own,
+captures the plan (EXPLAIN (FORMAT JSON)) of the query of each model
+classmethod on these paths and checks that:
+
+- no large table is scanned sequentially,
+- the plan uses the indexes the access path relies on,
+- the estimated total cost stays within its bound,
+- the shape of the plan (its nodes, relations and indexes) matches the
+  snapshot, changes are printed as a diff.
+
+    $ python -m benchmarks.query_plans
+
+    # after an intended change, e.g. a new index, review and commit the diff
+    $ python -m benchmarks.query_plans --update
+
+The database is DB_URL's with a `_query_plans` suffix. It's created,
+migrated to head and seeded on every run and dropped afterwards, unless
+--keep is given. Exits non-zero when a check fails or a plan changed.
+"""
+
+import argparse
+import difflib
+import json
+import sys
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core import settings
+from app.models import (
+    Assets,
+    MarketDataHistorical,
+    Portfolio,
+    PortfolioStock,
+    Transaction,
+    User,
+)
+from app.services import run_migrations
+from migrations.synthetic import END, Scale, entity_id, generate
+
+SNAPSHOT = "benchmarks/snapshots/query_plans.json"
+SEED = 1
+# 5k users, 10k portfolios, 30k stocks, 100k transactions and 200k bars,
+# enough rows for the planner to choose the paths production gets
+SCALE = Scale(
+    users=5_000,
+    portfolios_per_user=2,
+    assets=100,
+    stocks_per_portfolio=3,
+    transactions_per_portfolio=10,
+    bars_per_asset=2_000,
+)
+# tables with more rows than this must not be scanned sequentially
+LARGE_TABLE_ROWS = 1_000
+
+# rows the queries look up, in the middle of their tables
+IDS = {
+    "user_id": entity_id(SEED, "user", SCALE.users // 2),
+    "email": f"s{SEED}-user{SCALE.users // 2}@synthetic.papertrade.live",
+    "portfolio_id": entity_id(SEED, "portfolio", SCALE.portfolios // 2),
+    "portfolio_stock_id": entity_id(
+        SEED, "portfolio_stock", SCALE.rows("portfolio_stock") // 2
+    ),
+    "transaction_id": entity_id(SEED, "transaction", SCALE.rows("transaction") // 2),
+    "asset_id": entity_id(SEED, "assets", SCALE.assets // 2),
+    "asset_name": f"Synthetic {SCALE.assets // 2}",
+    "bar_id": entity_id(
+        SEED, "market_data_historical", SCALE.rows("market_data_historical") // 2
+    ),
+}
+# the last hour of bars
+WINDOW = (END - timedelta(hours=1), END)
+
+
+class Query(NamedTuple):
+    name: str
+    call: Callable[[Session], Any]
+    indexes: Tuple[str, ...]  # the plan must use all of them
+    max_cost: float  # bound of the planner's estimated total cost
+
+
+QUERIES: List[Query] = [
+    Query(
+        "User.get_by_user_id",
+        lambda db: User.get_by_user_id(db, IDS["user_id"]),
+        ("ix_user_user_id",),
+        20,
+    ),
+    Query(
+        "User.get_by_email",
+        lambda db: User.get_by_email(db, IDS["email"]),
+        ("ix_user_email",),
+        20,
+    ),
+    Query(
+        "User.read_by_email",
+        lambda db: User.read_by_email(db, IDS["email"]),
+        ("ix_user_email",),
+        20,
+    ),
+    Query(
+        "Portfolio.get_by_portfolio_id",
+        lambda db: Portfolio.get_by_portfolio_id(db, IDS["portfolio_id"]),
+        ("ix_portfolio_portfolio_id",),
+        20,
+    ),
+    Query(
+        "Portfolio.get_portfolio_by_user_id",
+        lambda db: Portfolio.get_portfolio_by_user_id(db, IDS["user_id"]),
+        ("ix_portfolio_user_id",),
+        20,
+    ),
+    Query(
+        "Portfolio.read_by_user_id",
+        lambda db: Portfolio.read_by_user_id(db, IDS["user_id"]),
+        ("ix_portfolio_user_id",),
+        20,
+    ),
+    Query(
+        "Assets.get_by_asset_id",
+        lambda db: Assets.get_by_asset_id(db, IDS["asset_id"]),
+        (),
+        20,
+    ),
+    Query(
+        "Assets.get_by_name",
+        lambda db: Assets.get_by_name(db, IDS["asset_name"]),
+        (),
+        20,
+    ),
+    Query(
+        "Assets.read_names",
+        lambda db: Assets.read_names(db, [IDS["asset_id"]]),
+        (),
+        20,
+    ),
+    Query(
+        "PortfolioStock.get_by_portfolio_stock_id",
+        lambda db: PortfolioStock.get_by_portfolio_stock_id(
+            db, IDS["portfolio_stock_id"]
+        ),
+        ("ix_portfolio_stock_portfolio_stock_id",),
+        20,
+    ),
+    Query(
+        "PortfolioStock.get_by_portfolio_id",
+        lambda db: PortfolioStock.get_by_portfolio_id(db, IDS["portfolio_id"]),
+        ("ix_portfolio_stock_portfolio_id",),
+        20,
+    ),
+    Query(
+        "PortfolioStock.get_by_asset_id",
+        lambda db: PortfolioStock.get_by_asset_id(db, IDS["asset_id"]),
+        ("ix_portfolio_stock_asset_id",),
+        1_000,
+    ),
+    Query(
+        "PortfolioStock.read_by_portfolio_ids",
+        lambda db: PortfolioStock.read_by_portfolio_ids(db, [IDS["portfolio_id"]]),
+        ("ix_portfolio_stock_portfolio_id",),
+        20,
+    ),
+    Query(
+        "Transaction.get_by_transaction_id",
+        lambda db: Transaction.get_by_transaction_id(db, IDS["transaction_id"]),
+        ("ix_transaction_transaction_id",),
+        20,
+    ),
+    Query(
+        "Transaction.get_by_portfolio_id",
+        lambda db: Transaction.get_by_portfolio_id(db, IDS["portfolio_id"]),
+        ("ix_transaction_portfolio_id_transaction_date",),
+        100,
+    ),
+    Query(
+        "Transaction.get_by_asset_id",
+        lambda db: Transaction.get_by_asset_id(db, IDS["asset_id"]),
+        ("ix_transaction_asset_id",),
+        3_000,
+    ),
+    Query(
+        "Transaction.read_by_portfolio_ids",
+        lambda db: Transaction.read_by_portfolio_ids(db, [IDS["portfolio_id"]]),
+        ("ix_transaction_portfolio_id_transaction_date",),
+        100,
+    ),
+    Query(
+        "Transaction.stream_by_portfolio_id",
+        lambda db: Transaction.stream_by_portfolio_id(db, IDS["portfolio_id"], 1_000),
+        ("ix_transaction_portfolio_id_transaction_date",),
+        100,
+    ),
+    Query(
+        "Transaction.stream_by_user_id",
+        lambda db: Transaction.stream_by_user_id(db, IDS["user_id"], 1_000),
+        ("ix_transaction_portfolio_id_transaction_date",),
+        100,
+    ),
+    Query(
+        "Transaction.read_triggers_since",
+        lambda db: Transaction.read_triggers_since(db, WINDOW[0]),
+        ("ix_transaction_trigger_changes",),
+        20,
+    ),
+    Query(
+        "Transaction.read_expiring_since",
+        lambda db: Transaction.read_expiring_since(db, WINDOW[0]),
+        ("ix_transaction_pending_expiries",),
+        20,
+    ),
+    Query(
+        "MarketDataHistorical.get_by_market_data_historical_id",
+        lambda db: MarketDataHistorical.get_by_market_data_historical_id(
+            db, IDS["bar_id"]
+        ),
+        ("ix_market_data_historical_market_data_historical_id",),
+        20,
+    ),
+    Query(
+        "MarketDataHistorical.get_by_asset_id",
+        lambda db: MarketDataHistorical.get_by_asset_id(db, IDS["asset_id"]),
+        ("ix_market_data_historical_asset_id_datetime",),
+        6_000,
+    ),
+    Query(
+        "MarketDataHistorical.read_by_asset_id",
+        lambda db: MarketDataHistorical.read_by_asset_id(db, IDS["asset_id"]),
+        ("ix_market_data_historical_asset_id_datetime",),
+        6_000,
+    ),
+    Query(
+        "MarketDataHistorical.read_by_asset_id.window",
+        lambda db: MarketDataHistorical.read_by_asset_id(db, IDS["asset_id"], *WINDOW),
+        ("ix_market_data_historical_asset_id_datetime",),
+        500,
+    ),
+    Query(
+        "MarketDataHistorical.read_ticks",
+        lambda db: MarketDataHistorical.read_ticks(db, IDS["asset_id"], WINDOW[0]),
+        ("ix_market_data_historical_asset_id_datetime",),
+        500,
+    ),
+    Query(
+        "MarketDataHistorical.revision.window",
+        lambda db: MarketDataHistorical.revision(db, IDS["asset_id"], *WINDOW),
+        ("ix_market_data_historical_asset_id_datetime",),
+        500,
+    ),
+]
+
+
+@contextmanager
+def captured(engine: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    """
+    Collects the statements, and their parameters, sent to the database.
+    """
+    statements: List[Tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument,too-many-arguments
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def explain(engine: Engine, query: Query) -> Tuple[str, Dict]:
+    """
+    Runs the query and returns its SQL and the plan of it.
+    """
+    with Session(engine) as db:
+        with captured(engine) as statements:
+            result = query.call(db)
+            if hasattr(result, "__next__"):  # streams only run once iterated
+                for _ in result:
+                    pass
+        statement, parameters = [
+            (statement, parameters)
+            for statement, parameters in statements
+            if statement.lstrip().upper().startswith("SELECT")
+        ][-1]
+        connection: Connection = db.connection()
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()
+    return statement, plan[0]["Plan"]
+
+
+def nodes(plan: Dict) -> Iterator[Tuple[int, Dict]]:
+    """
+    Walks the plan depth first, yielding (depth, node).
+    """
+    stack = [(0, plan)]
+    while stack:
+        depth, node = stack.pop()
+        yield depth, node
+        stack.extend((depth + 1, child) for child in reversed(node.get("Plans", [])))
+
+
+def shape(plan: Dict) -> List[str]:
+    """
+    The plan without its estimates, a line per node, e.g.
+    `  Index Scan using ix_user_email on user`.
+    """
+    lines = []
+    for depth, node in nodes(plan):
+        line = node["Node Type"]
+        for key, template in (
+            ("Join Type", " ({})"),
+            ("Strategy", " ({})"),
+            ("Index Name", " using {}"),
+            ("Relation Name", " on {}"),
+        ):
+            if key in node:
+                line += template.format(node[key])
+        lines.append("  " * depth + line)
+    return lines
+
+
+def check(query: Query, plan: Dict, large_tables: Set[str]) -> List[str]:
+    """
+    Returns the problems of the plan, none when it's fine.
+    """
+    problems = []
+    scanned = {
+        node["Relation Name"]
+        for _, node in nodes(plan)
+        if node["Node Type"] == "Seq Scan"
+    }
+    if scanned & large_tables:
+        problems.append(
+            f"sequential scan on {', '.join(sorted(scanned & large_tables))}"
+        )
+    used = {node.get("Index Name") for _, node in nodes(plan)}
+    if missing := [index for index in query.indexes if index not in used]:
+        problems.append(f"doesn't use {', '.join(missing)}")
+    if plan["Total Cost"] > query.max_cost:
+        problems.append(f"cost {plan['Total Cost']:.2f} > {query.max_cost}")
+    return problems
+
+
+def large_tables(engine: Engine) -> Set[str]:
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT relname FROM pg_class"
+                " WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+                " AND reltuples > :rows"
+            ),
+            {"rows": LARGE_TABLE_ROWS},
+        )
+        return {row.relname for row in rows}
+
+
+def prepare_database(db_url: str, workers: int) -> None:
+    """
+    (Re)creates the database, migrates it to head and loads the dataset.
+    """
+    url = make_url(db_url)
+    server = create_engine(
+        url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool
+    )
+    with server.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{url.database}"'))
+        connection.execute(text(f'CREATE DATABASE "{url.database}"'))
+    run_migrations(settings.MIGRATION_SCRIPT_LOCATION, db_url)
+    generate(SCALE, SEED, workers, db_url)
+
+
+def drop_database(db_url: str) -> None:
+    url = make_url(db_url)
+    server = create_engine(
+        url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool
+    )
+    with server.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{url.database}"'))
+
+
+def compare(
+    snapshot: Dict[str, Dict], plans: Dict[str, Dict], update: bool
+) -> List[str]:
+    """
+    Prints the diff of the plans which changed shape and returns their names.
+    """
+    changed = []
+    for name, plan in plans.items():
+        before = snapshot.get(name, {}).get("shape", [])
+        if before == plan["shape"]:
+            continue
+        changed.append(name)
+        sys.stdout.writelines(
+            f"{line}\n"
+            for line in difflib.unified_diff(
+                before,
+                plan["shape"],
+                f"{name} (snapshot)",
+                f"{name} (now, cost {plan['total_cost']:.2f})",
+                lineterm="",
+            )
+        )
+    for name in snapshot.keys() - plans.keys():
+        if not update:
+            print(f"{name}: in the snapshot but not checked anymore")
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query plan regression checks.")
+    parser.add_argument("--update", action="store_true", help="rewrite the snapshot")
+    parser.add_argument("--snapshot", default=SNAPSHOT)
+    parser.add_argument("--workers", type=int, default=2, help="COPY processes")
+    parser.add_argument("--keep", action="store_true", help="keep the database")
+    args = parser.parse_args()
+
+    url = make_url(settings.DB_URL)
+    db_url = url.set(database=f"{url.database}_query_plans").render_as_string(
+        hide_password=False
+    )
+    print(f"seeding {make_url(db_url).database}")
+    prepare_database(db_url, args.workers)
+
+    engine = create_engine(db_url, poolclass=NullPool)
+    failures, plans = [], {}
+    try:
+        large = large_tables(engine)
+        for query in QUERIES:
+            statement, plan = explain(engine, query)
+            plans[query.name] = {
+                "sql": " ".join(statement.split()),
+                "shape": shape(plan),
+                "total_cost": plan["Total Cost"],
+            }
+            problems = check(query, plan, large)
+            print(
+                f"{query.name:<56} {plan['Total Cost']:>10.2f}"
+                f"  {'; '.join(problems) if problems else 'ok'}"
+            )
+            if problems:
+                failures.append(query.name)
+    finally:
+        engine.dispose()
+        if not args.keep:
+            drop_database(db_url)
+
+    try:
+        with open(args.snapshot, encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except FileNotFoundError:
+        snapshot = {}
+    changed = compare(snapshot, plans, args.update)
+
+    if args.update:
+        with open(args.snapshot, "w", encoding="utf-8") as file:
+            json.dump(plans, file, indent=2)
+            file.write("\n")
+        print(f"snapshot written to {args.snapshot}")
+    elif changed:
+        print(f"\n{len(changed)} plan(s) changed, rerun with --update if intended")
+    if failures:
+        print(f"\n{len(failures)} plan(s) failed their checks")
+    if failures or (changed and not args.update):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
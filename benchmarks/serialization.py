@@ -0,0 +1,98 @@
+"""
+Serialization benchmark.
+Measures the time it takes to turn a 10k row transaction list into a
+response body through the previous pipeline (before) and the pre-shaped
+orjson response (after).
+
+    $ python -m benchmarks.serialization
+
+Before: jsonable_encoder + exclude_metadata in the handler, response_model
+validation, jsonable_encoder again and json.dumps in FastAPI.
+After: projected rows rendered once by FastJSONResponse.
+
+No database is needed, the rows are generated in memory.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models.order_type import OrderType
+from app.models.transaction_status import TransactionStatus
+from app.models.transaction_type import TransactionType
+from app.schemas import GetTransactionResponse
+from app.utils.general import General
+from app.utils.responses import FastJSONResponse
+from benchmarks.utils import measure, report
+
+ROWS = 10_000
+
+
+def make_rows(metadata: bool):
+    """
+    Generates transaction rows shaped like the Transaction projection. With
+    metadata the rows look like full ORM loads, before exclude_metadata.
+    """
+    portfolio_id = uuid.uuid4()
+    asset_id = uuid.uuid4()
+    started_at = datetime(2023, 7, 12, 15, 30)
+
+    rows = []
+    for index in range(ROWS):
+        row = {
+            "transaction_id": uuid.uuid4(),
+            "portfolio_id": portfolio_id,
+            "asset_id": asset_id,
+            "transaction_type": TransactionType.BUY,
+            "transaction_status": TransactionStatus.FULFILLED,
+            "transaction_date": started_at + timedelta(minutes=index),
+            "transaction_price": 187.25,
+            "quantity": 3,
+            "order_type": OrderType.LIMIT,
+            "limit_price": Decimal("187.50"),
+            "transaction_value": 561.75,
+        }
+        if metadata:
+            row.update(
+                id=index,
+                created_at=started_at,
+                updated_at=started_at,
+                deleted_at=None,
+            )
+        rows.append(row)
+    return rows
+
+
+def before(rows) -> bytes:
+    details = General.exclude_metadata(jsonable_encoder(rows))
+    content = {
+        "status": True,
+        "message": "All Transactions Found!",
+        "details": details,
+    }
+    validated = GetTransactionResponse(**content)
+    body = jsonable_encoder(validated, exclude_unset=True)
+    return JSONResponse(body).body
+
+
+def after(rows) -> bytes:
+    content = {
+        "status": True,
+        "message": "All Transactions Found!",
+        "details": rows,
+    }
+    return FastJSONResponse(content).body
+
+
+if __name__ == "__main__":
+    full_rows = make_rows(metadata=True)
+    projected_rows = make_rows(metadata=False)
+
+    report(
+        f"serialize: {ROWS} transactions",
+        measure(lambda: before(full_rows), number=1, repeat=5),
+        measure(lambda: after(projected_rows), number=1, repeat=5),
+    )
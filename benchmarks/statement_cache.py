@@ -0,0 +1,126 @@
+"""
+Statement cache benchmark.
+Measures per query Python overhead of the model lookup classmethods built
+with the legacy `db.query()` chain (before) and with cached lambda
+statements (after).
+
+    $ python -m benchmarks.statement_cache
+
+The statement building section needs no database. When DB_URL points to a
+reachable database the lookups are executed as well.
+"""
+
+import uuid
+
+from loguru import logger
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.exc import OperationalError
+
+from app.db.session import SessionLocal
+from app.models import Assets, Exchange, Transaction, User
+from benchmarks.utils import measure, report
+
+# pylint: disable=singleton-comparison
+
+
+def legacy_user_by_email(db, email):
+    return db.query(User).where(User.deleted_at == None).filter(User.email == email)
+
+
+def legacy_asset_by_symbol(db, symbol, exchange):
+    return (
+        db.query(Assets)
+        .where(Assets.deleted_at == None)
+        .filter(Assets.symbol == symbol)
+        .filter(Assets.exchange == exchange)
+    )
+
+
+def legacy_transactions_by_portfolio(db, portfolio_id):
+    return (
+        db.query(Transaction)
+        .where(Transaction.deleted_at == None)
+        .filter(Transaction.portfolio_id == portfolio_id)
+    )
+
+
+def run_statement_building(db) -> None:
+    """
+    Builds each statement and derives its cache key, i.e. all the work
+    done in Python before the compiled statement cache is consulted.
+    """
+    # pylint: disable=protected-access
+    email = "bench@papertrade.local"
+    portfolio_id = uuid.uuid4()
+
+    def after_user():
+        lambda_stmt(
+            lambda: select(User)
+            .where(User.deleted_at == None)
+            .where(User.email == email)
+            .limit(1)
+        )._generate_cache_key()
+
+    def before_user():
+        legacy_user_by_email(db, email).limit(1)._statement_20()._generate_cache_key()
+
+    def after_transactions():
+        lambda_stmt(
+            lambda: select(Transaction)
+            .where(Transaction.deleted_at == None)
+            .where(Transaction.portfolio_id == portfolio_id)
+        )._generate_cache_key()
+
+    def before_transactions():
+        legacy_transactions_by_portfolio(
+            db, portfolio_id
+        )._statement_20()._generate_cache_key()
+
+    report("build: User.get_by_email", measure(before_user), measure(after_user))
+    report(
+        "build: Transaction.get_by_portfolio_id",
+        measure(before_transactions),
+        measure(after_transactions),
+    )
+
+
+def run_queries(db) -> None:
+    """
+    Executes the lookups end to end against the configured database.
+    """
+    email = "bench@papertrade.local"
+    portfolio_id = uuid.uuid4()
+
+    report(
+        "query: User.get_by_email",
+        measure(lambda: legacy_user_by_email(db, email).first(), number=200),
+        measure(lambda: User.get_by_email(db, email), number=200),
+    )
+    report(
+        "query: Assets.get_by_symbol",
+        measure(
+            lambda: legacy_asset_by_symbol(db, "BENCH", Exchange.NYSE).first(),
+            number=200,
+        ),
+        measure(lambda: Assets.get_by_symbol(db, "BENCH", Exchange.NYSE), number=200),
+    )
+    report(
+        "query: Transaction.get_by_portfolio_id",
+        measure(
+            lambda: legacy_transactions_by_portfolio(db, portfolio_id).all(),
+            number=200,
+        ),
+        measure(lambda: Transaction.get_by_portfolio_id(db, portfolio_id), number=200),
+    )
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        run_statement_building(session)
+        try:
+            run_queries(session)
+        except OperationalError as err:
+            logger.warning(f"Database isn't reachable, skipping queries: {err}")
+    finally:
+        session.close()
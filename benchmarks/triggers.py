@@ -0,0 +1,179 @@
+"""
+Trigger book benchmark.
+Measures the time a price tick takes to find the orders it fires among
+1M resting stop, stop limit, take profit and trailing stop orders of an
+asset, with stop prices within 20% of the price.
+
+    $ python -m benchmarks.triggers --orders 1000000 --ticks 10000
+
+Before: every resting order is checked on every tick, trailing stops
+following the price one by one.
+After: the trigger book of app.trading.
+
+Fired orders are replaced by new ones around the new price, untimed, so
+the book stays at --orders resting orders.
+
+No database is needed.
+"""
+
+import argparse
+import gc
+import random
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List
+
+from app.models.order_type import OrderType
+from app.models.transaction_type import TransactionType
+from app.trading.triggers import TRIGGER_ORDER_TYPES, Trigger, TriggerBook
+from benchmarks.utils import latency_summary
+
+ASSET_ID = 1
+START_PRICE = 100.0
+PLACED_AT = datetime(2023, 7, 1)
+
+
+class Orders:
+    """
+    Random trigger orders around the price, ids counting up.
+    """
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.next_id = 0
+
+    def make(self, price: float) -> Trigger:
+        self.next_id += 1
+        order_type = self.random.choice(TRIGGER_ORDER_TYPES)
+        side = self.random.choice((TransactionType.BUY, TransactionType.SELL))
+        stop_price, trail_amount = None, None
+        if order_type == OrderType.TRAILING_STOP:
+            trail_amount = round(price * self.random.uniform(0.02, 0.2), 2)
+        else:
+            falls = (side == TransactionType.SELL) != (
+                order_type == OrderType.TAKE_PROFIT
+            )
+            distance = price * self.random.uniform(0.001, 0.2)
+            stop_price = round(price - distance if falls else price + distance, 2)
+        return Trigger(
+            id=self.next_id,
+            transaction_id=self.next_id,
+            asset_id=ASSET_ID,
+            transaction_type=side,
+            order_type=order_type,
+            transaction_price=price,
+            quantity=1,
+            limit_price=stop_price,
+            stop_price=stop_price,
+            trail_amount=trail_amount,
+            updated_at=PLACED_AT,
+        )
+
+
+def prices(seed: int, ticks: int) -> List[float]:
+    """
+    A random walk of `ticks` prices, moves of up to 0.5%.
+    """
+    generator = random.Random(seed)
+    price, walk = START_PRICE, []
+    for _ in range(ticks):
+        price = round(price * (1 + generator.uniform(-0.005, 0.005)), 2)
+        walk.append(price)
+    return walk
+
+
+class Scan:
+    """
+    The resting orders in a dict, each checked on every tick.
+    """
+
+    def __init__(self):
+        self.orders: Dict[int, Trigger] = {}
+        self.best: Dict[int, float] = {}  # of the trailing stops
+
+    def add(self, trigger: Trigger) -> None:
+        self.orders[trigger.transaction_id] = trigger
+        if trigger.order_type == OrderType.TRAILING_STOP:
+            self.best[trigger.transaction_id] = trigger.transaction_price
+
+    def tick(self, price: float) -> List[Trigger]:
+        fired = []
+        for order_id, trigger in self.orders.items():
+            if trigger.order_type == OrderType.TRAILING_STOP:
+                if trigger.falls:
+                    best = self.best[order_id] = max(self.best[order_id], price)
+                    hit = price <= best - trigger.trail_amount
+                else:
+                    best = self.best[order_id] = min(self.best[order_id], price)
+                    hit = price >= best + trigger.trail_amount
+            elif trigger.falls:
+                hit = price <= trigger.stop_price
+            else:
+                hit = price >= trigger.stop_price
+            if hit:
+                fired.append(trigger)
+        for trigger in fired:
+            del self.orders[trigger.transaction_id]
+            self.best.pop(trigger.transaction_id, None)
+        return fired
+
+
+class Book:
+    """
+    The trigger book, as the engine drives it.
+    """
+
+    def __init__(self):
+        self.book = TriggerBook()
+
+    def add(self, trigger: Trigger) -> None:
+        self.book.add(trigger)
+
+    def tick(self, price: float) -> List[Trigger]:
+        return [trigger for trigger, _ in self.book.tick(ASSET_ID, price)]
+
+
+def run(title: str, store, orders: int, walk: List[float], seed: int) -> None:
+    factory = Orders(seed)
+    started_at = perf_counter()
+    for _ in range(orders):
+        store.add(factory.make(START_PRICE))
+    loaded_in = perf_counter() - started_at
+    gc.freeze()  # as the trigger engine does once the book is loaded
+
+    latencies, fired = [], 0
+    for price in walk:
+        started_at = perf_counter()
+        triggered = store.tick(price)
+        latencies.append((perf_counter() - started_at) * 1000)
+        fired += len(triggered)
+        for _ in triggered:  # keeps the number of resting orders steady
+            store.add(factory.make(price))
+
+    gc.unfreeze()
+    timing = latency_summary(latencies)
+    print(
+        f"{title:<8} load {loaded_in:>6.2f}s  ticks {len(walk):>6}  fired {fired:>7}"
+        f"  p50 {timing['p50']:>9.3f}ms  p99 {timing['p99']:>9.3f}ms"
+        f"  max {timing['max']:>9.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trigger book benchmark.")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--ticks", type=int, default=10_000)
+    parser.add_argument(
+        "--scan-ticks", type=int, default=20, help="ticks of the full scan"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    walk = prices(args.seed, args.ticks)
+    print(f"{args.orders} resting orders")
+    run("before", Scan(), args.orders, walk[: args.scan_ticks], args.seed)
+    run("after", Book(), args.orders, walk, args.seed)
+
+
+if __name__ == "__main__":
+    main()
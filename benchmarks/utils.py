@@ -0,0 +1,81 @@
+"""
+Helpful scripts for the benchmarks.
+"""
+
+import math
+import statistics
+import timeit
+from typing import Callable, Dict, Sequence
+
+
+def measure(func: Callable, number: int = 1000, repeat: int = 5) -> Dict[str, float]:
+    """
+    Calls func `number` times per round for `repeat` rounds and returns
+    per call timings in microseconds.
+    """
+    func()  # warm up caches before measuring
+
+    rounds = timeit.repeat(func, number=number, repeat=repeat)
+    per_call = sorted(elapsed / number * 1e6 for elapsed in rounds)
+
+    return {"best_us": per_call[0], "median_us": statistics.median(per_call)}
+
+
+def report(title: str, before: Dict[str, float], after: Dict[str, float]) -> None:
+    """
+    Prints a before/after comparison line.
+    """
+    speedup = before["median_us"] / after["median_us"]
+    print(
+        f"{title:<40} before {before['median_us']:>9.1f}us"
+        f"  after {after['median_us']:>9.1f}us  x{speedup:.2f}"
+    )
+
+
+def latency_summary(latencies: Sequence[float]) -> Dict[str, float]:
+    """
+    Returns the p50, p95, p99 and max of the latencies (nearest rank).
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def rank(quantile: float) -> float:
+        return ordered[min(len(ordered) - 1, math.ceil(quantile * len(ordered)) - 1)]
+
+    return {"p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99), "max": ordered[-1]}
+
+
+def mann_whitney_u(before: Sequence[float], after: Sequence[float]) -> float:
+    """
+    Returns the two-sided p-value of the Mann-Whitney U test (normal
+    approximation with tie correction): the probability of samples at least
+    this different if both came from the same distribution.
+    """
+    labelled = sorted(
+        [(value, 0) for value in before] + [(value, 1) for value in after]
+    )
+    size = len(labelled)
+    ranks = [0.0] * size
+    ties = 0.0
+    start = 0
+    while start < size:
+        stop = start
+        while stop + 1 < size and labelled[stop + 1][0] == labelled[start][0]:
+            stop += 1
+        for index in range(start, stop + 1):
+            ranks[index] = (start + stop) / 2 + 1
+        count = stop - start + 1
+        ties += count**3 - count
+        start = stop + 1
+
+    n_before, n_after = len(before), len(after)
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, labelled) if group == 0)
+    u_statistic = rank_sum - n_before * (n_before + 1) / 2
+    mean = n_before * n_after / 2
+    variance = n_before * n_after / 12 * ((size + 1) - ties / (size * (size - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z_score = max(0.0, abs(u_statistic - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(z_score / math.sqrt(2))
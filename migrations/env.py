@@ -71,7 +71,10 @@ def run_migrations_online():
     logger.info("Executing online migration from env.py...")
 
     configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = settings.DB_URL
+    # the url set by app.services.run_migrations, DB_URL unless given
+    configuration["sqlalchemy.url"] = (
+        config.get_main_option("sqlalchemy.url") or settings.DB_URL
+    )
     connectable = engine_from_config(
         configuration, prefix="sqlalchemy.", poolclass=pool.NullPool
     )
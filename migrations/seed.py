@@ -4,20 +4,15 @@ Seed module.
 from typing import Any
 
 from loguru import logger
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session
 
 from app.auth import auth
 from app.core.config import settings
+from app.db.session import SessionLocal
 from app.models.admin import AdminUser
 
-engine = create_engine(settings.DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-db = SessionLocal()
-
-
-def is_user_exists() -> Any:
+def is_user_exists(db: Session) -> Any:
     superuser = AdminUser.get_by_username(
         db,
         settings.SUPER_ADMIN_USER,
@@ -26,7 +21,7 @@ def is_user_exists() -> Any:
     return bool(superuser)
 
 
-def create_superuser() -> Any:
+def create_superuser(db: Session) -> Any:
     db_object = AdminUser(
         full_name="Paper Trade Admin",
         email="hello@gmail.com",
@@ -41,8 +36,16 @@ def create_superuser() -> Any:
     logger.info("Database is populated with the initial data")
 
 
+def seed() -> None:
+    """
+    Populates the initial data unless it's already there.
+    """
+    with SessionLocal() as db:
+        if is_user_exists(db):
+            logger.info("Initial data is already populated. Nothing to do!")
+        else:
+            create_superuser(db)
+
+
 if __name__ == "__main__":
-    if is_user_exists():
-        logger.info("Initial data is already populated. Nothing to do!")
-    else:
-        create_superuser()
+    seed()
@@ -0,0 +1,501 @@
+"""
+Synthetic data module.
+Generates a coherent dataset of users, portfolios, assets, portfolio stocks,
+transactions and market data bars for scale testing, and loads it with COPY
+from parallel worker processes.
+
+    $ python -m migrations.synthetic --scale 1 --workers 8
+
+Scale 1 is 1k users, 10k portfolios, 500 assets, 50k portfolio stocks, 1M
+transactions and 10M bars. The dataset only depends on the seed: the ids,
+and everything else, of the i-th row of a table are derived from (seed,
+table, i), so any worker can generate any slice of any table and compute
+the ids the slice refers to without talking to the others.
+
+Every synthetic user signs in with the password SYNTHETIC_PASSWORD.
+"""
+
+import argparse
+import hashlib
+import io
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.auth import auth
+from app.core.config import settings
+
+SYNTHETIC_PASSWORD = "synthetic"
+# bars end here and go back one minute at a time
+END = datetime(2023, 7, 1)
+EXCHANGES = ("NYSE", "LSE", "CRYPTOCURRENCY")
+# null in the text format of COPY
+NULL = "\\N"
+# rows generated and copied per round trip
+BATCH_SIZE = 50_000
+# tables in load order, the ones referring to others come after them
+TABLES = (
+    "user",
+    "assets",
+    "portfolio",
+    "portfolio_stock",
+    "transaction",
+    "market_data_historical",
+)
+
+
+class Scale(NamedTuple):
+    """
+    Size of the dataset, scale 1 unless multiplied.
+    """
+
+    users: int = 1_000
+    portfolios_per_user: int = 10
+    assets: int = 500
+    stocks_per_portfolio: int = 5
+    transactions_per_portfolio: int = 100
+    bars_per_asset: int = 20_000
+
+    def multiply(self, factor: float) -> "Scale":
+        # the number of rows of the top level tables grows with the factor
+        return self._replace(
+            users=max(1, round(self.users * factor)),
+            assets=max(1, round(self.assets * factor)),
+        )
+
+    @property
+    def portfolios(self) -> int:
+        return self.users * self.portfolios_per_user
+
+    def group(self, table: str) -> int:
+        """
+        Rows generated in sequence from the same random generator, slices
+        never split them.
+        """
+        return {
+            "transaction": self.transactions_per_portfolio,
+            "market_data_historical": self.bars_per_asset,
+        }.get(table, 1)
+
+    def rows(self, table: str) -> int:
+        return {
+            "user": self.users,
+            "assets": self.assets,
+            "portfolio": self.portfolios,
+            "portfolio_stock": self.portfolios * self.stocks_per_portfolio,
+            "transaction": self.portfolios * self.transactions_per_portfolio,
+            "market_data_historical": self.assets * self.bars_per_asset,
+        }[table]
+
+
+class Task(NamedTuple):
+    """
+    A slice [start, stop) of the rows of a table.
+    """
+
+    table: str
+    start: int
+    stop: int
+    seed: int
+    scale: Scale
+    password: str
+
+
+def entity_id(seed: int, kind: str, index: int) -> str:
+    """
+    Returns the UUID (version 4 layout) of a row, rendered as text.
+    """
+    digest = bytearray(
+        hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=16).digest()
+    )
+    digest[6] = digest[6] & 0x0F | 0x40
+    digest[8] = digest[8] & 0x3F | 0x80
+    value = digest.hex()
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+
+# ids of the rows others refer to, over and over
+parent_id = lru_cache(maxsize=None)(entity_id)
+
+
+def rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+@lru_cache(maxsize=None)
+def base_price(seed: int, asset: int) -> float:
+    return round(rng(seed, "price", asset).lognormvariate(4, 1), 2)
+
+
+def timestamp(moment: datetime) -> str:
+    return moment.isoformat(sep=" ")
+
+
+def user_rows(task: Task) -> Iterator[Sequence]:
+    for index in range(task.start, task.stop):
+        created_at = END - timedelta(days=365) + timedelta(minutes=index)
+        yield (
+            entity_id(task.seed, "user", index),
+            f"Synthetic User{index}",
+            f"s{task.seed}-user{index}@synthetic.papertrade.live",
+            task.password,
+            "t",
+            timestamp(created_at),
+            timestamp(created_at),
+        )
+
+
+def asset_rows(task: Task) -> Iterator[Sequence]:
+    for index in range(task.start, task.stop):
+        generator = rng(task.seed, "assets", index)
+        price = base_price(task.seed, index)
+        yield (
+            entity_id(task.seed, "assets", index),
+            f"SYN{index:06d}",
+            f"Synthetic {index}",
+            generator.choice(EXCHANGES),
+            price,
+            round(price * generator.uniform(0.95, 1.05), 2),
+            price,
+            round(price * 1.02, 2),
+            round(price * 0.98, 2),
+            generator.randrange(1_000, 10_000_000),
+            round(price * generator.randrange(10**6, 10**9), 2),
+            timestamp(END),
+            timestamp(END),
+        )
+
+
+def portfolio_rows(task: Task) -> Iterator[Sequence]:
+    per_user = task.scale.portfolios_per_user
+    for index in range(task.start, task.stop):
+        generator = rng(task.seed, "portfolio", index)
+        created_at = END - timedelta(days=300) + timedelta(seconds=index)
+        yield (
+            entity_id(task.seed, "portfolio", index),
+            entity_id(task.seed, "user", index // per_user),
+            f"Portfolio {index % per_user + 1}",
+            round(generator.uniform(1_000, 100_000), 2),
+            timestamp(created_at),
+            timestamp(created_at),
+        )
+
+
+def portfolio_stock_rows(task: Task) -> Iterator[Sequence]:
+    per_portfolio = task.scale.stocks_per_portfolio
+    for index in range(task.start, task.stop):
+        generator = rng(task.seed, "portfolio_stock", index)
+        asset = generator.randrange(task.scale.assets)
+        quantity = generator.randrange(1, 1_000)
+        price = round(base_price(task.seed, asset) * generator.uniform(0.9, 1.1), 2)
+        purchased_at = END - timedelta(minutes=generator.randrange(200 * 24 * 60))
+        yield (
+            entity_id(task.seed, "portfolio_stock", index),
+            entity_id(task.seed, "portfolio", index // per_portfolio),
+            parent_id(task.seed, "assets", asset),
+            f"Synthetic {asset}",
+            quantity,
+            timestamp(purchased_at),
+            price,
+            round(price * quantity, 2),
+            timestamp(purchased_at),
+            timestamp(purchased_at),
+        )
+
+
+def transaction_rows(task: Task) -> Iterator[Sequence]:
+    # the transactions of a portfolio share a random generator
+    per_portfolio = task.scale.transactions_per_portfolio
+    generator = random.Random()
+    for index in range(task.start, task.stop):
+        portfolio, position = divmod(index, per_portfolio)
+        if position == 0:
+            generator.seed(f"{task.seed}:transaction:{portfolio}")
+            portfolio_id = entity_id(task.seed, "portfolio", portfolio)
+
+        asset = generator.randrange(task.scale.assets)
+        quantity = generator.randrange(1, 500)
+        price = round(base_price(task.seed, asset) * generator.uniform(0.9, 1.1), 2)
+        is_limit = generator.random() < 0.3
+        status = generator.choices(("FULFILLED", "PENDING", "CANCELLED"), (85, 10, 5))[
+            0
+        ]
+        traded_at = END - timedelta(minutes=generator.randrange(200 * 24 * 60))
+        yield (
+            entity_id(task.seed, "transaction", index),
+            portfolio_id,
+            parent_id(task.seed, "assets", asset),
+            generator.choice(("BUY", "SELL")),
+            status,
+            timestamp(traded_at),
+            price,
+            quantity,
+            "LIMIT" if is_limit else "MARKET",
+            price if is_limit else NULL,
+            round(price * quantity, 2),
+            timestamp(traded_at),
+            timestamp(traded_at),
+        )
+
+
+def bar_rows(task: Task) -> Iterator[Sequence]:
+    # bars of an asset are a random walk, walked from its first bar
+    per_asset = task.scale.bars_per_asset
+    generator = random.Random()
+    close = 0.0
+    for index in range(task.start, task.stop):
+        asset, position = divmod(index, per_asset)
+        if position == 0:
+            generator.seed(f"{task.seed}:bars:{asset}")
+            close = base_price(task.seed, asset)
+            asset_id = entity_id(task.seed, "assets", asset)
+
+        opened = close
+        close = max(0.01, round(opened * (1 + generator.gauss(0, 0.002)), 2))
+        spread = abs(generator.gauss(0, 0.001))
+        moment = timestamp(END - timedelta(minutes=per_asset - position))
+        yield (
+            entity_id(task.seed, "market_data_historical", index),
+            asset_id,
+            moment,
+            opened,
+            round(max(opened, close) * (1 + spread), 2),
+            round(min(opened, close) * (1 - spread), 2),
+            close,
+            generator.randrange(1, 100_000),
+            moment,
+            moment,
+        )
+
+
+# table: (columns, rows)
+GENERATORS: Dict[str, tuple] = {
+    "user": (
+        (
+            "user_id",
+            "full_name",
+            "email",
+            "password",
+            "is_active",
+            "created_at",
+            "updated_at",
+        ),
+        user_rows,
+    ),
+    "assets": (
+        (
+            "asset_id",
+            "symbol",
+            "name",
+            "exchange",
+            "current_price",
+            "previous_close_price",
+            "open",
+            "high",
+            "low",
+            "volume",
+            "market_cap",
+            "created_at",
+            "updated_at",
+        ),
+        asset_rows,
+    ),
+    "portfolio": (
+        ("portfolio_id", "user_id", "name", "balance", "created_at", "updated_at"),
+        portfolio_rows,
+    ),
+    "portfolio_stock": (
+        (
+            "portfolio_stock_id",
+            "portfolio_id",
+            "asset_id",
+            "asset_name",
+            "quantity",
+            "purchase_date",
+            "purchase_price",
+            "total_investment",
+            "created_at",
+            "updated_at",
+        ),
+        portfolio_stock_rows,
+    ),
+    "transaction": (
+        (
+            "transaction_id",
+            "portfolio_id",
+            "asset_id",
+            "transaction_type",
+            "transaction_status",
+            "transaction_date",
+            "transaction_price",
+            "quantity",
+            "order_type",
+            "limit_price",
+            "transaction_value",
+            "created_at",
+            "updated_at",
+        ),
+        transaction_rows,
+    ),
+    "market_data_historical": (
+        (
+            "market_data_historical_id",
+            "asset_id",
+            "datetime",
+            "open",
+            "high",
+            "low",
+            "close",
+            "volume",
+            "created_at",
+            "updated_at",
+        ),
+        bar_rows,
+    ),
+}
+
+
+def copy_buffer(rows: Iterator[Sequence], limit: int) -> Optional[io.StringIO]:
+    """
+    Renders up to `limit` rows in the text format of COPY. None once the
+    rows are exhausted. Values never contain tabs, newlines or backslashes,
+    nulls are NULL.
+    """
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(map(str, row)))
+        buffer.write("\n")
+        count += 1
+        if count == limit:
+            break
+    if not count:
+        return None
+    buffer.seek(0)
+    return buffer
+
+
+_engine = None
+
+
+def _init_worker(db_url: str) -> None:
+    global _engine  # pylint: disable=global-statement
+    _engine = create_engine(db_url, poolclass=NullPool)
+
+
+def load(task: Task) -> int:
+    """
+    Generates and copies a slice of a table in a transaction of its own.
+    """
+    columns, generate = GENERATORS[task.table]
+    statement = (
+        f'COPY "{task.table}" ({", ".join(columns)}) FROM STDIN' " WITH (FORMAT text)"
+    )
+    rows = generate(task)
+
+    connection = _engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        while (buffer := copy_buffer(rows, BATCH_SIZE)) is not None:
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(statement, buffer)
+            else:  # psycopg 3
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+        connection.commit()
+    finally:
+        connection.close()
+    return task.stop - task.start
+
+
+def tasks(table: str, scale: Scale, seed: int, password: str, size: int) -> List[Task]:
+    rows, group = scale.rows(table), scale.group(table)
+    size = math.ceil(size / group) * group
+    return [
+        Task(table, start, min(start + size, rows), seed, scale, password)
+        for start in range(0, rows, size)
+    ]
+
+
+def truncate(db_url: str) -> None:
+    engine = create_engine(db_url, poolclass=NullPool)
+    with engine.begin() as connection:
+        tables = ", ".join(f'"{table}"' for table in TABLES)
+        connection.execute(text(f"TRUNCATE {tables}"))
+
+
+def analyze(db_url: str) -> None:
+    engine = create_engine(db_url, poolclass=NullPool)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLES:
+            conn.execute(text(f'ANALYZE "{table}"'))
+
+
+def generate(
+    scale: Scale,
+    seed: int = 1,
+    workers: int = 4,
+    db_url: Optional[str] = None,
+    progress: Callable[[str, int, float], None] = lambda *_: None,
+) -> Dict[str, int]:
+    """
+    Loads the dataset, table after table, each split in slices copied by
+    `workers` processes. Returns the rows loaded per table.
+    """
+    db_url = db_url or settings.DB_URL
+    # one hash for everyone, bcrypt is far too slow to run per row
+    password = auth.hash_password(SYNTHETIC_PASSWORD)
+    loaded = {}
+
+    with Pool(workers, initializer=_init_worker, initargs=(db_url,)) as pool:
+        for table in TABLES:
+            started_at = time.perf_counter()
+            # at least a slice per worker, at most a few batches per slice
+            size = max(1, min(4 * BATCH_SIZE, math.ceil(scale.rows(table) / workers)))
+            loaded[table] = sum(
+                pool.imap_unordered(load, tasks(table, scale, seed, password, size))
+            )
+            progress(table, loaded[table], time.perf_counter() - started_at)
+
+    analyze(db_url)
+    return loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Loads a synthetic dataset.")
+    parser.add_argument("--scale", type=float, default=1.0, help="size factor")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4, help="COPY processes")
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="delete ALL the rows of the tables before loading",
+    )
+    args = parser.parse_args()
+
+    scale = Scale().multiply(args.scale)
+    if args.truncate:
+        truncate(settings.DB_URL)
+
+    def progress(table: str, rows: int, elapsed: float) -> None:
+        logger.info(
+            f"{table}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f}/s)"
+        )
+
+    started_at = time.perf_counter()
+    loaded = generate(scale, args.seed, args.workers, progress=progress)
+    logger.info(
+        f"Loaded {sum(loaded.values())} rows in {time.perf_counter() - started_at:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
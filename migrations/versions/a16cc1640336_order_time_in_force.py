@@ -0,0 +1,54 @@
+"""order time in force
+
+Revision ID: a16cc1640336
+Revises: ffc3d378b075
+Create Date: 2026-10-19 03:58:27.104635
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a16cc1640336"
+down_revision = "ffc3d378b075"
+branch_labels = None
+depends_on = None
+
+time_in_force = sa.Enum("DAY", "GTC", "GTD", name="timeinforce")
+
+
+def upgrade():
+    time_in_force.create(op.get_bind())
+    # existing orders rest until cancelled. A constant default doesn't
+    # rewrite the table.
+    op.add_column(
+        "transaction",
+        sa.Column("time_in_force", time_in_force, server_default="GTC", nullable=False),
+    )
+    op.add_column("transaction", sa.Column("expires_at", sa.DateTime(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_pending_expiries",
+            "transaction",
+            ["updated_at"],
+            unique=False,
+            postgresql_where=sa.text(
+                "transaction_status = 'PENDING' AND deleted_at IS NULL AND"
+                " expires_at IS NOT NULL"
+            ),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_transaction_pending_expiries",
+            table_name="transaction",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("transaction", "expires_at")
+    op.drop_column("transaction", "time_in_force")
+    time_in_force.drop(op.get_bind())
@@ -0,0 +1,60 @@
+"""trigger changes index
+
+Revision ID: b7e2d4f9c813
+Revises: a16cc1640336
+Create Date: 2026-10-19 04:12:45.318204
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7e2d4f9c813"
+down_revision = "a16cc1640336"
+branch_labels = None
+depends_on = None
+
+TRIGGER_ORDER_TYPES = (
+    "order_type IN ('STOP', 'STOP_LIMIT', 'TAKE_PROFIT', 'TRAILING_STOP')"
+)
+
+
+def upgrade():
+    # the trigger book follows the changes of the trigger orders by
+    # updated_at, cancelled, filled and deleted ones included, instead of
+    # the resting ones by id
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_trigger_changes",
+            "transaction",
+            ["updated_at"],
+            unique=False,
+            postgresql_where=sa.text(TRIGGER_ORDER_TYPES),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_pending_triggers",
+            table_name="transaction",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_pending_triggers",
+            "transaction",
+            ["id"],
+            unique=False,
+            postgresql_where=sa.text(
+                f"transaction_status = 'PENDING' AND deleted_at IS NULL AND"
+                f" {TRIGGER_ORDER_TYPES}"
+            ),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_trigger_changes",
+            table_name="transaction",
+            postgresql_concurrently=True,
+        )
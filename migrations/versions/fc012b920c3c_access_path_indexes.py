@@ -0,0 +1,49 @@
+"""access path indexes
+
+Revision ID: fc012b920c3c
+Revises: c50475af367e
+Create Date: 2026-10-19 03:02:11.418207
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "fc012b920c3c"
+down_revision = "c50475af367e"
+branch_labels = None
+depends_on = None
+
+# name: (table, columns)
+INDEXES = {
+    "ix_portfolio_user_id": ("portfolio", ["user_id"]),
+    "ix_portfolio_stock_portfolio_id": ("portfolio_stock", ["portfolio_id"]),
+    "ix_portfolio_stock_asset_id": ("portfolio_stock", ["asset_id"]),
+    "ix_transaction_portfolio_id_transaction_date": (
+        "transaction",
+        ["portfolio_id", "transaction_date", "id"],
+    ),
+    "ix_transaction_asset_id": ("transaction", ["asset_id"]),
+    "ix_market_data_historical_asset_id_datetime": (
+        "market_data_historical",
+        ["asset_id", "datetime"],
+    ),
+}
+
+
+def upgrade():
+    # built concurrently, writes to the tables go on while they're built
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, (table, _) in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,70 @@
+"""trigger orders
+
+Revision ID: ffc3d378b075
+Revises: fc012b920c3c
+Create Date: 2026-10-19 03:10:42.730511
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "ffc3d378b075"
+down_revision = "fc012b920c3c"
+branch_labels = None
+depends_on = None
+
+TRIGGER_ORDER_TYPES = ("STOP", "STOP_LIMIT", "TAKE_PROFIT", "TRAILING_STOP")
+
+
+def upgrade():
+    # enum values can't be added, nor used, within a transaction block
+    with op.get_context().autocommit_block():
+        for order_type in TRIGGER_ORDER_TYPES:
+            op.execute(f"ALTER TYPE ordertype ADD VALUE IF NOT EXISTS '{order_type}'")
+
+    op.add_column("transaction", sa.Column("stop_price", sa.Float(), nullable=True))
+    op.add_column("transaction", sa.Column("trail_amount", sa.Float(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_pending_triggers",
+            "transaction",
+            ["id"],
+            unique=False,
+            postgresql_where=sa.text(
+                "transaction_status = 'PENDING' AND deleted_at IS NULL AND"
+                " order_type IN ('STOP', 'STOP_LIMIT', 'TAKE_PROFIT', 'TRAILING_STOP')"
+            ),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_transaction_pending_triggers",
+            table_name="transaction",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("transaction", "trail_amount")
+    op.drop_column("transaction", "stop_price")
+
+    # postgres can't drop enum values, the type is recreated without them.
+    # Resting trigger orders are cancelled.
+    op.execute(
+        "UPDATE transaction SET"
+        " transaction_status = CASE WHEN transaction_status = 'PENDING'"
+        " THEN 'CANCELLED'::transactionstatus ELSE transaction_status END,"
+        " order_type = CASE WHEN order_type = 'STOP_LIMIT'"
+        " THEN 'LIMIT'::ordertype ELSE 'MARKET'::ordertype END"
+        " WHERE order_type IN ('STOP', 'STOP_LIMIT', 'TAKE_PROFIT', 'TRAILING_STOP')"
+    )
+    op.execute("ALTER TYPE ordertype RENAME TO ordertype_old")
+    op.execute("CREATE TYPE ordertype AS ENUM ('MARKET', 'LIMIT')")
+    op.execute(
+        "ALTER TABLE transaction ALTER COLUMN order_type TYPE ordertype"
+        " USING order_type::text::ordertype"
+    )
+    op.execute("DROP TYPE ordertype_old")
@@ -0,0 +1,23 @@
+"""
+Worker boot time budget, see benchmarks.import_time.
+"""
+
+import unittest
+
+from benchmarks.import_time import BUDGET_MS, measure
+
+
+class TestImportTime(unittest.TestCase):
+    def test_worker_boot_within_budget(self):
+        boot = measure()
+        slowest = sorted(
+            (entry for entry in boot.imports if entry[0].startswith("app.")),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:5]
+        self.assertLessEqual(
+            boot.app_ms,
+            BUDGET_MS,
+            "worker boot over budget, slowest application imports: "
+            + ", ".join(f"{module} {us / 1000:.0f}ms" for module, us, _ in slowest),
+        )